@@ -9,7 +9,6 @@ import random
 import numpy as np
 import torch
 from torch import nn
-import torchvision as tv
 
 import learn2learn as l2l
 from learn2learn.data.transforms import FusedNWaysKShots, LoadData, RemapLabels, ConsecutiveLabels
@@ -88,13 +87,13 @@ def main(
 
     # Create Datasets
     train_dataset = l2l.vision.datasets.FC100(root='~/data',
-                                              transform=tv.transforms.ToTensor(),
+                                              tensor=True,
                                               mode='train')
     valid_dataset = l2l.vision.datasets.FC100(root='~/data',
-                                              transform=tv.transforms.ToTensor(),
+                                              tensor=True,
                                               mode='validation')
     test_dataset = l2l.vision.datasets.FC100(root='~/data',
-                                              transform=tv.transforms.ToTensor(),
+                                             tensor=True,
                                              mode='test')
     train_dataset = l2l.data.MetaDataset(train_dataset)
     valid_dataset = l2l.data.MetaDataset(valid_dataset)
@@ -18,7 +18,8 @@ def accuracy(predictions, targets):
 
 def fast_adapt(batch, learner, loss, adaptation_steps, shots, ways, device):
     data, labels = batch
-    data, labels = data.to(device), labels.to(device)
+    # Materialized tasks store uint8 images.
+    data, labels = data.to(device).float(), labels.to(device)
 
     # Separate data into adaptation/evalutation sets
     adaptation_indices = np.zeros(data.size(0), dtype=bool)
@@ -29,10 +30,10 @@ def fast_adapt(batch, learner, loss, adaptation_steps, shots, ways, device):
     evaluation_data, evaluation_labels = data[evaluation_indices], labels[evaluation_indices]
 
     # Adapt the model
-    for step in range(adaptation_steps):
+    def adaptation_error(learner):
         train_error = loss(learner(adaptation_data), adaptation_labels)
-        train_error /= len(adaptation_data)
-        learner.adapt(train_error)
+        return train_error / len(adaptation_data)
+    learner.adapt(adaptation_error, steps=adaptation_steps)
 
     # Evaluate the adapted model
     predictions = learner(evaluation_data)
@@ -50,6 +51,8 @@ def main(
         meta_batch_size=32,
         adaptation_steps=1,
         num_iterations=60000,
+        checkpoint_interval=None,
+        materialize=False,
         cuda=True,
         seed=42,
 ):
@@ -90,6 +93,11 @@ def main(
     valid_tasks = l2l.data.TaskDataset(valid_dataset,
                                        task_transforms=valid_transforms,
                                        num_tasks=600)
+    if materialize:  # Stores the validation tasks in ~/data, as uint8.
+        valid_tasks = valid_tasks.materialize(
+            '~/data/mini-imagenet-valid-tasks-{}w{}s-{}t-{}'.format(
+                ways, 2*shots, 600, seed),
+            dtypes=[torch.uint8, None])
 
     test_transforms = [
         NWays(test_dataset, ways),
@@ -101,11 +109,19 @@ def main(
     test_tasks = l2l.data.TaskDataset(test_dataset,
                                       task_transforms=test_transforms,
                                       num_tasks=600)
+    if materialize:
+        test_tasks = test_tasks.materialize(
+            '~/data/mini-imagenet-test-tasks-{}w{}s-{}t-{}'.format(
+                ways, 2*shots, 600, seed),
+            dtypes=[torch.uint8, None])
 
     # Create model
     model = l2l.vision.models.MiniImagenetCNN(ways)
     model.to(device)
-    maml = l2l.algorithms.MAML(model, lr=fast_lr, first_order=False)
+    maml = l2l.algorithms.MAML(model,
+                               lr=fast_lr,
+                               first_order=False,
+                               checkpoint_interval=checkpoint_interval)
     opt = optim.Adam(maml.parameters(), meta_lr)
     loss = nn.CrossEntropyLoss(reduction='mean')
 
@@ -45,7 +45,7 @@ def fast_adapt(model, batch, ways, shot, query_num, metric=None, device=None):
     if device is None:
         device = model.device()
     data, labels = batch
-    data = data.to(device)
+    data = data.to(device).float()  # Materialized tasks store uint8 images.
     labels = labels.to(device)
     n_items = shot * ways
 
@@ -84,6 +84,9 @@ if __name__ == '__main__':
     parser.add_argument('--train-query', type=int, default=15)
     parser.add_argument('--train-way', type=int, default=30)
     parser.add_argument('--gpu', default=0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--materialize', action='store_true',
+                        help='Store valid and test tasks in ~/data as uint8.')
     args = parser.parse_args()
     print(args)
 
@@ -112,7 +115,9 @@ if __name__ == '__main__':
         RemapLabels(train_dataset),
     ]
     train_tasks = l2l.data.TaskDataset(train_dataset, task_transforms=train_transforms)
-    train_loader = DataLoader(train_tasks, pin_memory=True, shuffle=True)
+    train_loader = l2l.data.TaskLoader(train_tasks,
+                                       num_workers=4,
+                                       pin_memory=True)
 
     valid_dataset = l2l.data.MetaDataset(valid_dataset)
     valid_transforms = [
@@ -123,7 +128,16 @@ if __name__ == '__main__':
     ]
     valid_tasks = l2l.data.TaskDataset(valid_dataset,
                                        task_transforms=valid_transforms,
-                                       num_tasks=200)
+                                       num_tasks=200,
+                                       seed=args.seed)
+    if args.materialize:
+        valid_tasks = valid_tasks.materialize(
+            '~/data/mini-imagenet-valid-tasks-{}w{}s-{}t-{}'.format(
+                args.test_way,
+                args.test_query + args.test_shot,
+                200,
+                args.seed),
+            dtypes=[torch.uint8, None])
     valid_loader = DataLoader(valid_tasks, pin_memory=True, shuffle=True)
 
     test_dataset = l2l.data.MetaDataset(test_dataset)
@@ -135,7 +149,16 @@ if __name__ == '__main__':
     ]
     test_tasks = l2l.data.TaskDataset(test_dataset,
                                       task_transforms=test_transforms,
-                                      num_tasks=2000)
+                                      num_tasks=2000,
+                                      seed=args.seed)
+    if args.materialize:
+        test_tasks = test_tasks.materialize(
+            '~/data/mini-imagenet-test-tasks-{}w{}s-{}t-{}'.format(
+                args.test_way,
+                args.test_query + args.test_shot,
+                2000,
+                args.seed),
+            dtypes=[torch.uint8, None])
     test_loader = DataLoader(test_tasks, pin_memory=True, shuffle=True)
 
     optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
@@ -150,7 +173,7 @@ if __name__ == '__main__':
         n_acc = 0
 
         for i in range(100):
-            batch = next(iter(train_loader))
+            batch = train_loader.sample()
 
             loss, acc = fast_adapt(model,
                                    batch,
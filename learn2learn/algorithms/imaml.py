@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+import torch
+from torch.autograd import grad
+
+from learn2learn.algorithms.base_learner import BaseLearner
+from learn2learn.utils import clone_module, _module_shell, _parameter_slots
+
+
+def _conjugate_gradient(matrix_vector, b, steps, tolerance=1e-10):
+    # Approximately solves Ax = b, where matrix_vector(v) computes Av.
+    x = torch.zeros_like(b)
+    r = b.clone()
+    p = r.clone()
+    r_dot_r = r.dot(r)
+    for step in range(steps):
+        if r_dot_r < tolerance:
+            break
+        Ap = matrix_vector(p)
+        alpha = r_dot_r / p.dot(Ap)
+        x = x + alpha * p
+        r = r - alpha * Ap
+        new_r_dot_r = r.dot(r)
+        p = r + (new_r_dot_r / r_dot_r) * p
+        r_dot_r = new_r_dot_r
+    return x
+
+
+class _ImplicitAdaptation(torch.autograd.Function):
+
+    """
+    Runs the inner loop of iMAML without storing its graph.
+
+    Only the adapted parameters are kept for the backward pass, which computes
+    the implicit meta-gradient with conjugate gradient.
+    """
+
+    @staticmethod
+    def forward(ctx, problem, steps, *params):
+        ctx.problem = problem
+        with torch.enable_grad():
+            anchors = [p.detach() for p in params]
+            fast = [p.detach().requires_grad_() for p in params]
+            for step in range(steps):
+                gradients = problem.loss_gradients(fast, create_graph=False)
+                fast = [(f - problem.lr * (g + problem.lam * (f - a))).detach().requires_grad_()
+                        for f, g, a in zip(fast, gradients, anchors)]
+        ctx.save_for_backward(*fast)
+        return tuple(f.detach() for f in fast)
+
+    @staticmethod
+    def backward(ctx, *grad_outputs):
+        problem = ctx.problem
+        fast = [p.detach().requires_grad_() for p in ctx.saved_tensors]
+        with torch.enable_grad():
+            gradients = problem.loss_gradients(fast, create_graph=True)
+
+            def matrix_vector(v):
+                # (I + H / lam + damping * I) v, with H the Hessian of the adaptation loss.
+                vs = [vi.view_as(f) for vi, f in zip(v.split([f.numel() for f in fast]), fast)]
+                hvp = grad(gradients,
+                           fast,
+                           grad_outputs=vs,
+                           retain_graph=True,
+                           allow_unused=True)
+                hvp = torch.cat([torch.zeros_like(f).reshape(-1) if h is None else h.reshape(-1)
+                                 for h, f in zip(hvp, fast)])
+                return (1.0 + problem.cg_damping) * v + hvp / problem.lam
+
+            b = torch.cat([g.reshape(-1) for g in grad_outputs])
+            meta_gradients = _conjugate_gradient(matrix_vector, b, problem.cg_steps)
+        meta_gradients = [g.view_as(f) for g, f in zip(meta_gradients.split([f.numel() for f in fast]), fast)]
+        return (None, None) + tuple(meta_gradients)
+
+
+class _ImplicitProblem(object):
+
+    """
+    What `_ImplicitAdaptation` needs to compute gradients of the adaptation loss:
+    the loss, a shell of the adapted learner (see `_module_shell`), and its parameter slots.
+
+    The shell shares the tensors of the learner but not the learner itself, so that the
+    autograd graph does not reference the learner whose parameters are its outputs.
+    """
+
+    def __init__(self, learner, loss):
+        memo = {}
+        self.learner = IMAML(_module_shell(learner.module, memo),
+                             lr=learner.lr,
+                             lam=learner.lam,
+                             cg_steps=learner.cg_steps,
+                             cg_damping=learner.cg_damping,
+                             allow_unused=learner.allow_unused)
+        self.slots = [(memo[id(module)], key) for module, key in _parameter_slots(learner.module)
+                      if module._parameters[key].requires_grad]
+        self.loss = loss
+        self.lr = learner.lr
+        self.lam = learner.lam
+        self.cg_steps = learner.cg_steps
+        self.cg_damping = learner.cg_damping
+        self.allow_unused = learner.allow_unused
+
+    def loss_gradients(self, params, create_graph):
+        # Gradients of loss(learner) w.r.t. params, bound to the parameter slots.
+        previous = [module._parameters[key] for module, key in self.slots]
+        try:
+            for (module, key), p in zip(self.slots, params):
+                module._parameters[key] = p
+            gradients = grad(self.loss(self.learner),
+                             params,
+                             create_graph=create_graph,
+                             allow_unused=self.allow_unused)
+        finally:
+            for (module, key), p in zip(self.slots, previous):
+                module._parameters[key] = p
+        return [torch.zeros_like(p) if g is None else g
+                for p, g in zip(params, gradients)]
+
+
+class IMAML(BaseLearner):
+    """
+
+    [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/algorithms/imaml.py)
+
+    **Description**
+
+    High-level implementation of *implicit MAML* (iMAML).
+
+    This class wraps an arbitrary nn.Module and augments it with `clone()` and `adapt()`
+    methods, like `MAML`.
+    The inner loop minimizes the adaptation loss plus a proximal term
+    \\(\\frac{\\lambda}{2} \\Vert \\phi - \\theta \\Vert^2\\) without keeping its computational graph.
+    Instead, the meta-gradient is obtained via the implicit function theorem, by solving
+    \\((I + \\frac{1}{\\lambda} \\nabla^2 \\mathcal{L}(\\phi)) v = \\nabla_\\phi \\mathcal{L}_{eval}(\\phi)\\)
+    with conjugate gradient over Hessian-vector products.
+    Memory usage is therefore constant in the number of adaptation steps.
+
+    **Arguments**
+
+    * **model** (Module) - Module to be wrapped.
+    * **lr** (float) - Fast adaptation learning rate.
+    * **lam** (float, *optional*, default=1.0) - Strength \\(\\lambda\\) of the proximal regularization.
+    * **cg_steps** (int, *optional*, default=5) - Number of conjugate gradient iterations.
+    * **cg_damping** (float, *optional*, default=0.0) - Damping added to the diagonal of the
+        linear system solved by conjugate gradient.
+    * **allow_unused** (bool, *optional*, default=False) - Whether to allow differentiation
+        of unused parameters.
+
+    **References**
+
+    1. Rajeswaran et al. 2019. "Meta-Learning with Implicit Gradients." NeurIPS.
+
+    **Example**
+
+    ~~~python
+    linear = l2l.algorithms.IMAML(nn.Linear(20, 10), lr=0.01, lam=2.0, cg_steps=5)
+    clone = linear.clone()
+    clone.adapt(lambda learner: loss(learner(X), y), steps=20)
+    error = loss(clone(X), y)
+    error.backward()
+    ~~~
+    """
+
+    def __init__(self,
+                 model,
+                 lr,
+                 lam=1.0,
+                 cg_steps=5,
+                 cg_damping=0.0,
+                 allow_unused=False):
+        super(IMAML, self).__init__()
+        self.module = model
+        self.lr = lr
+        self.lam = lam
+        self.cg_steps = cg_steps
+        self.cg_damping = cg_damping
+        self.allow_unused = allow_unused
+
+    def forward(self, *args, **kwargs):
+        return self.module(*args, **kwargs)
+
+    def adapt(self, loss, steps=1):
+        """
+        **Description**
+
+        Takes `steps` gradient steps on the proximally regularized loss and updates the
+        cloned parameters in place.
+
+        **Arguments**
+
+        * **loss** (callable) - Called as `loss(learner)` to compute the adaptation loss.
+            It is called again during the backward pass, to compute Hessian-vector products.
+        * **steps** (int, *optional*, default=1) - Number of adaptation steps.
+
+        """
+        if not callable(loss):
+            raise TypeError('IMAML.adapt() requires a callable loss, called as loss(learner).')
+        slots = [(module, key) for module, key in _parameter_slots(self.module)
+                 if module._parameters[key].requires_grad]
+        params = [module._parameters[key] for module, key in slots]
+        params = _ImplicitAdaptation.apply(_ImplicitProblem(self, loss), steps, *params)
+        for (module, key), p in zip(slots, params):
+            module._parameters[key] = p
+
+    def clone(self):
+        """
+        **Description**
+
+        Returns an `IMAML`-wrapped copy of the module whose parameters and buffers
+        are `torch.clone`d from the original module.
+
+        Back-propagating through the adapted clone populates the gradients of the
+        original module with the implicit meta-gradient.
+        """
+        return IMAML(clone_module(self.module),
+                     lr=self.lr,
+                     lam=self.lam,
+                     cg_steps=self.cg_steps,
+                     cg_damping=self.cg_damping,
+                     allow_unused=self.allow_unused)
@@ -1,10 +1,19 @@
 #!/usr/bin/env python3
 
+import contextlib
 import traceback
+import types
+import torch
 from torch.autograd import grad
 
+try:
+    from torch.func import functional_call, vmap
+    from torch.func import grad as functional_grad
+except ImportError:  # torch < 2.0
+    functional_call = vmap = functional_grad = None
+
 from learn2learn.algorithms.base_learner import BaseLearner
-from learn2learn.utils import clone_module
+from learn2learn.utils import clone_module, _module_shell, _parameter_slots
 
 
 def maml_update(model, lr, grads=None):
@@ -64,6 +73,106 @@ def maml_update(model, lr, grads=None):
     return model
 
 
+class _CheckpointedAdaptation(torch.autograd.Function):
+
+    """
+    Runs a segment of second-order adaptation steps without storing their graph.
+
+    The forward pass only keeps the fast weights at the start of the segment;
+    the backward pass recomputes the segment with `create_graph=True` and
+    back-propagates through it, with the RNG state of the forward pass
+    (as `torch.utils.checkpoint` does) so that e.g. dropout masks match.
+    """
+
+    @staticmethod
+    def forward(ctx, segment, *params):
+        ctx.segment = segment
+        ctx.save_for_backward(*params)
+        ctx.cuda_devices = sorted(set(p.get_device() for p in params if p.is_cuda))
+        ctx.cpu_rng_state = torch.get_rng_state()
+        ctx.cuda_rng_states = [torch.cuda.get_rng_state(d) for d in ctx.cuda_devices]
+        with torch.enable_grad():
+            params = [p.detach().requires_grad_() for p in params]
+            outputs = segment(params, create_graph=False, check_inputs=True)
+        return tuple(o.detach() for o in outputs)
+
+    @staticmethod
+    def backward(ctx, *grad_outputs):
+        params = [p.detach().requires_grad_() for p in ctx.saved_tensors]
+        with torch.random.fork_rng(devices=ctx.cuda_devices):
+            torch.set_rng_state(ctx.cpu_rng_state)
+            for device, state in zip(ctx.cuda_devices, ctx.cuda_rng_states):
+                torch.cuda.set_rng_state(state, device)
+            with torch.enable_grad():
+                outputs = ctx.segment(params, create_graph=True)
+                gradients = torch.autograd.grad(outputs,
+                                                params,
+                                                grad_outputs,
+                                                allow_unused=True)
+        return (None, ) + tuple(gradients)
+
+
+class _AdaptationSegment(object):
+
+    """
+    Runs `num_steps` adaptation steps on `learner` from the given fast weights, by rebinding
+    its parameter `slots` to them.
+
+    `learner` is a shell of the adapted learner (see `_module_shell`), not the learner itself,
+    so that the autograd graph does not reference the learner whose parameters are the outputs
+    of the graph.
+    """
+
+    def __init__(self, learner, slots, loss, num_steps, allow_unused):
+        self.learner = learner
+        self.slots = slots
+        self.loss = loss
+        self.num_steps = num_steps
+        self.allow_unused = allow_unused
+
+    def __call__(self, params, create_graph, check_inputs=False):
+        previous = [module._parameters[key] for module, key in self.slots]
+        try:
+            for step in range(self.num_steps):
+                for (module, key), p in zip(self.slots, params):
+                    module._parameters[key] = p
+                loss = self.loss(self.learner)
+                if check_inputs and step == 0 and _depends_on_other_leaves(loss, params):
+                    raise RuntimeError('MAML.adapt(): with checkpoint_interval, the loss can only '
+                                       'depend on the parameters of the learner it receives, not on '
+                                       'other tensors requiring gradients (e.g. features computed '
+                                       'outside of the loss). Try without checkpoint_interval.')
+                gradients = grad(loss,
+                                 params,
+                                 retain_graph=create_graph,
+                                 create_graph=create_graph,
+                                 allow_unused=self.allow_unused)
+                params = [p if g is None else p - self.learner.lr * g
+                          for p, g in zip(params, gradients)]
+        finally:
+            for (module, key), p in zip(self.slots, previous):
+                module._parameters[key] = p
+        return params
+
+
+def _depends_on_other_leaves(output, params):
+    # Whether the graph of output reaches leaf tensors requiring gradients other than params.
+    params = set(id(p) for p in params)
+    stack = [output.grad_fn]
+    seen = set()
+    while len(stack) > 0:
+        node = stack.pop()
+        if node is None or node in seen:
+            continue
+        seen.add(node)
+        if hasattr(node, 'variable'):  # AccumulateGrad
+            if id(node.variable) not in params:
+                return True
+            continue
+        stack.extend(next_node for next_node, _ in node.next_functions)
+    return False
+
+
 class MAML(BaseLearner):
     """
 
@@ -89,6 +198,12 @@ class MAML(BaseLearner):
         of unused parameters. Defaults to `allow_nograd`.
     * **allow_nograd** (bool, *optional*, default=False) - Whether to allow adaptation with
         parameters that have `requires_grad = False`.
+    * **checkpoint_interval** (int, *optional*, default=None) - If set, second-order
+        adaptation with a callable loss (see `adapt()`) only stores the fast weights every
+        `checkpoint_interval` steps and recomputes the inner steps during the outer backward
+        pass. Memory then grows with `steps / checkpoint_interval` instead of `steps`.
+        The loss can then only depend on tensors requiring gradients through the learner
+        it receives.
 
     **References**
 
@@ -104,6 +219,9 @@ class MAML(BaseLearner):
     error = loss(clone(X), y)
     error.backward()
     ~~~
+
+    Alternatively, a meta-batch of tasks can be adapted in a single vectorized call
+    with `adapt_batch()` and evaluated with `forward_batch()`.
     """
 
     def __init__(self,
@@ -111,12 +229,14 @@ class MAML(BaseLearner):
                  lr,
                  first_order=False,
                  allow_unused=None,
-                 allow_nograd=False):
+                 allow_nograd=False,
+                 checkpoint_interval=None):
         super(MAML, self).__init__()
         self.module = model
         self.lr = lr
         self.first_order = first_order
         self.allow_nograd = allow_nograd
+        self.checkpoint_interval = checkpoint_interval
         if allow_unused is None:
             allow_unused = allow_nograd
         self.allow_unused = allow_unused
@@ -128,22 +248,36 @@ class MAML(BaseLearner):
               loss,
               first_order=None,
               allow_unused=None,
-              allow_nograd=None):
+              allow_nograd=None,
+              steps=1):
         """
         **Description**
 
         Takes a gradient step on the loss and updates the cloned parameters in place.
 
+        If `loss` is a callable, it is called as `loss(learner)` to compute the loss
+        of each of the `steps` adaptation steps. This form is required for inner-loop
+        checkpointing (see `checkpoint_interval`).
+
         **Arguments**
 
-        * **loss** (Tensor) - Loss to minimize upon update.
+        * **loss** (Tensor or callable) - Loss to minimize upon update.
         * **first_order** (bool, *optional*, default=None) - Whether to use first- or
             second-order updates. Defaults to self.first_order.
         * **allow_unused** (bool, *optional*, default=None) - Whether to allow differentiation
             of unused parameters. Defaults to self.allow_unused.
         * **allow_nograd** (bool, *optional*, default=None) - Whether to allow adaptation with
             parameters that have `requires_grad = False`. Defaults to self.allow_nograd.
-
+        * **steps** (int, *optional*, default=1) - Number of adaptation steps, when `loss`
+            is a callable.
+
+        **Example**
+        ~~~python
+        maml = l2l.algorithms.MAML(model, lr=0.1, checkpoint_interval=2)
+        learner = maml.clone()
+        learner.adapt(lambda l: loss(l(X), y), steps=10)
+        loss(learner(X), y).backward()
+        ~~~
         """
         if first_order is None:
             first_order = self.first_order
@@ -153,6 +287,20 @@ class MAML(BaseLearner):
             allow_nograd = self.allow_nograd
         second_order = not first_order
 
+        if callable(loss):
+            if second_order and self.checkpoint_interval is not None:
+                slots = list(_parameter_slots(self.module))
+                if allow_nograd:
+                    slots = [(m, k) for m, k in slots if m._parameters[k].requires_grad]
+                self._adapt_checkpointed(loss, steps, slots, allow_unused)
+            else:
+                for step in range(steps):
+                    self.adapt(loss(self),
+                               first_order=first_order,
+                               allow_unused=allow_unused,
+                               allow_nograd=allow_nograd)
+            return
+
         if allow_nograd:
             # Compute relevant gradients
             diff_params = [p for p in self.module.parameters() if p.requires_grad]
@@ -186,6 +334,21 @@ class MAML(BaseLearner):
         # Update the module
         self.module = maml_update(self.module, self.lr, gradients)
 
+    def _adapt_checkpointed(self, loss, steps, slots, allow_unused):
+        # The steps run on a shell of this learner, so that the graph does not reference it.
+        memo = {}
+        shell = MAML(_module_shell(self.module, memo), lr=self.lr)
+        shell_slots = [(memo[id(module)], key) for module, key in slots]
+
+        # Only the fast weights at segment boundaries are kept in the graph.
+        params = [module._parameters[key] for module, key in slots]
+        for start in range(0, steps, self.checkpoint_interval):
+            num_steps = min(self.checkpoint_interval, steps - start)
+            segment = _AdaptationSegment(shell, shell_slots, loss, num_steps, allow_unused)
+            params = _CheckpointedAdaptation.apply(segment, *params)
+        for (module, key), p in zip(slots, params):
+            module._parameters[key] = p
+
     def clone(self, first_order=None, allow_unused=None, allow_nograd=None):
         """
         **Description**
@@ -217,4 +380,163 @@ class MAML(BaseLearner):
                     lr=self.lr,
                     first_order=first_order,
                     allow_unused=allow_unused,
-                    allow_nograd=allow_nograd)
+                    allow_nograd=allow_nograd,
+                    checkpoint_interval=self.checkpoint_interval)
+
+    def adapt_batch(self,
+                    loss_fn,
+                    tasks,
+                    steps=1,
+                    first_order=None,
+                    allow_nograd=None):
+        """
+        **Description**
+
+        Adapts the module to a whole meta-batch of tasks at once.
+
+        Instead of cloning the module and looping over tasks in Python, the fast weights
+        of all tasks are stacked along a leading task dimension and each adaptation step
+        runs a single vectorized (`torch.func.vmap`) forward/backward pass.
+        The returned fast weights are differentiable w.r.t. the parameters of the module,
+        so that the meta-gradient is obtained by back-propagating an evaluation loss
+        computed with `forward_batch()`.
+
+        Buffers (e.g. BatchNorm running statistics) are copied for each task and the
+        copies are discarded after adaptation, so the module's own buffers are not updated.
+        BatchNorm layers normalize each task with the statistics of its own batch
+        (or with their running statistics in eval mode), as with `clone()` and `adapt()`.
+        Requires torch >= 2.0.
+
+        **Arguments**
+
+        * **loss_fn** (callable) - Called as `loss_fn(learner, *task)` for a single task,
+            where `learner` is a callable running the module with that task's fast weights.
+            Must return a scalar loss.
+        * **tasks** (tuple of Tensors) - Adaptation data, where each tensor has the number of
+            tasks as leading dimension. (e.g. `(X, y)` with shapes `(T, N, ...)` and `(T, N)`)
+        * **steps** (int, *optional*, default=1) - Number of adaptation steps.
+        * **first_order** (bool, *optional*, default=None) - Whether to use first- or
+            second-order updates. Defaults to self.first_order.
+        * **allow_nograd** (bool, *optional*, default=None) - Whether to allow adaptation with
+            parameters that have `requires_grad = False`. Defaults to self.allow_nograd.
+
+        **Returns**
+
+        * (dict) - Maps parameter names to fast weights of shape `(T, *param.shape)`.
+
+        **Example**
+        ~~~python
+        def loss_fn(learner, X, y):
+            return F.cross_entropy(learner(X), y)
+
+        maml = l2l.algorithms.MAML(model, lr=0.1)
+        fast_weights = maml.adapt_batch(loss_fn, (X_adapt, y_adapt), steps=5)
+        predictions = maml.forward_batch(fast_weights, X_eval)  # (T, N, num_classes)
+        error = F.cross_entropy(predictions.flatten(0, 1), y_eval.flatten())
+        error.backward()
+        ~~~
+        """
+        if vmap is None:
+            raise RuntimeError('MAML.adapt_batch() requires torch >= 2.0 (torch.func).')
+        if first_order is None:
+            first_order = self.first_order
+        if allow_nograd is None:
+            allow_nograd = self.allow_nograd
+        if not isinstance(tasks, (tuple, list)):
+            tasks = (tasks, )
+        num_tasks = tasks[0].size(0)
+
+        if not allow_nograd:
+            for name, param in self.module.named_parameters():
+                if not param.requires_grad:
+                    msg = 'MAML.adapt_batch(): parameter ' + name + ' does not require gradients.'
+                    raise RuntimeError(msg + ' Maybe try with allow_nograd=True ?')
+        fast_weights = {name: param.unsqueeze(0).expand(num_tasks, *param.shape)
+                        for name, param in self.module.named_parameters()
+                        if param.requires_grad}
+        buffers = self._batch_buffers(num_tasks)
+
+        def adaptation_step(params, buffers, *task):
+            def task_loss(params, buffers):
+                def learner(*args, **kwargs):
+                    return self._functional_forward(params, buffers, args, kwargs)
+                return loss_fn(learner, *task)
+            gradients = functional_grad(task_loss)(params, buffers)
+            if first_order:
+                gradients = {name: g.detach() for name, g in gradients.items()}
+            return {name: params[name] - self.lr * gradients[name]
+                    for name in params}
+
+        adaptation_step = vmap(adaptation_step)
+        for step in range(steps):
+            fast_weights = adaptation_step(fast_weights, buffers, *tasks)
+        return fast_weights
+
+    def forward_batch(self, fast_weights, *args):
+        """
+        **Description**
+
+        Runs the module on a meta-batch of tasks, using the fast weights returned by
+        `adapt_batch()`.
+
+        **Arguments**
+
+        * **fast_weights** (dict) - Stacked fast weights, as returned by `adapt_batch()`.
+        * ***args** (Tensors) - Inputs, whose leading dimension is the number of tasks.
+
+        **Returns**
+
+        * (Tensor) - The outputs of the module, stacked along the leading task dimension.
+        """
+        if vmap is None:
+            raise RuntimeError('MAML.forward_batch() requires torch >= 2.0 (torch.func).')
+        num_tasks = args[0].size(0)
+        buffers = self._batch_buffers(num_tasks)
+
+        def task_forward(params, buffers, *inputs):
+            return self._functional_forward(params, buffers, inputs, {})
+        return vmap(task_forward)(fast_weights, buffers, *args)
+
+    def _batch_buffers(self, num_tasks):
+        # Each task gets its own copy of the buffers, so that in-place updates
+        # (e.g. BatchNorm statistics) are well-defined under vmap.
+        return {name: buff.unsqueeze(0).expand(num_tasks, *buff.shape).clone()
+                for name, buff in self.module.named_buffers()}
+
+    def _functional_forward(self, params, buffers, args, kwargs):
+        state = dict(self.module.named_parameters())
+        state.update(buffers)
+        state.update(params)
+        with _explicit_batch_norm(self.module):
+            return functional_call(self.module, state, args, kwargs)
+
+
+@contextlib.contextmanager
+def _explicit_batch_norm(module):
+    # Second-order gradients through the affine parameters of F.batch_norm are wrong
+    # under vmap, so BatchNorm layers compute the normalization explicitly instead.
+    norms = [m for m in module.modules()
+             if isinstance(m, torch.nn.modules.batchnorm._BatchNorm)]
+    for norm in norms:
+        norm.forward = types.MethodType(_batch_norm_forward, norm)
+    try:
+        yield
+    finally:
+        for norm in norms:
+            del norm.forward
+
+
+def _batch_norm_forward(self, input):
+    # Same output as _BatchNorm.forward, without updating the running statistics.
+    shape = [1, -1] + [1] * (input.dim() - 2)
+    if self.training or self.running_mean is None:
+        dims = [0] + list(range(2, input.dim()))
+        mean = input.mean(dims, keepdim=True)
+        var = input.var(dims, unbiased=False, keepdim=True)
+    else:
+        mean = self.running_mean.view(shape)
+        var = self.running_var.view(shape)
+    output = (input - mean) * torch.rsqrt(var + self.eps)
+    if self.affine:
+        output = output * self.weight.view(shape) + self.bias.view(shape)
+    return output
@@ -2,4 +2,6 @@
 
 from . import transforms
 from .meta_dataset import MetaDataset
-from .task_dataset import TaskDataset, DataDescription
+from .task_dataset import TaskDataset, DataDescription, TaskDescription, task_generator
+from .task_bank import TaskBank
+from .task_loader import TaskLoader
@@ -3,14 +3,20 @@
 
 cimport cython
 
+import mmap
 import os
 import pickle
 import random
-from collections import defaultdict
+import multiprocessing
+from collections.abc import Mapping
 
 import numpy as np
 import torch
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, DataLoader
+
+LABEL_ATTRIBUTES = ('targets', 'labels', 'y')
+SCAN_BATCH_SIZE = 256
+BOOKKEEPING_ARRAYS = ('label_values', 'label_codes', 'label_offsets', 'label_indices')
 
 
 class MetaDataset(Dataset):
@@ -21,6 +27,17 @@ class MetaDataset(Dataset):
     It wraps a torch dataset by creating a map of target to indices.
     This comes in handy when we want to sample elements randomly for a particular label.
 
+    The map is stored as arrays: `label_codes[i]` is the position in `labels` of the
+    label of sample `i`, and the indices of label `labels[c]` are
+    `label_indices[label_offsets[c]:label_offsets[c + 1]]`.
+    `labels_to_indices` and `indices_to_labels` provide read-only dictionary views of those arrays.
+    Datasets that already know their labels can provide those arrays directly with a
+    `get_bookkeeping()` method, returning a dictionary with keys `label_values` (the list of labels),
+    `label_codes`, `label_offsets`, and `label_indices`; it is used when the dataset has no
+    `target_transform`, and no scan nor file is needed.
+    Otherwise, when the wrapped dataset defines `_bookkeeping_path`, the arrays are saved as `.npy` files
+    and memory-mapped, so that DataLoader workers share them.
+
     Notes:
         For l2l to work its important that the dataset returns a (data, target) tuple.
         If your dataset doesn't return that, it should be trivial to wrap your dataset
@@ -32,6 +49,10 @@ class MetaDataset(Dataset):
     * **dataset** (Dataset) -  A torch dataset.
     * **labels_to_indices** (Dict) -  A dictionary mapping label to their indices.
                                      If not specified then we loop through all the datapoints to understand the mapping. (default: None)
+    * **num_workers** (int, *optional*, default=0) - Number of processes used to scan the
+        dataset for labels, when it provides no cheap label source. (See `create_bookkeeping`.)
+        0 scans in the current process; workers require a picklable dataset and, on platforms
+        that spawn processes, a script guarded by `if __name__ == '__main__':`.
 
     **Example**
     ~~~python
@@ -40,15 +61,23 @@ class MetaDataset(Dataset):
     ~~~
     """
 
-    def __init__(self, dataset):
+    def __init__(self, dataset, num_workers=0):
 
         if not isinstance(dataset, Dataset):
             raise TypeError(
                 "MetaDataset only accepts a torch dataset as input")
 
         self.dataset = dataset
+        self.num_workers = num_workers
 
-        if hasattr(dataset, '_bookkeeping_path'):
+        if hasattr(dataset, 'get_bookkeeping') and \
+                getattr(dataset, 'target_transform', None) is None:
+            bookkeeping = dataset.get_bookkeeping()
+            self._set_bookkeeping(list(bookkeeping['label_values']),
+                                  np.asarray(bookkeeping['label_codes'], dtype=np.int64),
+                                  np.asarray(bookkeeping['label_offsets'], dtype=np.int64),
+                                  np.asarray(bookkeeping['label_indices'], dtype=np.int64))
+        elif hasattr(dataset, '_bookkeeping_path'):
             self.load_bookkeeping(dataset._bookkeeping_path)
         else:
             self.create_bookkeeping()
@@ -59,9 +88,23 @@ class MetaDataset(Dataset):
     def __len__(self):
         return len(self.dataset)
 
+    def __getstate__(self):
+        # Memory-mapped bookkeeping arrays are reopened from their files, not copied.
+        state = self.__dict__.copy()
+        for name in ('label_codes', 'label_offsets', 'label_indices'):
+            if name in state:
+                state[name] = _portable_array(state[name])
+        return state
+
     def create_bookkeeping(self):
         """
-        Iterates over the entire dataset and creates a map of target to indices.
+        Creates a map of target to indices.
+
+        Labels are read from the cheapest available source, in order:
+
+        1. a 1-D `targets`, `labels`, or `y` array on the dataset, when it has no `target_transform`;
+        2. a `get_label(i)` method on the dataset;
+        3. a scan over the entire dataset, with `num_workers` processes.
 
         Returns: A dict with key as the label and value as list of indices.
         """
@@ -69,24 +112,24 @@ class MetaDataset(Dataset):
         assert hasattr(self.dataset, '__getitem__'), \
             'Requires iterable-style dataset.'
 
-        labels_to_indices = defaultdict(list)
-        indices_to_labels = defaultdict(int)
-        for i in range(len(self.dataset)):
-            try:
-                label = self.dataset[i][1]
-                # if label is a Tensor, then take get the scalar value
-                if hasattr(label, 'item'):
-                    label = self.dataset[i][1].item()
-            except ValueError as e:
-                raise ValueError(
-                    'Requires scalar labels. \n' + str(e))
+        labels = self._label_array()
+        if labels is None and hasattr(self.dataset, 'get_label'):
+            labels = [_scalar_label(self.dataset.get_label(i))
+                      for i in range(len(self.dataset))]
+        if labels is None:
+            labels = self._scan_labels()
 
-            labels_to_indices[label].append(i)
-            indices_to_labels[i] = label
+        label_values, label_codes = _index_labels(labels)
+        label_offsets, label_indices = _group_indices(label_codes, len(label_values))
+        self._set_bookkeeping(label_values, label_codes, label_offsets, label_indices)
 
-        self.labels_to_indices = labels_to_indices
-        self.indices_to_labels = indices_to_labels
-        self.labels = list(self.labels_to_indices.keys())
+    def _set_bookkeeping(self, label_values, label_codes, label_offsets, label_indices):
+        self.labels = list(label_values)
+        self.label_codes = label_codes
+        self.label_offsets = label_offsets
+        self.label_indices = label_indices
+        self.labels_to_indices = LabelsToIndices(self.labels, label_offsets, label_indices)
+        self.indices_to_labels = IndicesToLabels(self.labels, label_codes)
 
         self._bookkeeping = {
             'labels_to_indices': self.labels_to_indices,
@@ -94,17 +137,303 @@ class MetaDataset(Dataset):
             'labels': self.labels
         }
 
+    def _label_array(self):
+        # Returns the labels stored as an attribute of the dataset, if any.
+        if getattr(self.dataset, 'target_transform', None) is not None:
+            return None
+        candidates = [getattr(self.dataset, attr, None) for attr in LABEL_ATTRIBUTES]
+        if isinstance(self.dataset, torch.utils.data.TensorDataset) and \
+                len(self.dataset.tensors) == 2:
+            candidates.append(self.dataset.tensors[1])
+        for candidate in candidates:
+            if candidate is None or isinstance(candidate, str):
+                continue
+            if isinstance(candidate, torch.Tensor):
+                candidate = candidate.detach().cpu().numpy()
+            try:
+                candidate = np.asarray(candidate)
+            except (TypeError, ValueError):
+                continue
+            if candidate.ndim == 1 and len(candidate) == len(self.dataset) and \
+                    candidate.dtype != object:
+                return candidate
+        return None
+
+    def _scan_labels(self):
+        # Loads every sample to read its label, using num_workers worker processes if given.
+        num_workers = self.num_workers or 0
+        if multiprocessing.current_process().daemon:
+            num_workers = 0  # Daemonic processes can't have children.
+        if num_workers == 0:
+            return [_scalar_label(self.dataset[i][1])
+                    for i in range(len(self.dataset))]
+        loader = DataLoader(_LabelScan(self.dataset),
+                            batch_size=SCAN_BATCH_SIZE,
+                            num_workers=num_workers,
+                            collate_fn=list)
+        labels = []
+        for batch in loader:
+            labels.extend(batch)
+        return labels
+
     def load_bookkeeping(self, path):
-        if not os.path.exists(path):
+        array_paths = _bookkeeping_array_paths(path)
+        if all(os.path.exists(p) for p in array_paths.values()):
+            label_values = np.load(array_paths['label_values'], allow_pickle=True).tolist()
+            self._set_bookkeeping(label_values,
+                                  np.load(array_paths['label_codes'], mmap_mode='r'),
+                                  np.load(array_paths['label_offsets'], mmap_mode='r'),
+                                  np.load(array_paths['label_indices'], mmap_mode='r'))
+            return
+        if os.path.exists(path):
+            # Legacy format: pickled dictionaries.
+            with open(path, 'rb') as f:
+                bookkeeping = pickle.load(f)
+            indices_to_labels = bookkeeping['indices_to_labels']
+            labels = [indices_to_labels[i] for i in range(len(self.dataset))]
+            label_values, label_codes = _index_labels(labels)
+            label_offsets, label_indices = _group_indices(label_codes, len(label_values))
+            self._set_bookkeeping(label_values, label_codes, label_offsets, label_indices)
+        else:
             self.create_bookkeeping()
+        try:
             self.serialize_bookkeeping(path)
-        else:
-            with open(path, 'rb') as f:
-                self._bookkeeping = pickle.load(f)
-            self.labels_to_indices = self._bookkeeping['labels_to_indices']
-            self.indices_to_labels = self._bookkeeping['indices_to_labels']
-            self.labels = self._bookkeeping['labels']
+        except OSError:
+            # e.g. read-only data directory: keep the bookkeeping in memory.
+            return
+        self.load_bookkeeping(path)
 
     def serialize_bookkeeping(self, path):
-        with open(path, 'wb') as f:
-            pickle.dump(self._bookkeeping, f, protocol=-1)
+        arrays = {
+            'label_values': _label_values_array(self.labels),
+            'label_codes': self.label_codes,
+            'label_offsets': self.label_offsets,
+            'label_indices': self.label_indices,
+        }
+        for name, array_path in _bookkeeping_array_paths(path).items():
+            # Write then rename, so that concurrent readers never see partial files.
+            tmp_path = array_path + '.' + str(os.getpid()) + '.tmp'
+            try:
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, arrays[name], allow_pickle=arrays[name].dtype == object)
+                os.replace(tmp_path, array_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+
+class _LabelScan(Dataset):
+
+    # Reads only the labels of a dataset, for parallel bookkeeping.
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __getitem__(self, i):
+        return _scalar_label(self.dataset[i][1])
+
+    def __len__(self):
+        return len(self.dataset)
+
+
+def _scalar_label(label):
+    # if label is a Tensor, then take get the scalar value
+    try:
+        if hasattr(label, 'item'):
+            label = label.item()
+    except ValueError as e:
+        raise ValueError(
+            'Requires scalar labels. \n' + str(e))
+    return label
+
+
+def _index_labels(labels):
+    # Returns the distinct labels in order of first appearance, and the int64
+    # position of each sample's label in that list.
+    try:
+        array = np.asarray(labels)
+        if array.ndim != 1 or array.dtype == object:
+            raise TypeError
+        unique, first, inverse = np.unique(array,
+                                           return_index=True,
+                                           return_inverse=True)
+    except TypeError:
+        # Labels that NumPy can't sort (e.g. mixed types).
+        label_values = []
+        positions = {}
+        label_codes = np.empty(len(labels), dtype=np.int64)
+        for i, label in enumerate(labels):
+            if label not in positions:
+                positions[label] = len(label_values)
+                label_values.append(label)
+            label_codes[i] = positions[label]
+        return label_values, label_codes
+    order = np.argsort(first, kind='stable')
+    ranks = np.empty(len(unique), dtype=np.int64)
+    ranks[order] = np.arange(len(unique), dtype=np.int64)
+    label_codes = ranks[inverse.reshape(-1)]
+    label_values = unique[order].tolist()
+    return label_values, label_codes
+
+
+def _group_indices(label_codes, num_labels):
+    # CSR-style grouping: indices of label c are indices[offsets[c]:offsets[c + 1]].
+    label_indices = np.argsort(label_codes, kind='stable').astype(np.int64)
+    label_offsets = np.zeros(num_labels + 1, dtype=np.int64)
+    np.cumsum(np.bincount(label_codes, minlength=num_labels), out=label_offsets[1:])
+    return label_offsets, label_indices
+
+
+def _label_values_array(labels):
+    array = np.asarray(labels)
+    if array.ndim != 1:
+        array = np.empty(len(labels), dtype=object)
+        for i, label in enumerate(labels):
+            array[i] = label
+    return array
+
+
+class _MappedArray(object):
+
+    # Pickles a memory-mapped array as its file, which is reopened read-only when unpickled.
+
+    def __init__(self, array):
+        self.args = (array.filename,
+                     array.dtype.str,
+                     array.shape,
+                     array.offset,
+                     'F' if array.flags.f_contiguous and not array.flags.c_contiguous else 'C')
+
+    def __reduce__(self):
+        return _open_mapped_array, self.args
+
+
+def _open_mapped_array(filename, dtype, shape, offset, order):
+    return np.memmap(filename, dtype=dtype, mode='r', shape=shape, offset=offset, order=order)
+
+
+def _portable_array(array):
+    # Returns array, or a stand-in that pickles it by path if it maps a whole file region.
+    if isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and \
+            array.filename is not None:
+        return _MappedArray(array)
+    return array
+
+
+def _bookkeeping_array_paths(path):
+    root = path[:-len('.pkl')] if path.endswith('.pkl') else path
+    return {name: root + '-' + name.replace('_', '-') + '.npy'
+            for name in BOOKKEEPING_ARRAYS}
+
+
+@cython.final
+cdef class LabelsToIndices:
+
+    """
+    Read-only dictionary view mapping each label to the list of its indices.
+    """
+
+    cdef public:
+        list labels
+        object label_offsets
+        object label_indices
+        dict positions
+
+    def __init__(self, list labels, label_offsets, label_indices):
+        self.labels = labels
+        self.label_offsets = label_offsets
+        self.label_indices = label_indices
+        self.positions = {label: i for i, label in enumerate(labels)}
+
+    def __reduce__(self):
+        return LabelsToIndices, (self.labels,
+                                 _portable_array(self.label_offsets),
+                                 _portable_array(self.label_indices))
+
+    def indices(self, label):
+        # Returns the indices of label as an array view.
+        cdef long position = self.positions[label]
+        return self.label_indices[self.label_offsets[position]:self.label_offsets[position + 1]]
+
+    def __getitem__(self, label):
+        return self.indices(label).tolist()
+
+    def get(self, label, default=None):
+        if label in self.positions:
+            return self[label]
+        return default
+
+    def __contains__(self, label):
+        return label in self.positions
+
+    def __iter__(self):
+        return iter(self.labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def keys(self):
+        return list(self.labels)
+
+    def values(self):
+        return [self[label] for label in self.labels]
+
+    def items(self):
+        return [(label, self[label]) for label in self.labels]
+
+
+@cython.final
+cdef class IndicesToLabels:
+
+    """
+    Read-only dictionary view mapping each index to its label.
+
+    Like the `defaultdict(int)` it replaces, it returns 0 for indices outside of the dataset.
+    """
+
+    cdef public:
+        list labels
+        object label_codes
+    cdef const long long[:] codes
+
+    def __init__(self, list labels, label_codes):
+        self.labels = labels
+        self.label_codes = label_codes
+        self.codes = np.asarray(label_codes, dtype=np.longlong)
+
+    def __reduce__(self):
+        return IndicesToLabels, (self.labels, _portable_array(self.label_codes))
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    def __getitem__(self, i):
+        if i not in self:
+            return 0
+        return self.labels[self.codes[i]]
+
+    def get(self, i, default=None):
+        if i in self:
+            return self[i]
+        return default
+
+    def __contains__(self, i):
+        return isinstance(i, (int, np.integer)) and 0 <= i < self.codes.shape[0]
+
+    def __iter__(self):
+        return iter(range(self.codes.shape[0]))
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    def keys(self):
+        return range(self.codes.shape[0])
+
+    def values(self):
+        return [self.labels[c] for c in self.codes]
+
+    def items(self):
+        return [(i, self.labels[self.codes[i]]) for i in range(self.codes.shape[0])]
+
+
+Mapping.register(LabelsToIndices)
+Mapping.register(IndicesToLabels)
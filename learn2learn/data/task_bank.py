@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+"""
+Fixed sets of tasks, rendered once and memory-mapped from disk.
+"""
+
+import os
+import json
+import random
+import shutil
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+METADATA_FILE = 'metadata.json'
+OFFSETS_FILE = 'offsets.npy'
+
+
+class TaskBank(Dataset):
+
+    """
+    [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/data/task_bank.py)
+
+    **Description**
+
+    A fixed set of tasks stored in memory-mapped files.
+
+    The tasks are stored field by field (e.g. data and labels): the samples of all tasks are
+    concatenated in one file per field, and task `i` spans samples `offsets[i]:offsets[i + 1]`.
+    Indexing a TaskBank returns tensors that are views of the memory-mapped files, so tasks are
+    read from disk (or the page cache) without being re-sampled, re-loaded or re-collated,
+    and processes that open the same bank share its pages.
+    The bank is opened copy-on-write: modifying a returned tensor does not modify the files.
+
+    Banks are usually created with `TaskDataset.materialize(path)`, or `TaskBank.build()`.
+
+    **Arguments**
+
+    * **path** (str) - Directory of the bank.
+
+    **Example**
+    ~~~python
+    test_tasks = l2l.data.TaskDataset(dataset, transforms, num_tasks=600)
+    test_tasks = test_tasks.materialize('~/data/mini-imagenet-test-tasks')
+    for task in test_tasks:
+        X, y = task
+    ~~~
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        with open(os.path.join(self.path, METADATA_FILE), 'r') as f:
+            self.metadata = json.load(f)
+        self.offsets = np.load(os.path.join(self.path, OFFSETS_FILE))
+        num_samples = int(self.offsets[-1])
+        self.fields = []
+        for i, field in enumerate(self.metadata['fields']):
+            shape = (num_samples, ) + tuple(field['shape'])
+            dtype = np.dtype(field['dtype'])
+            if num_samples * int(np.prod(field['shape'])) == 0:
+                array = np.empty(shape, dtype=dtype)  # Empty files can't be memory-mapped.
+            else:
+                array = np.memmap(_field_path(self.path, i), dtype=dtype, mode='c', shape=shape)
+            self.fields.append(array)
+
+    @staticmethod
+    def build(taskset, path, dtypes=None):
+        """
+        **Description**
+
+        Renders every task of `taskset` and stores them in a new bank at `path`.
+
+        If a bank already exists at `path`, it is opened instead, so the tasks are rendered once
+        across runs. It must hold as many tasks as `taskset`, with the same number of samples and
+        fields (shapes and stored dtypes) as its first task, otherwise a `ValueError` is raised;
+        use a path that identifies the tasks (e.g. their number, ways, shots, and seed).
+        Every task must be a tensor or a list/tuple of tensors (or arrays) with the
+        same number of samples, such as the `[X, y]` batches of `TaskDataset`.
+
+        **Arguments**
+
+        * **taskset** (TaskDataset) - The tasks to render; `num_tasks` must be positive.
+        * **path** (str) - Directory of the bank.
+        * **dtypes** (list, *optional*, default=None) - dtype in which to store each field
+            (e.g. `[torch.uint8, None]` for images with integer values in [0, 255]);
+            `None` keeps the dtype of the field. Values are cast without checks.
+        """
+        path = os.path.expanduser(path)
+        if getattr(taskset, 'num_tasks', 0) == -1:
+            raise ValueError('Only a finite number of tasks (num_tasks > 0) can be materialized.')
+        if os.path.exists(os.path.join(path, METADATA_FILE)):
+            bank = TaskBank(path)
+            _check_bank(bank, taskset, dtypes, path)
+            return bank
+
+        # Write in a temporary directory then rename, so that readers never see partial banks.
+        tmp_path = path.rstrip(os.sep) + '.' + str(os.getpid()) + '.tmp'
+        os.makedirs(tmp_path, exist_ok=True)
+        try:
+            fields = None
+            offsets = [0]
+            files = []
+            for i in range(len(taskset)):
+                task = _task_fields(taskset[i], dtypes)
+                if fields is None:
+                    fields = [{'dtype': t.dtype.str, 'shape': list(t.shape[1:])} for t in task]
+                    files = [open(_field_path(tmp_path, j), 'wb') for j in range(len(task))]
+                _check_task(task, fields, i)
+                for t, f in zip(task, files):
+                    f.write(np.ascontiguousarray(t).tobytes())
+                offsets.append(offsets[-1] + len(task[0]))
+            for f in files:
+                f.close()
+            files = []
+            np.save(os.path.join(tmp_path, OFFSETS_FILE), np.array(offsets, dtype=np.int64))
+            metadata = {
+                'num_tasks': len(offsets) - 1,
+                'fields': fields if fields is not None else [],
+            }
+            with open(os.path.join(tmp_path, METADATA_FILE), 'w') as f:
+                json.dump(metadata, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            for f in files:
+                f.close()
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if os.path.exists(os.path.join(path, METADATA_FILE)):
+                return TaskBank(path)  # Built concurrently by another process.
+            raise
+        return TaskBank(path)
+
+    def __getstate__(self):
+        # Worker processes re-open the memory maps instead of copying them.
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError('Task index out of range.')
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return [torch.from_numpy(field[start:end]) for field in self.fields]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def sample(self):
+        """
+        **Description**
+
+        Randomly samples a task from the TaskBank.
+        """
+        i = random.randint(0, len(self) - 1)
+        return self[i]
+
+
+def _field_path(path, i):
+    return os.path.join(path, 'field-' + str(i) + '.bin')
+
+
+def _task_fields(task, dtypes=None):
+    if isinstance(task, (torch.Tensor, np.ndarray)):
+        task = [task]
+    if not isinstance(task, (list, tuple)):
+        raise TypeError('Tasks must be tensors or lists of tensors to be materialized.')
+    if dtypes is None:
+        dtypes = [None] * len(task)
+    if len(dtypes) != len(task):
+        raise ValueError('dtypes must have one entry per field of the tasks.')
+    fields = []
+    for field, dtype in zip(task, dtypes):
+        if isinstance(field, torch.Tensor):
+            field = field.detach().cpu().numpy()
+        field = np.asarray(field)
+        if field.ndim == 0 or field.dtype == object:
+            raise TypeError('Tasks must be tensors or lists of tensors to be materialized.')
+        if dtype is not None:
+            if isinstance(dtype, torch.dtype):
+                dtype = torch.empty((), dtype=dtype).numpy().dtype
+            field = field.astype(dtype, copy=False)
+        fields.append(field)
+    return fields
+
+
+def _check_bank(bank, taskset, dtypes, path):
+    # Checks that an existing bank holds the tasks of taskset, as far as their number, and the
+    # number of samples and fields of the first task, go.
+    if len(bank) != len(taskset):
+        raise ValueError('The bank at ' + path + ' holds ' + str(len(bank)) + ' tasks, not '
+                         + str(len(taskset)) + '. Use another path, or delete it to rebuild it.')
+    if len(taskset) > 0:
+        task = _task_fields(taskset[0], dtypes)
+        fields = bank.metadata['fields']
+        num_samples = int(bank.offsets[1] - bank.offsets[0])
+        if len(task) != len(fields) or len(task[0]) != num_samples or \
+                any(t.dtype.str != field['dtype'] or list(t.shape[1:]) != field['shape']
+                    for t, field in zip(task, fields)):
+            raise ValueError('The tasks of the bank at ' + path + ' do not have the shapes or dtypes of '
+                             + 'the tasks to materialize. Use another path, or delete it to rebuild it.')
+
+
+def _check_task(task, fields, i):
+    if len(task) != len(fields) or any(len(t) != len(task[0]) for t in task):
+        raise ValueError('Task ' + str(i) + ' does not have the same fields as the first task.')
+    for t, field in zip(task, fields):
+        if t.dtype.str != field['dtype'] or list(t.shape[1:]) != field['shape']:
+            raise ValueError('Task ' + str(i) + ' does not have the same shapes or dtypes as the first task.')
@@ -7,3 +7,13 @@ cdef class DataDescription:
         long index
         list transforms
 
+
+
+cdef class TaskDescription:
+
+    cdef public:
+        object indices
+        object transform_ids
+        list pipelines
+
+    cpdef list to_list(self)
@@ -8,12 +8,17 @@ General wrapper to help create tasks.
 cimport cython
 import random
 import copy
+import numpy as np
+import torch
 
 from torch.utils.data import Dataset
 from torch.utils.data._utils import collate
 
 import learn2learn as l2l
 
+# Generator of the task description being sampled, read by the random task transforms.
+_active_generator = None
+
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
@@ -28,6 +33,33 @@ cdef list fast_allocate(long n):
     return result
 
 
+def task_generator(seed, task_id):
+    """
+    **Description**
+
+    Returns the `random.Random` generator of task `task_id` in the counter-based mode of
+    `TaskDataset`: its state is a pure function of `(seed, task_id)`.
+
+    **Arguments**
+
+    * **seed** (int) - Non-negative seed of the task stream.
+    * **task_id** (int) - Non-negative index of the task in the stream.
+    """
+    state = np.random.SeedSequence([seed, task_id]).generate_state(4, dtype=np.uint64)
+    return random.Random(int.from_bytes(state.tobytes(), 'little'))
+
+
+cdef _apply_transform(transform, description):
+    # Task transforms that implement describe() accept and return TaskDescription;
+    # the others receive a list of DataDescription.
+    describe = getattr(transform, 'describe', None)
+    if describe is not None:
+        return describe(description)
+    if isinstance(description, TaskDescription):
+        description = description.to_list()
+    return transform(description)
+
+
 cdef class DataDescription:
 
     """
@@ -47,6 +79,113 @@ cdef class DataDescription:
         self.transforms = []
 
 
+cdef class TaskDescription:
+
+    """
+    [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/data/task_dataset.py)
+
+    **Description**
+
+    Array-based task description.
+
+    Equivalent to a list of `DataDescription`, where sample `i` has index `indices[i]` and
+    transforms `pipelines[transform_ids[i]]`.
+    Built-in task transforms operate on this representation with NumPy array operations;
+    `TaskDataset` only converts it to a list of `DataDescription` (via `to_list()`) for
+    task transforms that do not implement `describe()`.
+
+    **Arguments**
+
+    * **indices** (array) - The indices of the samples in the dataset.
+    * **transform_ids** (array, *optional*, default=None) - For each sample, the position of its
+        list of transforms in `pipelines`. Defaults to zeros.
+    * **pipelines** (list, *optional*, default=None) - List of lists of transforms. Defaults to
+        a single, empty list.
+
+    **Example**
+    ~~~python
+    description = TaskDescription(np.arange(len(dataset)))
+    description.add_transform(lambda x: dataset[x])
+    task_description = description.to_list()
+    ~~~
+    """
+
+    def __init__(self, indices, transform_ids=None, list pipelines=None):
+        self.indices = np.asarray(indices, dtype=np.int64)
+        if transform_ids is None:
+            transform_ids = np.zeros(len(self.indices), dtype=np.int64)
+        if pipelines is None:
+            pipelines = [[]]
+        self.transform_ids = np.asarray(transform_ids, dtype=np.int64)
+        self.pipelines = pipelines
+
+    @staticmethod
+    def from_list(list task_description):
+        """
+        **Description**
+
+        Converts a list of `DataDescription` into a `TaskDescription`.
+        """
+        cdef DataDescription dd
+        cdef long n = len(task_description)
+        indices = np.fromiter((dd.index for dd in task_description), dtype=np.int64, count=n)
+        pipelines = [dd.transforms for dd in task_description]
+        return TaskDescription(indices, np.arange(n, dtype=np.int64), pipelines)
+
+    def __reduce__(self):
+        return TaskDescription, (self.indices, self.transform_ids, self.pipelines)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def take(self, positions):
+        """
+        **Description**
+
+        Returns the task description restricted to the given positions (or boolean mask).
+        """
+        return TaskDescription(self.indices[positions],
+                               self.transform_ids[positions],
+                               self.pipelines)
+
+    def add_transform(self, transform, positions=None):
+        """
+        **Description**
+
+        Appends `transform` to the transforms of the samples at `positions` (defaults to all samples).
+        """
+        # Pipelines are shared with the descriptions they were taken from, so they are never modified in place.
+        if positions is None:
+            self.pipelines = [pipeline + [transform] for pipeline in self.pipelines]
+            return
+        ids = self.transform_ids[positions]
+        unique, inverse = np.unique(ids, return_inverse=True)
+        transform_ids = self.transform_ids.copy()
+        transform_ids[positions] = len(self.pipelines) + inverse.reshape(-1)
+        self.pipelines = self.pipelines + [self.pipelines[i] + [transform] for i in unique.tolist()]
+        self.transform_ids = transform_ids
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cpdef list to_list(self):
+        """
+        **Description**
+
+        Returns the equivalent list of `DataDescription`.
+        """
+        cdef list indices = self.indices.tolist()
+        cdef list transform_ids = self.transform_ids.tolist()
+        cdef long n = len(indices)
+        cdef list result = [None] * n
+        cdef DataDescription dd
+        cdef long i
+        for i in range(n):
+            dd = DataDescription(indices[i])
+            dd.transforms = list(self.pipelines[transform_ids[i]])
+            result[i] = dd
+        return result
+
+
 class TaskDataset(CythonTaskDataset):
 
     """
@@ -65,6 +204,19 @@ class TaskDataset(CythonTaskDataset):
     new ones.
     In this case, the length of the TaskDataset is set to 1.
 
+    When `seed` is given, task `i` is sampled with the generator `task_generator(seed, i)` instead of
+    the global `random` module, so that it is a pure function of `(seed, i)` (provided the random
+    task transforms are the built-in ones, without their own `generator`).
+    Any process can then generate any task independently, with no need to share descriptions:
+    for infinite TaskDatasets, indexing returns task `i` of the stream, and `sample()` and
+    iteration return consecutive tasks.
+
+    In distributed training, `rank` and `world_size` shard the tasks across processes: the TaskDataset
+    of rank `r` holds tasks `r, r + world_size, r + 2 * world_size, ...` of the (finite or infinite)
+    global sequence of tasks, and its length is its share of `num_tasks`.
+    Since each rank generates its own tasks, sharding requires `seed`, so that ranks agree on the
+    global sequence and their tasks are disjoint.
+
     For more information on tasks and task descriptions, please refer to the
     documentation of task transforms.
 
@@ -73,6 +225,11 @@ class TaskDataset(CythonTaskDataset):
     * **dataset** (Dataset) - Dataset of data to compute tasks.
     * **task_transforms** (list, *optional*, default=None) - List of task transformations.
     * **num_tasks** (int, *optional*, default=-1) - Number of tasks to generate.
+    * **task_collate** (callable, *optional*, default=None) - Collates the samples of a task.
+        Defaults to PyTorch's default collate.
+    * **seed** (int, *optional*, default=None) - Seed of the counter-based mode.
+    * **rank** (int, *optional*, default=0) - Rank of this process.
+    * **world_size** (int, *optional*, default=1) - Number of processes sharing the tasks.
 
     **Example**
     ~~~python
@@ -88,12 +245,22 @@ class TaskDataset(CythonTaskDataset):
     ~~~
     """
 
-    def __init__(self, dataset, task_transforms=None, num_tasks=-1, task_collate=None):
+    def __init__(self,
+                 dataset,
+                 task_transforms=None,
+                 num_tasks=-1,
+                 task_collate=None,
+                 seed=None,
+                 rank=0,
+                 world_size=1):
         super(TaskDataset, self).__init__(
             dataset=dataset,
             task_transforms=task_transforms,
             num_tasks=num_tasks,
             task_collate=task_collate,
+            seed=seed,
+            rank=rank,
+            world_size=world_size,
         )
 
 
@@ -105,9 +272,19 @@ cdef class CythonTaskDataset:
         object task_collate
         dict sampled_descriptions
         int num_tasks
-        int _task_id
-
-    def __init__(self, dataset, task_transforms=None, int num_tasks=-1, task_collate=None):
+        object seed
+        int rank
+        int world_size
+        long _task_id
+
+    def __init__(self,
+                 dataset,
+                 task_transforms=None,
+                 int num_tasks=-1,
+                 task_collate=None,
+                 seed=None,
+                 int rank=0,
+                 int world_size=1):
         if not isinstance(dataset, l2l.data.MetaDataset):
             dataset = l2l.data.MetaDataset(dataset)
         if task_transforms is None:
@@ -116,26 +293,56 @@ cdef class CythonTaskDataset:
             task_collate = collate.default_collate
         if num_tasks < -1 or num_tasks == 0:
             raise ValueError('num_tasks needs to be -1 (infinity) or positive.')
+        if seed is not None and seed < 0:
+            raise ValueError('seed needs to be non-negative.')
+        if world_size < 1 or rank < 0 or rank >= world_size:
+            raise ValueError('rank needs to be in [0, world_size).')
+        if world_size > 1 and seed is None:
+            raise ValueError('Sharding tasks across ranks requires a seed.')
+        if num_tasks != -1 and num_tasks < world_size:
+            raise ValueError('num_tasks needs to be at least world_size.')
         self.dataset = dataset
         self.num_tasks = num_tasks
         self.task_transforms = task_transforms
         self.sampled_descriptions = {}  # Maps indices to tasks' description dict
         self.task_collate = task_collate
+        self.seed = seed
+        self.rank = rank
+        self.world_size = world_size
         self._task_id = 0
 
-    cpdef sample_task_description(self):
-        #  Samples a new task description.
+    cpdef sample_task_description(self, generator=None):
+        #  Samples a new task description, with random numbers from generator if given.
         # cdef list description = fast_allocate(len(self.dataset))
+        global _active_generator
         description = None
-        if callable(self.task_transforms):
-            return self.task_transforms(description)
-        for transform in self.task_transforms:
-            description = transform(description)
-        return description
+        previous_generator = _active_generator
+        if generator is not None:
+            _active_generator = generator
+        try:
+            if callable(self.task_transforms):
+                return _apply_transform(self.task_transforms, description)
+            for transform in self.task_transforms:
+                description = _apply_transform(transform, description)
+            return description
+        finally:
+            _active_generator = previous_generator
 
     def get_task(self, task_description):
         #  Given a task description, creates the corresponding batch of data.
         all_data = []
+        if isinstance(task_description, TaskDescription):
+            task = self._get_task_batch(task_description)
+            if task is not None:
+                return task
+            pipelines = task_description.pipelines
+            for index, transform_id in zip(task_description.indices.tolist(),
+                                           task_description.transform_ids.tolist()):
+                data = index
+                for transform in pipelines[transform_id]:
+                    data = transform(data)
+                all_data.append(data)
+            return self.task_collate(all_data)
         for data_description in task_description:
             data = data_description.index
             for transform in data_description.transforms:
@@ -143,18 +350,75 @@ cdef class CythonTaskDataset:
             all_data.append(data)
         return self.task_collate(all_data)
 
-    def sample(self):
+    def _get_task_batch(self, TaskDescription task_description):
+        # Loads and collates a whole task at once, when all samples share the same transforms
+        # and those implement batch(). Returns None otherwise.
+        if self.task_collate is not collate.default_collate or len(task_description) == 0:
+            return None
+        transform_ids = task_description.transform_ids
+        if len(task_description.pipelines) > 1 and not (transform_ids == transform_ids[0]).all():
+            return None
+        transforms = task_description.pipelines[transform_ids[0]]
+        batch_transforms = [getattr(transform, 'batch', None) for transform in transforms]
+        if len(batch_transforms) == 0 or any(t is None for t in batch_transforms):
+            return None
+        data = torch.tensor(task_description.indices)
+        for transform in batch_transforms:
+            data = transform(data)
+        if isinstance(data, tuple):
+            data = list(data)
+        return data
+
+    def materialize(self, path, dtypes=None):
+        """
+        **Description**
+
+        Renders the tasks of this TaskDataset once and returns them as a memory-mapped `TaskBank`
+        stored at `path`.
+
+        If a bank already exists at `path`, it is returned after checking that it has as many
+        tasks, with the same fields, as this TaskDataset. (See `TaskBank.build`.)
+
+        **Arguments**
+
+        * **path** (str) - Directory of the bank.
+        * **dtypes** (list, *optional*, default=None) - dtype in which to store each field of the
+            tasks, or `None` to keep it.
+
+        **Example**
+        ~~~python
+        test_tasks = TaskDataset(dataset, transforms, num_tasks=600)
+        test_tasks = test_tasks.materialize('~/data/test-tasks')
+        X, y = test_tasks.sample()
+        ~~~
+        """
+        return l2l.data.TaskBank.build(self, path, dtypes=dtypes)
+
+    def sample(self, generator=None):
         """
         **Description**
 
         Randomly samples a task from the TaskDataset.
 
+        In the counter-based mode of infinite TaskDatasets, returns the next task of the stream
+        unless a generator is given.
+
+        **Arguments**
+
+        * **generator** (random.Random, *optional*, default=None) - Source of random numbers.
+            Defaults to the global `random` module.
+
         **Example**
         ~~~python
         X, y = taskset.sample()
         ~~~
         """
-        i = random.randint(0, len(self) - 1)
+        if self.num_tasks == -1 and generator is None and self.seed is not None:
+            return next(self)
+        # Infinite TaskDatasets also draw an index, to keep the random streams of earlier versions.
+        i = (random if generator is None else generator).randint(0, len(self) - 1)
+        if self.num_tasks == -1:
+            return self.get_task(self.sample_task_description(generator))
         return self[i]
 
     def __len__(self):
@@ -162,25 +426,44 @@ cdef class CythonTaskDataset:
             # Ok to return 1, since __iter__ will run forever
             # and __getitem__ will always resample.
             return 1
-        return self.num_tasks
+        return (self.num_tasks - self.rank + self.world_size - 1) // self.world_size
+
+    def global_task_id(self, i):
+        """
+        **Description**
+
+        Returns the position of this rank's `i`-th task in the global sequence of tasks.
+        """
+        return self.rank + i * self.world_size
 
     def __getitem__(self, i):
         if self.num_tasks == -1:
+            if self.seed is not None:
+                generator = task_generator(self.seed, self.global_task_id(i))
+                return self.get_task(self.sample_task_description(generator))
             return self.get_task(self.sample_task_description())
         if i not in self.sampled_descriptions:
-            self.sampled_descriptions[i] = self.sample_task_description()
+            generator = None
+            if self.seed is not None:
+                generator = task_generator(self.seed, self.global_task_id(i))
+            self.sampled_descriptions[i] = self.sample_task_description(generator)
         task_description = self.sampled_descriptions[i]
         return self.get_task(task_description)
 
     def __iter__(self):
-        self._task_id = 0
+        if self.num_tasks != -1 or self.seed is None:
+            # Infinite counter-based streams continue where they left off.
+            self._task_id = 0
         return self
 
     def __next__(self):
         if self.num_tasks == -1:
+            if self.seed is not None:
+                self._task_id += 1
+                return self[self._task_id - 1]
             return self.get_task(self.sample_task_description())
 
-        if self._task_id < self.num_tasks:
+        if self._task_id < len(self):
             task = self[self._task_id]
             self._task_id += 1
             return task
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+
+"""
+Multi-process task prefetching for TaskDataset.
+"""
+
+import time
+import queue
+import random
+import collections
+import traceback
+
+import numpy as np
+import torch
+import torch.multiprocessing as multiprocessing
+
+WORKER_POLL_INTERVAL = 5.0
+
+
+class TaskLoader(object):
+
+    """
+    [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/data/task_loader.py)
+
+    **Description**
+
+    Iterates over the tasks of a TaskDataset, generating them in worker processes.
+
+    Each of the `num_workers` processes samples task descriptions and loads full tasks
+    (a task is not split across workers), with its own random seed: worker `w` seeds `random`,
+    `numpy` and `torch` with `seed + w`.
+    Workers are served task requests in round-robin and at most `prefetch_factor` tasks per worker
+    are in flight, so tasks are returned in a deterministic order for a given seed.
+
+    If the TaskDataset is finite (`num_tasks > 0`), iterating returns its `num_tasks` tasks once
+    (optionally shuffled). Their descriptions are sampled upfront so that every worker, and every
+    epoch, agrees on what task `i` is.
+    If it is infinite (`num_tasks=-1`), iterating never stops and `sample()` returns the next task;
+    prefetched tasks carry over from one iterator to the next.
+    In the counter-based mode of TaskDataset (`seed` given), workers are instead asked for
+    explicit task ids and descriptions are not sampled upfront: the tasks then only depend on the
+    TaskDataset's seed, not on the number of workers.
+
+    With `shared_memory=True`, each worker copies its tasks into a ring of `prefetch_factor + 1`
+    shared-memory slabs, allocated once and recycled, and only the slab number and shapes go
+    through the result queue; the returned tensors are views of the slabs.
+    Such a task is overwritten when its worker produces a later task into the same slab, that is
+    once the following `num_workers` tasks have been received: loops like `for X, y in loader`
+    are safe, but tasks kept longer must be cloned.
+
+    `stats` reports how often the consumer found the next task not ready yet ("starved"),
+    and how long it waited for tasks in total.
+
+    **Arguments**
+
+    * **taskset** (TaskDataset) - The tasks to load.
+    * **num_workers** (int, *optional*, default=0) - Number of worker processes.
+        With 0, tasks are generated in the main process, with its random state.
+    * **prefetch_factor** (int, *optional*, default=2) - Number of tasks in flight per worker.
+    * **pin_memory** (bool, *optional*, default=False) - Whether to copy tasks in page-locked
+        memory, when CUDA is available.
+    * **shuffle** (bool, *optional*, default=False) - Whether to shuffle the order of finite tasks.
+    * **seed** (int, *optional*, default=None) - Base seed of the workers.
+        Defaults to a seed drawn from `torch`'s random state.
+    * **shared_memory** (bool, *optional*, default=False) - Whether workers write tasks into
+        recycled shared-memory slabs instead of sending new tensors.
+
+    **Example**
+    ~~~python
+    tasks = l2l.data.TaskDataset(dataset, transforms, num_tasks=-1)
+    loader = l2l.data.TaskLoader(tasks, num_workers=4, pin_memory=True)
+    for iteration in range(num_iterations):
+        X, y = loader.sample()
+    print(loader.stats)
+    ~~~
+    """
+
+    def __init__(self,
+                 taskset,
+                 num_workers=0,
+                 prefetch_factor=2,
+                 pin_memory=False,
+                 shuffle=False,
+                 seed=None,
+                 shared_memory=False):
+        if num_workers < 0:
+            raise ValueError('num_workers needs to be non-negative.')
+        if prefetch_factor < 1:
+            raise ValueError('prefetch_factor needs to be positive.')
+        if seed is None:
+            seed = int(torch.empty((), dtype=torch.int64).random_().item())
+        self.taskset = taskset
+        self.num_workers = num_workers
+        self.prefetch_factor = prefetch_factor
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+        self.shuffle = shuffle
+        self.seed = seed
+        self.shared_memory = shared_memory
+        self.stats = {'tasks': 0, 'starved': 0, 'wait_time': 0.0}
+        self._rng = random.Random(seed)
+        self._workers = []
+        self._index_queues = []
+        self._result_queues = []
+        self._in_flight = collections.deque()  # Worker ids, in request order.
+        self._next_worker = 0
+        self._stream_id = 0  # Next task id of counter-based infinite streams.
+        self._slabs = []  # Parent views of each worker's slabs, by slot.
+        self._infinite_iterator = None
+
+    def _is_infinite(self):
+        return getattr(self.taskset, 'num_tasks', None) == -1
+
+    def _is_counter_based(self):
+        return getattr(self.taskset, 'seed', None) is not None
+
+    def __len__(self):
+        if self._is_infinite():
+            raise TypeError('An infinite TaskLoader has no length.')
+        return len(self.taskset)
+
+    def __iter__(self):
+        if self.num_workers == 0:
+            return self._iter_main()
+        self._start_workers()
+        if self._is_infinite():
+            return self._iter_infinite()
+        return self._iter_finite()
+
+    def __next__(self):
+        return self.sample()
+
+    def sample(self):
+        """
+        **Description**
+
+        Returns the next task of an infinite TaskLoader, or a random task of a finite one.
+        """
+        if not self._is_infinite():
+            return self._postprocess(self.taskset.sample())
+        if self._infinite_iterator is None:
+            self._infinite_iterator = iter(self)
+        return next(self._infinite_iterator)
+
+    def _iter_main(self):
+        if self._is_infinite():
+            while True:
+                yield self._postprocess(self.taskset.sample())
+        for i in self._order():
+            yield self._postprocess(self.taskset[i])
+
+    def _iter_infinite(self):
+        while True:
+            while len(self._in_flight) < self.num_workers * self.prefetch_factor:
+                if self._is_counter_based():
+                    self._request(self._stream_id)
+                    self._stream_id += 1
+                else:
+                    self._request(None)
+            yield self._receive()
+
+    def _iter_finite(self):
+        self._drain()
+        order = self._order()
+        position = 0
+        while position < len(order) or len(self._in_flight) > 0:
+            while position < len(order) and \
+                    len(self._in_flight) < self.num_workers * self.prefetch_factor:
+                self._request(order[position])
+                position += 1
+            yield self._receive()
+
+    def _order(self):
+        # Samples all task descriptions in this process, so workers agree on them.
+        taskset = self.taskset
+        sampled_descriptions = getattr(taskset, 'sampled_descriptions', None)
+        if sampled_descriptions is not None and not self._is_counter_based():
+            for i in range(len(taskset)):
+                if i not in sampled_descriptions:
+                    sampled_descriptions[i] = taskset.sample_task_description()
+        order = list(range(len(taskset)))
+        if self.shuffle:
+            self._rng.shuffle(order)
+        return order
+
+    def _start_workers(self):
+        if len(self._workers) > 0:
+            return
+        if not self._is_infinite():
+            self._order()
+        num_slots = self.prefetch_factor + 1 if self.shared_memory else 0
+        for worker_id in range(self.num_workers):
+            index_queue = multiprocessing.Queue()
+            result_queue = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=_worker_loop,
+                                             args=(self.taskset,
+                                                   self.seed + worker_id,
+                                                   index_queue,
+                                                   result_queue,
+                                                   num_slots))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+            self._index_queues.append(index_queue)
+            self._result_queues.append(result_queue)
+            self._slabs.append([{} for _ in range(num_slots)])
+
+    def _request(self, index):
+        worker_id = self._next_worker
+        self._next_worker = (self._next_worker + 1) % self.num_workers
+        self._index_queues[worker_id].put(index)
+        self._in_flight.append(worker_id)
+
+    def _receive(self):
+        worker_id = self._in_flight.popleft()
+        result_queue = self._result_queues[worker_id]
+        try:
+            result = result_queue.get_nowait()
+        except queue.Empty:
+            self.stats['starved'] += 1
+            start = time.perf_counter()
+            result = self._wait(worker_id)
+            self.stats['wait_time'] += time.perf_counter() - start
+        task = self._unpack(worker_id, result)
+        self.stats['tasks'] += 1
+        return self._postprocess(task)
+
+    def _unpack(self, worker_id, result):
+        kind, payload = result
+        if kind == 'error':
+            self.close()
+            raise RuntimeError('Error in TaskLoader worker ' + str(worker_id) + ':\n' + payload)
+        if kind == 'slot':
+            payload = self._slot_views(worker_id, *payload)
+        return payload
+
+    def _slot_views(self, worker_id, slot, new_slabs, layout):
+        slabs = self._slabs[worker_id][slot]
+        slabs.update(new_slabs)
+        return _from_layout(layout, slabs)
+
+    def _wait(self, worker_id):
+        while True:
+            try:
+                return self._result_queues[worker_id].get(timeout=WORKER_POLL_INTERVAL)
+            except queue.Empty:
+                if not self._workers[worker_id].is_alive():
+                    self.close()
+                    raise RuntimeError('TaskLoader worker ' + str(worker_id) + ' exited unexpectedly.')
+
+    def _drain(self):
+        # Discards the tasks requested by an unfinished iterator.
+        # They still go through _unpack: they may carry new slabs, or report an error.
+        while len(self._in_flight) > 0:
+            worker_id = self._in_flight.popleft()
+            self._unpack(worker_id, self._wait(worker_id))
+
+    def _postprocess(self, task):
+        if self.pin_memory:
+            task = _pin_memory(task)
+        return task
+
+    def close(self):
+        """
+        **Description**
+
+        Stops the worker processes. They are restarted when iterating again.
+        """
+        for index_queue in self._index_queues:
+            index_queue.put(_STOP)
+        for worker in self._workers:
+            worker.join(timeout=WORKER_POLL_INTERVAL)
+            if worker.is_alive():
+                worker.terminate()
+        for q in self._index_queues + self._result_queues:
+            q.cancel_join_thread()
+            q.close()
+        self._workers = []
+        self._index_queues = []
+        self._result_queues = []
+        self._slabs = []
+        self._in_flight.clear()
+        self._next_worker = 0
+        self._infinite_iterator = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+_STOP = 'stop'
+
+
+def _worker_loop(taskset, seed, index_queue, result_queue, num_slots):
+    ring = _SlabRing(num_slots) if num_slots > 0 else None
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    torch.manual_seed(seed)
+    torch.set_num_threads(1)
+    while True:
+        index = index_queue.get()
+        if isinstance(index, str) and index == _STOP:
+            break
+        try:
+            if index is None:
+                task = taskset.get_task(taskset.sample_task_description())
+            else:
+                task = taskset[index]
+            if ring is not None:
+                result_queue.put(('slot', ring.write(task)))
+            else:
+                result_queue.put(('task', task))
+        except Exception:
+            result_queue.put(('error', traceback.format_exc()))
+
+
+class _SlabRing(object):
+
+    # Worker-side ring of shared-memory slabs, one flat tensor per task field and slot.
+    # Slabs are only (re)allocated when a field outgrows them, and only then sent to the parent.
+
+    def __init__(self, num_slots):
+        self.slots = [{} for _ in range(num_slots)]
+        self.counter = 0
+
+    def write(self, task):
+        slot = self.counter % len(self.slots)
+        self.counter += 1
+        slabs = self.slots[slot]
+        new_slabs = {}
+
+        def copy(field, key):
+            slab = slabs.get(key)
+            if slab is None or slab.dtype != field.dtype or slab.numel() < field.numel():
+                slab = torch.empty(field.numel(), dtype=field.dtype).share_memory_()
+                slabs[key] = slab
+                new_slabs[key] = slab
+            slab[:field.numel()].view(field.shape).copy_(field)
+
+        layout = _to_layout(task, copy, [0])
+        return slot, new_slabs, layout
+
+
+def _to_layout(task, copy, counter):
+    # Replaces the tensors of task by ('slab', key, shape), after copying them with copy(tensor, key).
+    if isinstance(task, torch.Tensor):
+        key = counter[0]
+        counter[0] += 1
+        copy(task, key)
+        return ('slab', key, tuple(task.shape))
+    if isinstance(task, (list, tuple)):
+        return (type(task), [_to_layout(t, copy, counter) for t in task])
+    return ('value', task)
+
+
+def _from_layout(layout, slabs):
+    if layout[0] == 'slab':
+        _, key, shape = layout
+        numel = 1
+        for size in shape:
+            numel *= size
+        return slabs[key][:numel].view(shape)
+    if layout[0] == 'value':
+        return layout[1]
+    container, items = layout
+    return container(_from_layout(item, slabs) for item in items)
+
+
+def _pin_memory(task):
+    if isinstance(task, torch.Tensor):
+        return task.pin_memory()
+    if isinstance(task, (list, tuple)):
+        return type(task)(_pin_memory(t) for t in task)
+    return task
@@ -27,30 +27,146 @@ To create a task from a task description, the `TaskDataset` applies each sample'
 in order.
 Then, all samples are collated via the `TaskDataset`'s collate function.
 
+The task transforms of this module also implement `describe()`, which operates on a
+`TaskDescription` (arrays of sample indices and transform ids) instead of a list of `DataDescription`.
+`TaskDataset` calls `describe()` when available, so that tasks are sampled with NumPy array
+operations, and only converts to a list of `DataDescription` for custom task transforms.
+Calling those task transforms directly still returns a list of `DataDescription`.
+
+The random task transforms (`NWays`, `KShots`, `RemapLabels`, `FusedNWaysKShots`) draw their
+random numbers from their `generator` argument when given (any object with the interface of
+`random.Random`), otherwise from the generator passed to `TaskDataset.sample_task_description()`,
+and otherwise from the global `random` module.
+
 """
 
 cimport cython
-from cpython cimport array, bool
+from cpython cimport bool
 
 import cython
-import copy
 import random
-import collections
 import functools
-import array
-import itertools
-
-from .task_dataset cimport DataDescription
-from .task_dataset import DataDescription
+import numpy as np
+import torch
+from torch.utils.data import TensorDataset
+
+from .meta_dataset import MetaDataset
+from .task_dataset cimport DataDescription, TaskDescription
+from .task_dataset import DataDescription, TaskDescription
+from . import task_dataset
+
+
+def _as_description(task_description):
+    # Converts lists of DataDescription to TaskDescription, leaves None and TaskDescription as is.
+    if isinstance(task_description, list):
+        return TaskDescription.from_list(task_description)
+    return task_description
+
+
+def _task_labels(dataset, indices):
+    # Returns the label codes of the given indices and the list of labels they refer to.
+    label_codes = getattr(dataset, 'label_codes', None)
+    if label_codes is not None:
+        return np.asarray(label_codes)[indices], dataset.labels
+    labels = []
+    positions = {}
+    codes = np.empty(len(indices), dtype=np.int64)
+    for i, index in enumerate(indices.tolist()):
+        label = dataset.indices_to_labels[index]
+        if label not in positions:
+            positions[label] = len(labels)
+            labels.append(label)
+        codes[i] = positions[label]
+    return codes, labels
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef tuple _group_by_label(codes, long num_labels):
+    # Counting sort of sample positions by label code, with labels in order of first appearance.
+    # The positions of the g-th label are order[offsets[g]:offsets[g + 1]], in increasing order.
+    cdef long[:] c = np.ascontiguousarray(codes, dtype=np.int_)
+    cdef long n = c.shape[0]
+    cdef long[:] group_of_code = np.full(num_labels, -1, dtype=np.int_)
+    cdef long[:] groups = np.empty(n, dtype=np.int_)
+    cdef long num_groups = 0
+    cdef long i, g
+    for i in range(n):
+        if group_of_code[c[i]] < 0:
+            group_of_code[c[i]] = num_groups
+            num_groups += 1
+        groups[i] = group_of_code[c[i]]
+    offsets = np.zeros(num_groups + 1, dtype=np.int_)
+    cdef long[:] o = offsets
+    for i in range(n):
+        o[groups[i] + 1] += 1
+    for g in range(num_groups):
+        o[g + 1] += o[g]
+    cdef long[:] fill = offsets[:num_groups].copy()
+    order = np.empty(n, dtype=np.int_)
+    cdef long[:] od = order
+    for i in range(n):
+        od[fill[groups[i]]] = i
+        fill[groups[i]] += 1
+    return order, offsets
+
+
+class _LabelMap(object):
+
+    # Maps labels to their position in a list, in O(1).
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.positions = {label: i for i, label in enumerate(labels)}
+
+    def __call__(self, label):
+        try:
+            return self.positions[label]
+        except (KeyError, TypeError):
+            pass
+        if hasattr(label, 'item'):  # e.g. 0-d tensors, which hash by identity.
+            try:
+                return self.positions[label.item()]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return self.labels.index(label)
+
+    def batch(self, labels):
+        if not isinstance(labels, torch.Tensor) or labels.dim() != 1:
+            return torch.tensor([self(label) for label in labels])
+        keys = torch.tensor(self.labels, dtype=labels.dtype, device=labels.device)
+        sorted_keys, permutation = keys.sort()
+        positions = torch.searchsorted(sorted_keys, labels).clamp_(max=len(keys) - 1)
+        if not torch.equal(sorted_keys[positions], labels):
+            raise ValueError('Labels are not part of the task.')
+        return permutation[positions]
+
+
+def _label_indices(dataset, label):
+    labels_to_indices = dataset.labels_to_indices
+    if hasattr(labels_to_indices, 'indices'):
+        return labels_to_indices.indices(label)
+    return np.asarray(labels_to_indices[label], dtype=np.int64)
 
 
 cdef class TaskTransform:
 
     cdef public:
         object dataset
+        object generator
 
-    def __init__(self, dataset):
+    def __init__(self, dataset, generator=None):
         self.dataset = dataset
+        self.generator = generator
+
+    cdef object _random(self):
+        # The generator of this transform, else the one of the task being sampled, else `random`.
+        if self.generator is not None:
+            return self.generator
+        generator = task_dataset._active_generator
+        if generator is not None:
+            return generator
+        return random
 
     @cython.boundscheck(False)
     @cython.wraparound(False)
@@ -65,6 +181,15 @@ cdef class TaskTransform:
             task_description[i] = DataDescription(i)
         return task_description
 
+    cpdef new_description(self):
+        return TaskDescription(np.arange(len(self.dataset), dtype=np.int64))
+
+    def describe(self, task_description):
+        # Fallback for task transforms that only implement __call__ on lists of DataDescription.
+        if isinstance(task_description, TaskDescription):
+            task_description = task_description.to_list()
+        return self(task_description)
+
 
 class LoadData(TaskTransform):
 
@@ -75,6 +200,10 @@ class LoadData(TaskTransform):
 
     Loads a sample from the dataset given its index.
 
+    If the dataset implements `get_batch(indices)`, which returns the collated samples at
+    `indices`, `TaskDataset` loads all samples of a task with a single call to it.
+    (`TensorDataset`s are supported without `get_batch`.)
+
     **Arguments**
 
     * **dataset** (Dataset) - The dataset from which to load the sample.
@@ -84,15 +213,66 @@ class LoadData(TaskTransform):
     def __init__(self, dataset):
         super(LoadData, self).__init__(dataset)
         self.dataset = dataset
+        self.load = _Load(dataset)
+
+    def describe(self, task_description):
+        if task_description is None:
+            task_description = self.new_description()
+        task_description = _as_description(task_description)
+        task_description.add_transform(self.load)
+        return task_description
 
     def __call__(self, task_description):
         if task_description is None:
             task_description = self.new_task()
         for data_description in task_description:
-            data_description.transforms.append(lambda x: self.dataset[x])
+            data_description.transforms.append(self.load)
         return task_description
 
 
+class _Load(object):
+
+    # Loads samples one at a time, or a whole task at once with batch(indices).
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __call__(self, index):
+        return self.dataset[index]
+
+    @property
+    def batch(self):
+        dataset = self.dataset
+        if isinstance(dataset, MetaDataset) and not hasattr(dataset, 'get_batch'):
+            dataset = dataset.dataset
+        if hasattr(dataset, 'get_batch'):
+            return dataset.get_batch
+        if isinstance(dataset, TensorDataset):
+            return functools.partial(_tensor_dataset_batch, dataset)
+        return None
+
+
+def _tensor_dataset_batch(dataset, indices):
+    return tuple(tensor[indices] for tensor in dataset.tensors)
+
+
+class _Remap(object):
+
+    # Remaps the label of one sample, or of a whole task at once with batch(data).
+
+    def __init__(self, remap, mapping):
+        self.remap = remap
+        self.mapping = mapping
+
+    def __call__(self, data):
+        return self.remap(data, self.mapping)
+
+    def batch(self, data):
+        data = list(data)
+        data[1] = self.mapping.batch(data[1])
+        return data
+
+
 class FilterLabels(CythonFilterLabels):
 
     """
@@ -117,35 +297,32 @@ cdef class CythonFilterLabels(TaskTransform):
 
     cdef public:
         list labels
-        int[:] filtered_indices
+        object filtered_indices
+        object kept_indices
 
-    @cython.boundscheck(False)
-    @cython.wraparound(False)
     def __init__(self, dataset, list labels):
         super(CythonFilterLabels, self).__init__(dataset)
-        cdef dict indices_to_labels = dict(dataset.indices_to_labels)
-        cdef long len_dataset = len(dataset)
-        cdef long i
         self.labels = labels
-        self.filtered_indices = array.array('i', [0] * len_dataset)
-        for i in range(len_dataset):
-            self.filtered_indices[i] = int(indices_to_labels[i] in self.labels)
+        all_indices = np.arange(len(dataset), dtype=np.int64)
+        codes, dataset_labels = _task_labels(dataset, all_indices)
+        kept_codes = np.array([label in labels for label in dataset_labels], dtype=bool)
+        self.filtered_indices = kept_codes[codes] if len(kept_codes) else np.zeros(len(dataset), dtype=bool)
+        self.kept_indices = np.flatnonzero(self.filtered_indices)
 
     def __reduce__(self):
         return CythonFilterLabels, (self.dataset, self.labels)
 
-    def __call__(self, list task_description):
+    def describe(self, task_description):
         if task_description is None:
-            task_description = self.new_task()
-        cdef DataDescription dd
-        cdef list result = []
-        for dd in task_description:
-            if self.filtered_indices[dd.index]:
-                result.append(dd)
-        return result
+            return TaskDescription(self.kept_indices)
+        task_description = _as_description(task_description)
+        return task_description.take(self.filtered_indices[task_description.indices])
 
+    def __call__(self, task_description):
+        return self.describe(task_description).to_list()
 
-class ConsecutiveLabels(TaskTransform):
+
+class ConsecutiveLabels(CythonConsecutiveLabels):
 
     """
     [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/data/transforms.py)
@@ -158,6 +335,8 @@ class ConsecutiveLabels(TaskTransform):
     Note: when used before `RemapLabels`, the labels will be homogeneously clustered,
     but in no specific order.
 
+    The sort is stable and consumes no random numbers.
+
     **Arguments**
 
     * **dataset** (Dataset) - The dataset from which to load the sample.
@@ -166,18 +345,44 @@ class ConsecutiveLabels(TaskTransform):
 
     def __init__(self, dataset):
         super(ConsecutiveLabels, self).__init__(dataset)
-        self.dataset = dataset
 
-    def __call__(self, task_description):
+
+cdef class CythonConsecutiveLabels(TaskTransform):
+
+    cdef public:
+        object label_ranks
+
+    def __init__(self, dataset):
+        super(CythonConsecutiveLabels, self).__init__(dataset)
+        # Rank of each label code in the sorted list of labels.
+        self.label_ranks = None
+        if getattr(dataset, 'label_codes', None) is not None:
+            self.label_ranks = _label_ranks(dataset.labels)
+
+    def __reduce__(self):
+        return CythonConsecutiveLabels, (self.dataset, )
+
+    def describe(self, task_description):
         if task_description is None:
-            task_description = self.new_task()
-        pairs = [(dd, self.dataset.indices_to_labels[dd.index])
-                 for dd in task_description]
-        pairs = sorted(pairs, key=lambda x: x[1])
-        return [p[0] for p in pairs]
+            task_description = self.new_description()
+        task_description = _as_description(task_description)
+        codes, labels = _task_labels(self.dataset, task_description.indices)
+        label_ranks = self.label_ranks
+        if label_ranks is None:
+            label_ranks = _label_ranks(labels)
+        return task_description.take(np.argsort(label_ranks[codes], kind='stable'))
 
+    def __call__(self, task_description):
+        return self.describe(task_description).to_list()
+
+
+def _label_ranks(list labels):
+    ranks = np.empty(len(labels), dtype=np.int64)
+    ranks[sorted(range(len(labels)), key=labels.__getitem__)] = np.arange(len(labels))
+    return ranks
 
-class RemapLabels(TaskTransform):
+
+class RemapLabels(CythonRemapLabels):
 
     """
     [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/data/transforms.py)
@@ -186,36 +391,51 @@ class RemapLabels(TaskTransform):
 
     Given samples from K classes, maps the labels to 0, ..., K.
 
+    When `shuffle` is True, each call consumes one `random.shuffle` of the K labels.
+
     **Arguments**
 
     * **dataset** (Dataset) - The dataset from which to load the sample.
+    * **shuffle** (bool, *optional*, default=True) - Whether to randomly permute the new labels.
+    * **generator** (random.Random, *optional*, default=None) - Source of random numbers.
 
     """
 
-    def __init__(self, dataset, shuffle=True):
-        super(RemapLabels, self).__init__(dataset)
-        self.dataset = dataset
+    def __init__(self, dataset, shuffle=True, generator=None):
+        super(RemapLabels, self).__init__(dataset, shuffle=shuffle, generator=generator)
+
+
+cdef class CythonRemapLabels(TaskTransform):
+
+    cdef public:
+        bool shuffle
+
+    def __init__(self, dataset, shuffle=True, generator=None):
+        super(CythonRemapLabels, self).__init__(dataset, generator)
         self.shuffle = shuffle
 
+    def __reduce__(self):
+        return CythonRemapLabels, (self.dataset, self.shuffle, self.generator)
+
     def remap(self, data, mapping):
         data = [d for d in data]
         data[1] = mapping(data[1])
         return data
 
-    def __call__(self, task_description):
+    def describe(self, task_description):
         if task_description is None:
-            task_description = self.new_task()
-        labels = list(set(self.dataset.indices_to_labels[dd.index] for dd in task_description))
+            task_description = self.new_description()
+        task_description = _as_description(task_description)
+        codes, task_labels = _task_labels(self.dataset, task_description.indices)
+        labels = list(set(task_labels[c] for c in np.unique(codes).tolist()))
         if self.shuffle:
-            random.shuffle(labels)
+            self._random().shuffle(labels)
+        task_description.add_transform(_Remap(self.remap, _LabelMap(labels)))
+        return task_description
 
-        def mapping(x):
-            return labels.index(x)
+    def __call__(self, task_description):
+        return self.describe(task_description).to_list()
 
-        for dd in task_description:
-            remap = functools.partial(self.remap, mapping=mapping)
-            dd.transforms.append(remap)
-        return task_description
 
 class NWays(CythonNWays):
 
@@ -231,54 +451,43 @@ class NWays(CythonNWays):
     * **dataset** (Dataset) - The dataset from which to load the sample.
     * **n** (int, *optional*, default=2) - Number of labels to sample from the task
         description's labels.
+    * **generator** (random.Random, *optional*, default=None) - Source of random numbers.
 
     """
 
-    def __init__(self, dataset, n=2):
-        super(NWays, self).__init__(dataset=dataset, n=n)
+    def __init__(self, dataset, n=2, generator=None):
+        super(NWays, self).__init__(dataset=dataset, n=n, generator=generator)
 
 
 cdef class CythonNWays(TaskTransform):
 
     cdef public:
         int n
-        dict indices_to_labels
 
-    def __init__(self, dataset, int n=2):
-        super(CythonNWays, self).__init__(dataset)
+    def __init__(self, dataset, int n=2, generator=None):
+        super(CythonNWays, self).__init__(dataset, generator)
         self.n = n
-        self.indices_to_labels = dict(dataset.indices_to_labels)
 
     def __reduce__(self):
-        return CythonNWays, (self.dataset, self.n)
+        return CythonNWays, (self.dataset, self.n, self.generator)
 
-    @cython.boundscheck(False)
-    @cython.wraparound(False)
     cpdef new_task(self):  # Efficient initializer
-        cdef list labels = self.dataset.labels
-        cdef list task_description = []
-        cdef dict labels_to_indices = dict(self.dataset.labels_to_indices)
-        classes = random.sample(labels, k=self.n)
-        for cl in classes:
-            for idx in labels_to_indices[cl]:
-                task_description.append(DataDescription(idx))
-        return task_description
+        return self.new_description().to_list()
+
+    cpdef new_description(self):
+        classes = self._random().sample(self.dataset.labels, k=self.n)
+        return TaskDescription(np.concatenate([_label_indices(self.dataset, cl) for cl in classes]))
 
-    def __call__(self, list task_description):
+    def describe(self, task_description):
         if task_description is None:
-            return self.new_task()
-        cdef list classes = []
-        cdef list result = []
-        cdef set set_classes = set()
-        cdef DataDescription dd
-        for dd in task_description:
-            set_classes.add(self.indices_to_labels[dd.index])
-        classes = <list>set_classes
-        classes = random.sample(classes, k=self.n)
-        for dd in task_description:
-            if self.indices_to_labels[dd.index] in classes:
-                result.append(dd)
-        return result
+            return self.new_description()
+        task_description = _as_description(task_description)
+        codes, labels = _task_labels(self.dataset, task_description.indices)
+        classes = self._random().sample(np.unique(codes).tolist(), k=self.n)
+        return task_description.take(np.isin(codes, classes))
+
+    def __call__(self, task_description):
+        return self.describe(task_description).to_list()
 
 
 class KShots(CythonKShots):
@@ -290,16 +499,20 @@ class KShots(CythonKShots):
 
     Keeps K samples for each present labels.
 
+    Labels are processed in order of first appearance in the task description, and each one
+    consumes one call to `random.sample` (or `random.choices` with replacement) on its samples.
+
     **Arguments**
 
     * **dataset** (Dataset) - The dataset from which to load the sample.
     * **k** (int, *optional*, default=1) - The number of samples per label.
     * **replacement** (bool, *optional*, default=False) - Whether to sample with replacement.
+    * **generator** (random.Random, *optional*, default=None) - Source of random numbers.
 
     """
 
-    def __init__(self, dataset, k=1, replacement=False):
-        super(KShots, self).__init__(dataset=dataset, k=k, replacement=replacement)
+    def __init__(self, dataset, k=1, replacement=False, generator=None):
+        super(KShots, self).__init__(dataset=dataset, k=k, replacement=replacement, generator=generator)
 
 
 cdef class CythonKShots(TaskTransform):
@@ -308,31 +521,36 @@ cdef class CythonKShots(TaskTransform):
         long k
         bool replacement
 
-    def __init__(self, dataset, k=1, replacement=False):
-        super(CythonKShots, self).__init__(dataset)
+    def __init__(self, dataset, k=1, replacement=False, generator=None):
+        super(CythonKShots, self).__init__(dataset, generator)
         self.dataset = dataset
         self.k = k
         self.replacement = replacement
 
     def __reduce__(self):
-        return CythonKShots, (self.dataset, self.k, self.replacement)
+        return CythonKShots, (self.dataset, self.k, self.replacement, self.generator)
 
-    def __call__(self, task_description):
+    def describe(self, task_description):
         if task_description is None:
-            task_description = self.new_task()
+            task_description = self.new_description()
+        task_description = _as_description(task_description)
         # TODO: The order of the data samples is not preserved.
-        class_to_data = collections.defaultdict(list)
-        for dd in task_description:
-            cls = self.dataset.indices_to_labels[dd.index]
-            class_to_data[cls].append(dd)
-        if self.replacement:
-            def sampler(x, k):
-                return [copy.deepcopy(dd)
-                        for dd in random.choices(x, k=k)]
-        else:
-            sampler = random.sample
+        codes, labels = _task_labels(self.dataset, task_description.indices)
+        order, offsets = _group_by_label(codes, len(labels))
+        cdef list order_list = order.tolist()
+        cdef list offsets_list = offsets.tolist()
+        cdef list positions = []
+        cdef long g, start, p
+        rng = self._random()
+        sampler = rng.choices if self.replacement else rng.sample
+        for g in range(len(offsets_list) - 1):
+            start = offsets_list[g]
+            for p in sampler(range(offsets_list[g + 1] - start), k=self.k):
+                positions.append(order_list[start + p])
+        return task_description.take(np.array(positions, dtype=np.int64))
 
-        return list(itertools.chain(*[sampler(dds, k=self.k) for dds in class_to_data.values()]))
+    def __call__(self, task_description):
+        return self.describe(task_description).to_list()
 
 
 class FusedNWaysKShots(CythonFusedNWaysKShots):
@@ -353,15 +571,17 @@ class FusedNWaysKShots(CythonFusedNWaysKShots):
     * **replacement** (bool, *optional*, default=False) - Whether to sample shots with replacement.
     * **filter_labels** (list, *optional*, default=None) - The list of labels to include. Defaults to
         all labels in the dataset.
+    * **generator** (random.Random, *optional*, default=None) - Source of random numbers.
     """
 
-    def __init__(self, dataset, n=2, k=1, replacement=False, filter_labels=None):
+    def __init__(self, dataset, n=2, k=1, replacement=False, filter_labels=None, generator=None):
         super(FusedNWaysKShots, self).__init__(
             dataset,
             n=n,
             k=k,
             replacement=replacement,
             filter_labels=filter_labels,
+            generator=generator,
         )
 
 cdef class CythonFusedNWaysKShots(TaskTransform):
@@ -371,12 +591,14 @@ cdef class CythonFusedNWaysKShots(TaskTransform):
         int k
         bool replacement
         list filter_labels
-        object filtre
+        object filter
         object nways
         object kshots
+        list label_offsets
+        object label_indices
 
-    def __init__(self, dataset, int n=2, int k=1, bool replacement=False, list filter_labels=None):
-        super(CythonFusedNWaysKShots, self).__init__(dataset)
+    def __init__(self, dataset, int n=2, int k=1, bool replacement=False, list filter_labels=None, generator=None):
+        super(CythonFusedNWaysKShots, self).__init__(dataset, generator)
         self.n = n
         self.k = k
         self.replacement = replacement
@@ -384,34 +606,65 @@ cdef class CythonFusedNWaysKShots(TaskTransform):
             filter_labels = self.dataset.labels
         self.filter_labels = filter_labels
         self.filter = FilterLabels(self.dataset, self.filter_labels)
-        self.nways = NWays(self.dataset, self.n)
-        self.kshots = KShots(self.dataset, k=self.k, replacement=self.replacement)
+        self.nways = NWays(self.dataset, self.n, generator=generator)
+        self.kshots = KShots(self.dataset, k=self.k, replacement=self.replacement, generator=generator)
+        # CSR-style index of the filtered labels, for new_description.
+        indices = [_label_indices(self.dataset, label) for label in filter_labels]
+        self.label_offsets = np.cumsum([0] + [len(i) for i in indices]).tolist()
+        self.label_indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
 
     def __reduce__(self):
         return CythonFusedNWaysKShots, (self.dataset,
                                         self.n,
                                         self.k,
                                         self.replacement,
-                                        self.filter_labels)
+                                        self.filter_labels,
+                                        self.generator)
+
+    cpdef new_task(self):
+        return self.new_description().to_list()
 
     @cython.boundscheck(False)
     @cython.wraparound(False)
-    cpdef new_task(self):
-        cdef list task_description = []
-        labels = self.filter_labels
-        selected_labels = random.sample(labels, k=self.n)
-        for sl in selected_labels:
-            indices = self.dataset.labels_to_indices[sl]
+    cpdef new_description(self):
+        cdef list positions = []
+        cdef list offsets = self.label_offsets
+        cdef long start, num_indices, c, p
+        rng = self._random()
+        for c in rng.sample(range(len(self.filter_labels)), k=self.n):
+            start = offsets[c]
+            num_indices = offsets[c + 1] - start
             if self.replacement:
-                selected_indices = [random.choice(indices) for _ in range(self.k)]
+                for _ in range(self.k):
+                    positions.append(start + rng.choice(range(num_indices)))
             else:
-                selected_indices = random.sample(indices, k=self.k)
-            for idx in selected_indices:
-                task_description.append(DataDescription(idx))
-        return task_description
+                for p in rng.sample(range(num_indices), k=self.k):
+                    positions.append(start + p)
+        return TaskDescription(self.label_indices[positions])
 
-    def __call__(self, task_description):
+    def describe(self, task_description):
         if task_description is None:
-            return self.new_task()
-        # Not fused
-        return self.kshots(self.nways(self.filter(task_description)))
+            return self.new_description()
+        # Single pass equivalent to KShots(NWays(FilterLabels(task_description))),
+        # with the same random number consumption.
+        task_description = _as_description(task_description)
+        kept = np.flatnonzero(self.filter.filtered_indices[task_description.indices])
+        codes, labels = _task_labels(self.dataset, task_description.indices[kept])
+        order, offsets = _group_by_label(codes, len(labels))
+        cdef list group_codes = codes[order[offsets[:-1]]].tolist()
+        rng = self._random()
+        cdef set selected = set(rng.sample(sorted(group_codes), k=self.n))
+        cdef long[:] order_view = order
+        cdef long[:] offsets_view = offsets
+        cdef list positions = []
+        cdef long g, start, p
+        sampler = rng.choices if self.replacement else rng.sample
+        for g in range(len(group_codes)):
+            if group_codes[g] in selected:
+                start = offsets_view[g]
+                for p in sampler(range(offsets_view[g + 1] - start), k=self.k):
+                    positions.append(order_view[start + p])
+        return task_description.take(kept[positions])
+
+    def __call__(self, task_description):
+        return self.describe(task_description).to_list()
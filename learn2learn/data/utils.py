@@ -1,25 +1,77 @@
 #!/usr/bin/env python3
 
+import concurrent.futures
+import hashlib
+import os
+import tarfile
+import threading
+import zipfile
+from urllib.parse import urlparse
+
 import requests
 
+CHUNK_SIZE = 32768
+PART_SIZE = 2 ** 23
 
-def download_file(source, destination):
-    req = requests.get(source)
-    with open(destination, 'wb') as archive:
-        for chunk in req.iter_content(chunk_size=32768):
-            if chunk:
-                archive.write(chunk)
 
+def download_file(source,
+                  destination,
+                  checksum=None,
+                  num_connections=8,
+                  part_size=PART_SIZE,
+                  retries=3,
+                  session=None):
+    """
+    [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/data/utils.py)
 
-def download_file_from_google_drive(id, destination):
-    URL = "https://docs.google.com/uc?export=download"
+    **Description**
+
+    Downloads the file at `source` to `destination`.
+
+    When the server accepts range requests, the file is downloaded in parts of `part_size` bytes
+    over `num_connections` parallel connections.
+    Completed parts are recorded next to the partial file (`destination + '.part'`), so that an
+    interrupted download resumes where it stopped.
+    Otherwise, the file is streamed over a single connection.
+    `destination` only exists once the file is complete (and verified).
+
+    **Arguments**
+
+    * **source** (str) - URL of the file.
+    * **destination** (str) - Path of the downloaded file.
+    * **checksum** (str, *optional*, default=None) - Expected SHA-256 hex digest of the file.
+        An `IOError` is raised, and the download discarded, when it does not match.
+    * **num_connections** (int, *optional*, default=8) - Number of parallel connections.
+    * **part_size** (int, *optional*, default=8Mb) - Size in bytes of the range requests.
+    * **retries** (int, *optional*, default=3) - Number of attempts for each part.
+    * **session** (requests.Session, *optional*, default=None) - Session used for the requests.
+
+    **Example**
+    ~~~python
+    download_file('http://example.com/data.tar', './data/data.tar', num_connections=16)
+    ~~~
+    """
+    download = _FileDownload(source, destination, num_connections, part_size, retries, session)
+    download.prepare()
+    download.run()
+    download.finish(checksum)
+
+
+def download_file_from_google_drive(id, destination, **kwargs):
     session = requests.Session()
-    response = session.get(URL, params={'id': id}, stream=True)
+    download_file(google_drive_source(id, session), destination, session=session, **kwargs)
+
+
+def google_drive_source(id, session):
+    # Returns the download URL of a Google Drive file, confirmed for large files.
+    URL = "https://docs.google.com/uc?export=download"
+    params = {'id': id}
+    response = session.get(URL, params=params, stream=True)
     token = get_confirm_token(response)
+    response.close()
     if token:
-        params = {'id': id, 'confirm': token}
-        response = session.get(URL, params=params, stream=True)
-    save_response_content(response, destination)
+        params['confirm'] = token
+    return requests.Request('GET', URL, params=params).prepare().url
 
 
 def get_confirm_token(response):
@@ -30,8 +82,340 @@ def get_confirm_token(response):
 
 
 def save_response_content(response, destination):
-    CHUNK_SIZE = 32768
     with open(destination, "wb") as f:
         for chunk in response.iter_content(CHUNK_SIZE):
             if chunk:  # filter out keep-alive new chunks
                 f.write(chunk)
+
+
+def extract_archive(archive_path, destination):
+    """
+    [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/data/utils.py)
+
+    **Description**
+
+    Extracts the zip or tar (optionally compressed) archive at `archive_path` into `destination`.
+
+    **Arguments**
+
+    * **archive_path** (str) - Path to the archive.
+    * **destination** (str) - Directory in which to extract the archive.
+    """
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            archive.extractall(destination)
+    else:
+        with tarfile.open(archive_path) as archive:
+            archive.extractall(destination)
+
+
+def download_and_extract(source,
+                         destination,
+                         archive_path=None,
+                         checksum=None,
+                         remove_archive=True,
+                         **kwargs):
+    """
+    [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/data/utils.py)
+
+    **Description**
+
+    Downloads the archive at `source` and extracts it into `destination`.
+
+    Tar archives are extracted while they download: extraction reads the downloaded prefix of
+    the archive, and waits for the next bytes.
+    Zip archives, which are indexed at their end, are extracted once downloaded.
+    An archive already downloaded to `archive_path` is only extracted.
+
+    **Arguments**
+
+    * **source** (str) - URL of the archive.
+    * **destination** (str) - Directory in which to extract the archive.
+    * **archive_path** (str, *optional*, default=None) - Path where the archive is downloaded.
+        Defaults to the file name of `source` in `destination`.
+    * **checksum** (str, *optional*, default=None) - Expected SHA-256 hex digest of the archive.
+        It is verified once the archive is downloaded, after it was extracted for tar archives.
+    * **remove_archive** (bool, *optional*, default=True) - Whether to remove the archive once extracted.
+    * **kwargs** - Other arguments to `download_file`, such as `num_connections` or `session`.
+
+    **Example**
+    ~~~python
+    download_and_extract('http://example.com/images.tar.gz', './data/images')
+    ~~~
+    """
+    if not os.path.exists(destination):
+        os.makedirs(destination)
+    if archive_path is None:
+        name = os.path.basename(urlparse(source).path)
+        archive_path = os.path.join(destination, name)
+
+    if not os.path.exists(archive_path):
+        if archive_path.endswith('.zip'):
+            download_file(source, archive_path, checksum=checksum, **kwargs)
+        else:
+            _download_and_stream_extract(source, destination, archive_path, checksum, **kwargs)
+            if remove_archive:
+                os.remove(archive_path)
+            return
+    if checksum is not None:
+        _verify(archive_path, checksum)
+    extract_archive(archive_path, destination)
+    if remove_archive:
+        os.remove(archive_path)
+
+
+def _download_and_stream_extract(source,
+                                 destination,
+                                 archive_path,
+                                 checksum,
+                                 num_connections=8,
+                                 part_size=PART_SIZE,
+                                 retries=3,
+                                 session=None):
+    download = _FileDownload(source, archive_path, num_connections, part_size, retries, session)
+    download.prepare()
+    thread = threading.Thread(target=download.run_quietly)
+    thread.start()
+    try:
+        with _DownloadReader(download.part_path, download.progress) as reader:
+            with tarfile.open(fileobj=reader, mode='r|*') as archive:
+                archive.extractall(destination)
+    except BaseException:
+        download.progress.update(error=IOError('Extraction failed.'))
+        raise
+    finally:
+        thread.join()
+    download.progress.check()
+    download.finish(checksum)
+
+
+def _verify(path, checksum):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b''):
+            digest.update(chunk)
+    if digest.hexdigest() != checksum.lower():
+        raise IOError('Checksum mismatch for ' + path + ': expected ' + checksum
+                      + ', got ' + digest.hexdigest() + '.')
+
+
+class _Progress(object):
+
+    # Length of the downloaded prefix of a file, shared between its download and a reader.
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.available = 0
+        self.finished = False
+        self.error = None
+
+    def update(self, available=None, finished=False, error=None):
+        with self.condition:
+            if available is not None:
+                self.available = max(self.available, available)
+            self.finished = self.finished or finished
+            if self.error is None:
+                self.error = error
+            self.condition.notify_all()
+
+    def check(self):
+        if self.error is not None:
+            raise IOError('Download failed: ' + str(self.error))
+
+    def wait(self, end):
+        # Waits until the first `end` bytes are downloaded (or the download ends).
+        with self.condition:
+            while self.available < end and not self.finished and self.error is None:
+                self.condition.wait()
+            self.check()
+            return self.available
+
+
+class _DownloadReader(object):
+
+    # Sequential file object over a file being downloaded.
+
+    def __init__(self, path, progress):
+        # Unbuffered: a read-ahead would cache bytes that are not downloaded yet.
+        self.file = open(path, 'rb', buffering=0)
+        self.progress = progress
+        self.position = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            self.progress.wait(float('inf'))
+            data = self.file.read()
+        else:
+            available = self.progress.wait(self.position + size)
+            data = self.file.read(max(min(size, available - self.position), 0))
+        self.position += len(data)
+        return data
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _FileDownload(object):
+
+    # A download to `destination + '.part'`, in parallel range requests when possible.
+    # The completed parts are appended to `destination + '.part.progress'`, after a header line
+    # with the file and part sizes, so that the download can be resumed.
+
+    def __init__(self, source, destination, num_connections, part_size, retries, session):
+        self.source = source
+        self.destination = destination
+        self.part_path = destination + '.part'
+        self.progress_path = self.part_path + '.progress'
+        self.num_connections = max(num_connections, 1)
+        self.part_size = part_size
+        self.retries = max(retries, 1)
+        self.session = requests.Session() if session is None else session
+        self.progress = _Progress()
+        self.size = None
+        self.done = set()
+
+    def _probe(self):
+        # Returns the size of the file if the server accepts range requests, else None.
+        response = self.session.get(self.source, headers={'Range': 'bytes=0-0'}, stream=True)
+        try:
+            response.raise_for_status()
+            if response.status_code != 206:
+                return None
+            total = response.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+            return int(total) if total.isdigit() else None
+        finally:
+            response.close()
+
+    def prepare(self):
+        self.size = self._probe()
+        if self.size is None:
+            open(self.part_path, 'wb').close()
+            if os.path.exists(self.progress_path):
+                os.remove(self.progress_path)
+            return
+        header = str(self.size) + ' ' + str(self.part_size)
+        if os.path.exists(self.part_path) and os.path.exists(self.progress_path):
+            with open(self.progress_path) as progress_file:
+                lines = progress_file.read().split('\n')
+            # The last line is incomplete (or empty) if the process was interrupted.
+            if lines[0] == header:
+                self.done = set(int(line) for line in lines[1:-1])
+        if not self.done:
+            with open(self.part_path, 'wb') as part_file:
+                part_file.truncate(self.size)
+            with open(self.progress_path, 'w') as progress_file:
+                progress_file.write(header + '\n')
+        self.progress.update(available=self._prefix())
+
+    def _num_parts(self):
+        return (self.size + self.part_size - 1) // self.part_size
+
+    def _prefix(self):
+        # Number of bytes downloaded without gaps from the start of the file.
+        part = 0
+        while part in self.done:
+            part += 1
+        return min(part * self.part_size, self.size)
+
+    def run(self):
+        try:
+            if self.size is None:
+                self._stream()
+            else:
+                self._fetch_parts()
+        except BaseException as error:
+            self.progress.update(error=error)
+            raise
+        self.progress.update(finished=True)
+
+    def run_quietly(self):
+        # Used in a thread, where the error is kept in progress.
+        try:
+            self.run()
+        except BaseException:
+            pass
+
+    def _stream(self):
+        response = self.session.get(self.source, stream=True)
+        response.raise_for_status()
+        with open(self.part_path, 'wb') as part_file:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                self.progress.check()
+                if chunk:
+                    part_file.write(chunk)
+                    part_file.flush()
+                    self.progress.update(available=part_file.tell())
+
+    def _fetch_parts(self):
+        lock = threading.Lock()
+        missing = [part for part in range(self._num_parts()) if part not in self.done]
+        with open(self.progress_path, 'a') as progress_file:
+
+            def fetch(part):
+                for attempt in range(self.retries):
+                    try:
+                        self._fetch_part(part)
+                        break
+                    except (requests.RequestException, IOError):
+                        self.progress.check()
+                        if attempt == self.retries - 1:
+                            raise
+                with lock:
+                    progress_file.write(str(part) + '\n')
+                    progress_file.flush()
+                    self.done.add(part)
+                    prefix = self._prefix()
+                self.progress.update(available=prefix)
+
+            with concurrent.futures.ThreadPoolExecutor(self.num_connections) as pool:
+                futures = [pool.submit(fetch, part) for part in missing]
+                try:
+                    for future in concurrent.futures.as_completed(futures):
+                        future.result()
+                except BaseException as error:
+                    self.progress.update(error=error)
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+    def _fetch_part(self, part):
+        start = part * self.part_size
+        end = min(start + self.part_size, self.size)
+        headers = {'Range': 'bytes=' + str(start) + '-' + str(end - 1)}
+        response = self.session.get(self.source, headers=headers, stream=True)
+        try:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError('Range request not honored for ' + self.source + '.')
+            with open(self.part_path, 'r+b') as part_file:
+                part_file.seek(start)
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    self.progress.check()
+                    part_file.write(chunk)
+                received = part_file.tell() - start
+        finally:
+            response.close()
+        if received != end - start:
+            raise IOError('Incomplete part ' + str(part) + ' of ' + self.source + '.')
+
+    def finish(self, checksum=None):
+        if checksum is not None:
+            try:
+                _verify(self.part_path, checksum)
+            except IOError:
+                os.remove(self.part_path)
+                if os.path.exists(self.progress_path):
+                    os.remove(self.progress_path)
+                raise
+        os.replace(self.part_path, self.destination)
+        if os.path.exists(self.progress_path):
+            os.remove(self.progress_path)
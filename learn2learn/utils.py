@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import copy
+import weakref
 
 import torch
 
@@ -49,6 +50,114 @@ def clone_parameters(param_list):
     return [p.clone() for p in param_list]
 
 
+class _ClonePlan(object):
+
+    """
+    Flat description of a module tree, used by `clone_module()`.
+
+    The tree is walked once and stored as a pre-order list of module entries,
+    each pointing to its parent entry, together with flat lists of
+    (entry, key) slots for parameters and buffers.
+    Cloning then reduces to a loop over those lists, without recursion.
+    """
+
+    def __init__(self, module):
+        self.modules = []  # (parent entry, key, type, keys of non-None params, buffers, and modules)
+        self.parameters = []  # (entry, key)
+        self.buffers = []  # (entry, key)
+        self._flatten(module, -1, None)
+
+    def _flatten(self, module, parent, key):
+        entry = len(self.modules)
+        self.modules.append((parent,
+                             key,
+                             type(module),
+                             _present_keys(module._parameters),
+                             _present_keys(module._buffers),
+                             _present_keys(module._modules)))
+        for param_key in module._parameters:
+            if module._parameters[param_key] is not None:
+                self.parameters.append((entry, param_key))
+        for buffer_key in module._buffers:
+            if module._buffers[buffer_key] is not None:
+                self.buffers.append((entry, buffer_key))
+        for module_key in module._modules:
+            if module._modules[module_key] is not None:
+                self._flatten(module._modules[module_key], entry, module_key)
+
+    def clone(self, module):
+        # Returns None if the structure of module changed since the plan was built.
+        sources = [None] * len(self.modules)
+        clones = [None] * len(self.modules)
+        try:
+            for entry, (parent, key, cls, param_keys, buffer_keys, module_keys) in enumerate(self.modules):
+                source = module if parent < 0 else sources[parent]._modules[key]
+                if type(source) is not cls or \
+                        _present_keys(source._parameters) != param_keys or \
+                        _present_keys(source._buffers) != buffer_keys or \
+                        _present_keys(source._modules) != module_keys:
+                    return None
+                # Bypasses Module.__setattr__, which dominates the cost of cloning.
+                state = source.__dict__.copy()
+                state['_parameters'] = state['_parameters'].copy()
+                state['_buffers'] = state['_buffers'].copy()
+                state['_modules'] = state['_modules'].copy()
+                clone = source.__new__(cls)
+                clone.__dict__.update(state)
+                if parent >= 0:
+                    clones[parent]._modules[key] = clone
+                sources[entry] = source
+                clones[entry] = clone
+
+            # Re-write all parameters
+            params = [sources[entry]._parameters[key] for entry, key in self.parameters]
+        except KeyError:
+            return None
+        for (entry, key), param in zip(self.parameters, params):
+            if param is not None:
+                clones[entry]._parameters[key] = param.clone()
+
+        # Handle the buffers if necessary
+        for entry, key in self.buffers:
+            buff = sources[entry]._buffers.get(key)
+            if buff is not None and buff.requires_grad:
+                clones[entry]._buffers[key] = buff.clone()
+        return clones[0]
+
+
+def _present_keys(slots):
+    # Keys of the non-None entries of a module's _parameters, _buffers, or _modules.
+    return tuple(key for key, value in slots.items() if value is not None)
+
+
+def _parameter_slots(module):
+    # Yields (module, key) for all parameters, in the order of _ClonePlan.
+    for param_key in module._parameters:
+        if module._parameters[param_key] is not None:
+            yield module, param_key
+    for module_key in module._modules:
+        if module._modules[module_key] is not None:
+            yield from _parameter_slots(module._modules[module_key])
+
+
+def _module_shell(module, memo):
+    # Copy of the module tree with its own parameter, buffer, and submodule dicts, sharing tensors.
+    if id(module) in memo:
+        return memo[id(module)]
+    shell = copy.copy(module)
+    memo[id(module)] = shell
+    shell._parameters = module._parameters.copy()
+    shell._buffers = module._buffers.copy()
+    shell._modules = module._modules.copy()
+    for key, submodule in module._modules.items():
+        if submodule is not None:
+            shell._modules[key] = _module_shell(submodule, memo)
+    return shell
+
+
+_CLONE_PLANS = weakref.WeakKeyDictionary()
+
+
 def clone_module(module):
     """
 
@@ -63,6 +172,10 @@ def clone_module(module):
     the derivatives of the new modules' parameters w.r.t the original
     parameters.
 
+    The structure of the module is flattened once and cached, so that
+    subsequent clones of the same module do not need to recurse through its
+    submodules. The cached plan is rebuilt if the structure of the module changes.
+
     **Arguments**
 
     * **module** (Module) - Module to be cloned.
@@ -85,40 +198,15 @@ def clone_module(module):
     # TODO: This function might require that module.forward()
     #       was called in order to work properly, if forward() instanciates
     #       new variables.
-    # TODO: deepcopy is expensive. We can probably get away with a shallowcopy.
-    #       However, since shallow copy does not recurse, we need to write a
-    #       recursive version of shallow copy.
-    # NOTE: This can probably be implemented more cleanly with
-    #       clone = recursive_shallow_copy(model)
-    #       clone._apply(lambda t: t.clone())
-
-    # First, create a copy of the module.
-    # Adapted from:
-    # https://github.com/pytorch/pytorch/blob/65bad41cbec096aa767b3752843eddebf845726f/torch/nn/modules/module.py#L1171
-    clone = module.__new__(type(module))
-    clone.__dict__ = module.__dict__.copy()
-    clone._parameters = clone._parameters.copy()
-    clone._buffers = clone._buffers.copy()
-    clone._modules = clone._modules.copy()
-
-    # Second, re-write all parameters
-    if hasattr(clone, '_parameters'):
-        for param_key in module._parameters:
-            if module._parameters[param_key] is not None:
-                cloned = module._parameters[param_key].clone()
-                clone._parameters[param_key] = cloned
 
-    # Third, handle the buffers if necessary
-    if hasattr(clone, '_buffers'):
-        for buffer_key in module._buffers:
-            if clone._buffers[buffer_key] is not None and \
-                    clone._buffers[buffer_key].requires_grad:
-                clone._buffers[buffer_key] = module._buffers[buffer_key].clone()
-
-    # Then, recurse for each submodule
-    if hasattr(clone, '_modules'):
-        for module_key in clone._modules:
-            clone._modules[module_key] = clone_module(module._modules[module_key])
+    # The shallow copies are adapted from:
+    # https://github.com/pytorch/pytorch/blob/65bad41cbec096aa767b3752843eddebf845726f/torch/nn/modules/module.py#L1171
+    plan = _CLONE_PLANS.get(module)
+    clone = None if plan is None else plan.clone(module)
+    if clone is None:
+        plan = _ClonePlan(module)
+        _CLONE_PLANS[module] = plan
+        clone = plan.clone(module)
     return clone
 
 
@@ -163,6 +251,61 @@ def detach_module(module):
         detach_module(module._modules[module_key])
 
 
+def all_reduce_gradients(module, group=None):
+    """
+
+    [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/utils.py)
+
+    **Description**
+
+    Averages the gradients of a module's parameters over the processes of a `torch.distributed` group.
+
+    The gradients are flattened into a single buffer, so that each call performs one all-reduce,
+    and parameters without gradient contribute zeros.
+    Parameters without gradient on every rank keep `grad=None` (so that e.g. weight decay and momentum
+    skip them); the others get the average on every rank, so that ranks stay in sync.
+    Call it on the meta-learner (e.g. a `MAML` instance) after `backward()` and before the
+    optimizer step, on every rank.
+
+    **Arguments**
+
+    * **module** (Module or iterable) - Module, or iterable of parameters, whose gradients to average.
+    * **group** (ProcessGroup, *optional*, default=None) - Process group; defaults to the world.
+
+    **Example**
+
+    ~~~python
+    torch.distributed.init_process_group('gloo', rank=rank, world_size=world_size)
+    maml = l2l.algorithms.MAML(model, lr=0.5)
+    evaluation_error.backward()
+    all_reduce_gradients(maml)
+    optimizer.step()
+    ~~~
+    """
+    import torch.distributed as dist
+    from torch._utils import _flatten_dense_tensors, _unflatten_dense_tensors
+
+    if isinstance(module, torch.nn.Module):
+        module = module.parameters()
+    params = [p for p in module if p.requires_grad]
+    if len(params) == 0:
+        return
+    # Missing gradients are reduced as temporary zeros, with a flag telling whether any rank has them.
+    grads = [torch.zeros_like(p) if p.grad is None else p.grad.data for p in params]
+    has_grads = torch.tensor([float(p.grad is not None) for p in params],
+                             dtype=grads[0].dtype,
+                             device=grads[0].device)
+    flat = _flatten_dense_tensors(grads + [has_grads])
+    dist.all_reduce(flat, op=dist.ReduceOp.SUM, group=group)
+    flat.div_(dist.get_world_size(group=group))
+    reduced = _unflatten_dense_tensors(flat, grads + [has_grads])
+    for p, grad, reduced_grad, any_grad in zip(params, grads, reduced, reduced[-1].tolist()):
+        if p.grad is not None:
+            grad.copy_(reduced_grad)
+        elif any_grad > 0:
+            p.grad = reduced_grad.clone()
+
+
 def clone_distribution(dist):
     # TODO: This function was never tested.
     clone = copy.deepcopy(dist)
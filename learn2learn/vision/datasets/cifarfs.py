@@ -1,17 +1,16 @@
 #!/usr/bin/env python3
 
 import os
-import shutil
 import zipfile
 import numpy as np
 import torch
 import torch.utils.data as data
 
-from torchvision.datasets import ImageFolder
+from PIL import Image
 from learn2learn.data.utils import download_file_from_google_drive
 
 
-class CIFARFS(ImageFolder):
+class CIFARFS(data.Dataset):
 
     """
     [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/vision/datasets/cifarfs.py)
@@ -24,6 +23,10 @@ class CIFARFS(ImageFolder):
     The dataset is divided in 3 splits of 64 training, 16 validation, and 20 testing classes each containing 600 examples.
     The classes are sampled from the CIFAR-100 dataset, and we use the splits from Bertinetto et al., 2019.
 
+    The first time, each split is packed into a uint8 array (N x 32 x 32 x 3), and its labels and class names,
+    saved as `.npy` files in `cifarfs/processed`.
+    The images are then memory-mapped, so that loading a sample is a slice instead of a file open.
+
     **References**
 
     1. Bertinetto et al. 2019. "Meta-learning with differentiable closed-form solvers". ICLR.
@@ -47,6 +50,7 @@ class CIFARFS(ImageFolder):
     """
 
     def __init__(self, root, mode='train', transform=None, target_transform=None):
+        super(CIFARFS, self).__init__()
         self.root = os.path.expanduser(root)
         if not os.path.exists(self.root):
             os.mkdir(self.root)
@@ -61,17 +65,63 @@ class CIFARFS(ImageFolder):
         if not self._check_processed():
             self._process_zip()
         mode = 'val' if mode == 'validation' else mode
-        self.processed_root = os.path.join(self.processed_root, mode)
         self._bookkeeping_path = os.path.join(self.root, 'cifarfs-' + mode + '-bookkeeping.pkl')
-        super(CIFARFS, self).__init__(root=self.processed_root,
-                                      transform=self.transform,
-                                      target_transform=self.target_transform)
+        images_path, labels_path, classes_path = self._store_paths(mode)
+        self.images = np.load(images_path, mmap_mode='r')
+        self.targets = np.load(labels_path)
+        self.classes = np.load(classes_path).tolist()
+        self.class_to_idx = {name: i for i, name in enumerate(self.classes)}
 
     def _check_exists(self):
         return os.path.exists(self.raw_path)
 
+    def _store_paths(self, split):
+        prefix = os.path.join(self.processed_root, split)
+        return prefix + '_images.npy', prefix + '_labels.npy', prefix + '_classes.npy'
+
     def _check_processed(self):
-        return os.path.exists(self.processed_root)
+        return all(os.path.exists(path)
+                   for split in ['train', 'val', 'test']
+                   for path in self._store_paths(split))
+
+    def __getitem__(self, idx):
+        image = Image.fromarray(self.images[idx])
+        label = int(self.targets[idx])
+        if self.transform is not None:
+            image = self.transform(image)
+        if self.target_transform is not None:
+            label = self.target_transform(label)
+        return image, label
+
+    def get_batch(self, indices):
+        """
+        **Description**
+
+        Returns the images and labels of the samples at `indices`, collated into two tensors.
+
+        When no transform is given, the images are gathered with a single uint8 slice of the
+        memory-mapped store and converted to float (3 x 32 x 32) in [0, 1], as `ToTensor` would.
+        Note that `__getitem__` returns PIL images in that case, so the two only agree once
+        a transform that ends with `ToTensor` is set.
+
+        **Arguments**
+
+        * **indices** (Tensor or list) - Indices of the samples to load.
+        """
+        indices = torch.as_tensor(indices, dtype=torch.long)
+        if self.transform is not None:
+            data = torch.stack([self.transform(Image.fromarray(self.images[i]))
+                                for i in indices.tolist()])
+        else:
+            images = torch.from_numpy(self.images[indices.numpy()])
+            data = images.permute(0, 3, 1, 2).float().div_(255.0)
+        labels = torch.from_numpy(self.targets[indices.numpy()])
+        if self.target_transform is not None:
+            labels = torch.tensor([self.target_transform(label) for label in labels.tolist()])
+        return data, labels
+
+    def __len__(self):
+        return len(self.targets)
 
     def _download(self):
         # Download the zip, unzip it, and clean up
@@ -88,7 +138,7 @@ class CIFARFS(ImageFolder):
     def _process_zip(self):
         print('Creating CIFARFS splits')
         if not os.path.exists(self.processed_root):
-            os.mkdir(self.processed_root)
+            os.makedirs(self.processed_root)
         split_path = os.path.join(self.raw_path, 'cifar100', 'splits', 'bertinetto')
         train_split_file = os.path.join(split_path, 'train.txt')
         valid_split_file = os.path.join(split_path, 'val.txt')
@@ -98,14 +148,38 @@ class CIFARFS(ImageFolder):
         for fname, dest in [(train_split_file, 'train'),
                             (valid_split_file, 'val'),
                             (test_split_file, 'test')]:
-            dest_target = os.path.join(self.processed_root, dest)
-            if not os.path.exists(dest_target):
-                os.mkdir(dest_target)
             with open(fname) as split:
-                for label in split.readlines():
-                    source = os.path.join(source_dir, label.strip())
-                    target = os.path.join(dest_target, label.strip())
-                    shutil.copytree(source, target)
+                classes = sorted(label.strip() for label in split.readlines() if label.strip())
+            # Same order as ImageFolder: sorted classes, then sorted files.
+            files = []
+            labels = []
+            for label, name in enumerate(classes):
+                class_dir = os.path.join(source_dir, name)
+                for image_file in sorted(os.listdir(class_dir)):
+                    files.append(os.path.join(class_dir, image_file))
+                    labels.append(label)
+            self._pack_split(dest, files, labels, classes)
+
+    def _pack_split(self, split, files, labels, classes):
+        # Decodes the images of a split into a uint8 .npy array, written then renamed.
+        images_path, labels_path, classes_path = self._store_paths(split)
+        tmp_path = images_path + '.' + str(os.getpid()) + '.tmp'
+        store = np.lib.format.open_memmap(tmp_path,
+                                          mode='w+',
+                                          dtype=np.uint8,
+                                          shape=(len(files), 32, 32, 3))
+        for i, path in enumerate(files):
+            with Image.open(path) as image:
+                store[i] = np.asarray(image.convert('RGB'), dtype=np.uint8)
+        store.flush()
+        del store
+        os.replace(tmp_path, images_path)
+        for path, array in [(labels_path, np.asarray(labels, dtype=np.int64)),
+                            (classes_path, np.array(classes))]:
+            tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
 
 
 if __name__ == '__main__':
@@ -4,6 +4,8 @@ import os
 import pickle
 import zipfile
 
+import numpy as np
+import torch
 import torch.utils.data as data
 
 from PIL import Image
@@ -43,6 +45,9 @@ class FC100(data.Dataset):
         Must be 'train', 'validation', or 'test'.
     * **transform** (Transform, *optional*, default=None) - Input pre-processing.
     * **target_transform** (Transform, *optional*, default=None) - Target pre-processing.
+    * **tensor** (bool, *optional*, default=False) - Whether samples are float tensors (3 x 32 x 32, in [0, 1])
+        converted directly from `images` instead of PIL images.
+        `transform` then receives these tensors (e.g. `Normalize`, or augmentations on tensors).
 
     **Example**
 
@@ -50,11 +55,17 @@ class FC100(data.Dataset):
     train_dataset = l2l.vision.datasets.FC100(root='./data', mode='train')
     train_dataset = l2l.data.MetaDataset(train_dataset)
     train_generator = l2l.data.TaskDataset(dataset=train_dataset, num_tasks=1000)
+
+    # Without PIL conversions
+    normalize = torchvision.transforms.Normalize(mean=[0.5071, 0.4866, 0.4409],
+                                                 std=[0.2673, 0.2564, 0.2762])
+    train_dataset = l2l.vision.datasets.FC100(root='./data', mode='train', tensor=True, transform=normalize)
+    X, y = train_dataset.get_batch([0, 1, 2])
     ~~~
 
     """
 
-    def __init__(self, root, mode='train', transform=None, target_transform=None):
+    def __init__(self, root, mode='train', transform=None, target_transform=None, tensor=False):
         super(FC100, self).__init__()
         self.root = os.path.expanduser(root)
         os.makedirs(self.root, exist_ok=True)
@@ -63,6 +74,7 @@ class FC100(data.Dataset):
         if mode not in ['train', 'validation', 'test']:
             raise ValueError('mode must be train, validation, or test.')
         self.mode = mode
+        self.tensor = tensor
         self._bookkeeping_path = os.path.join(self.root, 'fc100-bookkeeping-' + mode + '.pkl')
 
         if not self._check_exists():
@@ -74,8 +86,9 @@ class FC100(data.Dataset):
             u = pickle._Unpickler(f)
             u.encoding = 'latin1'
             archive = u.load()
-        self.images = archive['data']
-        self.labels = archive['labels']
+        # uint8 images, N x 3 x 32 x 32.
+        self.images = torch.from_numpy(np.ascontiguousarray(archive['data'].transpose(0, 3, 1, 2)))
+        self.labels = np.asarray(archive['labels'], dtype=np.int64)
 
     def download(self):
         archive_path = os.path.join(self.root, 'fc100.zip')
@@ -92,16 +105,46 @@ class FC100(data.Dataset):
             archive_file.extractall(self.root)
             os.remove(archive_path)
 
+    def _image(self, idx):
+        if self.tensor:
+            return self.images[idx].float().div_(255.0)
+        return Image.fromarray(self.images[idx].permute(1, 2, 0).numpy())
+
     def __getitem__(self, idx):
-        image = self.images[idx]
-        image = Image.fromarray(image)
-        label = self.labels[idx]
+        image = self._image(idx)
+        label = int(self.labels[idx])
         if self.transform is not None:
             image = self.transform(image)
         if self.target_transform is not None:
             label = self.target_transform(label)
         return image, label
 
+    def get_batch(self, indices):
+        """
+        **Description**
+
+        Returns the images and labels of the samples at `indices`, collated into two tensors.
+
+        The images are gathered and converted to float (B x 3 x 32 x 32, in [0, 1]) in one op.
+        `transform` is then applied to each image, as in `__getitem__`, so that random
+        augmentations differ between images; without `tensor`, it receives PIL images.
+
+        **Arguments**
+
+        * **indices** (Tensor or list) - Indices of the samples to load.
+        """
+        indices = torch.as_tensor(indices, dtype=torch.long)
+        if self.transform is not None and not self.tensor:
+            data = torch.stack([self.transform(self._image(i)) for i in indices.tolist()])
+        else:
+            data = self.images.index_select(0, indices).float().div_(255.0)
+            if self.transform is not None:
+                data = torch.stack([self.transform(image) for image in data])
+        labels = torch.from_numpy(self.labels[indices.numpy()])
+        if self.target_transform is not None:
+            labels = torch.tensor([self.target_transform(label) for label in labels.tolist()])
+        return data, labels
+
     def __len__(self):
         return len(self.labels)
 
@@ -2,12 +2,14 @@
 
 import os
 import pickle
-import tarfile
-import requests
+import numpy as np
 from PIL import Image
 
 from torch.utils.data import Dataset
 
+from learn2learn.data.utils import download_and_extract
+from learn2learn.vision.datasets.image_store import pack_images
+
 DATASET_DIR = 'fgvc_aircraft'
 DATASET_URL = 'http://www.robots.ox.ac.uk/~vgg/data/fgvc-aircraft/archives/fgvc-aircraft-2013b.tar.gz'
 DATA_DIR = os.path.join('fgvc-aircraft-2013b', 'data')
@@ -87,6 +89,11 @@ class FGVCAircraft(Dataset):
     * **transform** (Transform, *optional*, default=None) - Input pre-processing.
     * **target_transform** (Transform, *optional*, default=None) - Target pre-processing.
     * **download** (bool, *optional*, default=False) - Whether to download the dataset.
+    * **image_size** (int, *optional*, default=None) - If given, the images are decoded and resized
+        to `image_size` x `image_size` once, with a pool of processes, into a packed uint8 array
+        (`fgvc-aircraft-<mode>-images-<image_size>.npy`, N x image_size x image_size x 3).
+        The array is then memory-mapped, so that loading an image decodes no JPEG.
+        `transform` is still applied to the (resized) PIL images.
 
     **Example**
 
@@ -98,7 +105,7 @@ class FGVCAircraft(Dataset):
 
     """
 
-    def __init__(self, root, mode='all', transform=None, target_transform=None, download=False):
+    def __init__(self, root, mode='all', transform=None, target_transform=None, download=False, image_size=None):
         root = os.path.expanduser(root)
         self.root = os.path.expanduser(root)
         self.transform = transform
@@ -112,6 +119,15 @@ class FGVCAircraft(Dataset):
             'mode should be one of train, validation, test.'
         self.load_data(mode)
 
+        self.images = None
+        if image_size is not None:
+            store_path = os.path.join(self.root,
+                                      DATASET_DIR,
+                                      'fgvc-aircraft-' + mode + '-images-' + str(image_size) + '.npy')
+            if not os.path.exists(store_path):
+                pack_images([image for image, _ in self.data], store_path, image_size)
+            self.images = np.load(store_path, mmap_mode='r')
+
     def _check_exists(self):
         data_path = os.path.join(self.root, DATASET_DIR)
         images_path = os.path.join(data_path, IMAGES_DIR)
@@ -127,15 +143,8 @@ class FGVCAircraft(Dataset):
         if not os.path.exists(data_path):
             os.mkdir(data_path)
         tar_path = os.path.join(data_path, os.path.basename(DATASET_URL))
-        if not os.path.exists(tar_path):
-            print('Downloading FGVC Aircraft dataset. (2.75Gb)')
-            req = requests.get(DATASET_URL)
-            with open(tar_path, 'wb') as archive:
-                for chunk in req.iter_content(chunk_size=32768):
-                    if chunk:
-                        archive.write(chunk)
-        with tarfile.open(tar_path) as tar_file:
-            tar_file.extractall(data_path)
+        print('Downloading FGVC Aircraft dataset. (2.75Gb)')
+        download_and_extract(DATASET_URL, data_path, archive_path=tar_path)
         family_names = ['images_family_train.txt',
                         'images_family_val.txt',
                         'images_family_test.txt']
@@ -148,7 +157,6 @@ class FGVCAircraft(Dataset):
         labels_path = os.path.join(data_path, LABELS_PATH)
         with open(labels_path, 'wb') as labels_file:
             pickle.dump(images_labels, labels_file)
-        os.remove(tar_path)
 
     def load_data(self, mode='train'):
         data_path = os.path.join(self.root, DATASET_DIR)
@@ -168,7 +176,10 @@ class FGVCAircraft(Dataset):
 
     def __getitem__(self, i):
         image, label = self.data[i]
-        image = Image.open(image)
+        if self.images is not None:
+            image = Image.fromarray(self.images[i])
+        else:
+            image = Image.open(image)
         if self.transform:
             image = self.transform(image)
         if self.target_transform:
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 
 import os
+
+import numpy as np
+from PIL import Image
 from torch.utils.data import Dataset, ConcatDataset
 from torchvision.datasets.omniglot import Omniglot
 
@@ -32,6 +35,11 @@ class FullOmniglot(Dataset):
     * **transform** (Transform, *optional*, default=None) - Input pre-processing.
     * **target_transform** (Transform, *optional*, default=None) - Target pre-processing.
     * **download** (bool, *optional*, default=False) - Whether to download the dataset.
+    * **image_size** (int, *optional*, default=None) - If given, the images are decoded and resized
+        (with LANCZOS) to `image_size` x `image_size` once, and stored with the labels in packed uint8
+        arrays (`omniglot-images-<image_size>.npy` and `omniglot-labels.npy`, next to the bookkeeping).
+        The arrays are then memory-mapped, so that loading an image reads no file.
+        `transform` is still applied to the (resized) PIL images.
 
     **Example**
     ~~~python
@@ -47,7 +55,7 @@ class FullOmniglot(Dataset):
 
     """
 
-    def __init__(self, root, transform=None, target_transform=None, download=False):
+    def __init__(self, root, transform=None, target_transform=None, download=False, image_size=None):
         self.root = os.path.expanduser(root)
         self.transform = transform
         self.target_transform = target_transform
@@ -62,13 +70,52 @@ class FullOmniglot(Dataset):
                                    target_transform=lambda x: x + len(omni_background._characters))
 
         self.dataset = ConcatDataset((omni_background, omni_evaluation))
+        self._num_background = len(omni_background)
+        self._num_background_characters = len(omni_background._characters)
         self._bookkeeping_path = os.path.join(self.root, 'omniglot-bookkeeping.pkl')
 
+        self.image_size = image_size
+        self.images = None
+        self.targets = None
+        if image_size is not None:
+            images_path, labels_path = self._store_paths()
+            if not os.path.exists(images_path) or not os.path.exists(labels_path):
+                self._build_store()
+            self.images = np.load(images_path, mmap_mode='r')
+            self.targets = np.load(labels_path)
+
+    def _store_paths(self):
+        return (os.path.join(self.root, 'omniglot-images-' + str(self.image_size) + '.npy'),
+                os.path.join(self.root, 'omniglot-labels.npy'))
+
+    def _build_store(self):
+        # Decodes and resizes every image once, then writes the arrays and renames them.
+        images_path, labels_path = self._store_paths()
+        shape = (len(self.dataset), self.image_size, self.image_size)
+        tmp_images_path = images_path + '.' + str(os.getpid()) + '.tmp'
+        images = np.lib.format.open_memmap(tmp_images_path, mode='w+', dtype=np.uint8, shape=shape)
+        labels = np.empty(len(self.dataset), dtype=np.int64)
+        for item in range(len(self.dataset)):
+            image, labels[item] = self.dataset[item]
+            image = image.resize((self.image_size, self.image_size), resample=Image.LANCZOS)
+            images[item] = np.asarray(image, dtype=np.uint8)
+        images.flush()
+        del images
+        os.replace(tmp_images_path, images_path)
+        tmp_labels_path = labels_path + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_labels_path, 'wb') as f:
+            np.save(f, labels)
+        os.replace(tmp_labels_path, labels_path)
+
     def __len__(self):
         return len(self.dataset)
 
     def __getitem__(self, item):
-        image, character_class = self.dataset[item]
+        if self.images is not None:
+            image = Image.fromarray(np.asarray(self.images[item]), mode='L')
+            character_class = int(self.targets[item])
+        else:
+            image, character_class = self.dataset[item]
         if self.transform:
             image = self.transform(image)
 
@@ -76,3 +123,17 @@ class FullOmniglot(Dataset):
             character_class = self.target_transform(character_class)
 
         return image, character_class
+
+    def get_label(self, item):
+        # Reads the label without loading the image. (Used by MetaDataset.)
+        background, evaluation = self.dataset.datasets
+        if self.targets is not None:
+            character_class = int(self.targets[item])
+        elif item < self._num_background:
+            character_class = background._flat_character_images[item][1]
+        else:
+            character_class = evaluation._flat_character_images[item - self._num_background][1]
+            character_class += self._num_background_characters
+        if self.target_transform:
+            character_class = self.target_transform(character_class)
+        return character_class
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+"""
+Caches of decoded images, keyed by dataset index.
+"""
+
+import collections
+import multiprocessing
+
+import numpy as np
+import torch
+
+
+class LRUImageCache(object):
+
+    """
+    [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/vision/datasets/image_cache.py)
+
+    **Description**
+
+    Least-recently-used cache of decoded images (uint8 arrays), bounded by their total size in bytes.
+
+    The cache is local to the process: each DataLoader worker fills its own copy.
+
+    **Arguments**
+
+    * **capacity** (int) - Maximum number of bytes of cached images.
+
+    **Example**
+    ~~~python
+    cache = LRUImageCache(capacity=2**30)
+    image = cache.get(index)
+    if image is None:
+        image = decode(index)
+        cache.put(index, image)
+    ~~~
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.size = 0
+        self.images = collections.OrderedDict()
+
+    def get(self, index):
+        image = self.images.get(index)
+        if image is not None:
+            self.images.move_to_end(index)
+        return image
+
+    def put(self, index, image):
+        if image.nbytes > self.capacity or index in self.images:
+            return
+        while self.size + image.nbytes > self.capacity:
+            _, evicted = self.images.popitem(last=False)
+            self.size -= evicted.nbytes
+        self.images[index] = image
+        self.size += image.nbytes
+
+    def __len__(self):
+        return len(self.images)
+
+
+class SharedImageCache(object):
+
+    """
+    [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/vision/datasets/image_cache.py)
+
+    **Description**
+
+    Cache of decoded images of a fixed shape, stored in shared memory and shared by the
+    DataLoader workers forked (or spawned) after its creation.
+
+    The images are stored in `capacity // image_bytes` slots, and evicted with the CLOCK
+    approximation of least-recently-used.
+    Images of another shape are not cached.
+
+    **Arguments**
+
+    * **capacity** (int) - Maximum number of bytes of cached images.
+    * **num_items** (int) - Number of images in the dataset; indices range in `[0, num_items)`.
+    * **shape** (tuple) - Shape of the uint8 images.
+    """
+
+    def __init__(self, capacity, num_items, shape):
+        self.shape = tuple(shape)
+        image_bytes = int(np.prod(self.shape))
+        num_slots = max(min(capacity // image_bytes, num_items), 1)
+        self.images = torch.zeros((num_slots, ) + self.shape, dtype=torch.uint8).share_memory_()
+        self.slot_of = torch.full((num_items, ), -1, dtype=torch.int64).share_memory_()
+        self.index_of = torch.full((num_slots, ), -1, dtype=torch.int64).share_memory_()
+        self.referenced = torch.zeros(num_slots, dtype=torch.uint8).share_memory_()
+        self.hand = torch.zeros(1, dtype=torch.int64).share_memory_()
+        self.lock = multiprocessing.Lock()
+
+    def get(self, index):
+        if self.slot_of[index] < 0:
+            return None
+        with self.lock:
+            slot = int(self.slot_of[index])
+            if slot < 0:
+                return None
+            self.referenced[slot] = 1
+            return self.images[slot].numpy().copy()
+
+    def put(self, index, image):
+        if image.shape != self.shape or image.dtype != np.uint8:
+            return
+        with self.lock:
+            if self.slot_of[index] >= 0:
+                return
+            num_slots = len(self.index_of)
+            hand = int(self.hand[0])
+            while self.referenced[hand]:  # Second chance to recently used images.
+                self.referenced[hand] = 0
+                hand = (hand + 1) % num_slots
+            evicted = int(self.index_of[hand])
+            if evicted >= 0:
+                self.slot_of[evicted] = -1
+            self.images[hand].numpy()[...] = image
+            self.index_of[hand] = index
+            self.slot_of[index] = hand
+            self.referenced[hand] = 1
+            self.hand[0] = (hand + 1) % num_slots
+
+    def __len__(self):
+        return int((self.index_of >= 0).sum())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+"""
+Packed stores of resized images, decoded once from image files.
+"""
+
+import multiprocessing
+import os
+
+import numpy as np
+from PIL import Image
+
+
+def load_resized(path, image_size):
+    """
+    [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/vision/datasets/image_store.py)
+
+    **Description**
+
+    Decodes the image at `path` as RGB and resizes it (with LANCZOS) to `image_size` x `image_size`.
+
+    JPEGs are decoded at a reduced scale (PIL's draft mode) when they are at least twice as large as needed,
+    which is much faster than decoding at full resolution before resizing.
+
+    **Arguments**
+
+    * **path** (str) - Path to the image file.
+    * **image_size** (int) - Height and width of the resized image.
+    """
+    with Image.open(path) as image:
+        image.draft('RGB', (image_size, image_size))
+        image = image.convert('RGB').resize((image_size, image_size), resample=Image.LANCZOS)
+        return np.asarray(image, dtype=np.uint8)
+
+
+def _load_resized(args):
+    return load_resized(*args)
+
+
+def pack_images(paths, store_path, image_size, num_workers=None):
+    """
+    [[Source]](https://github.com/learnables/learn2learn/blob/master/learn2learn/vision/datasets/image_store.py)
+
+    **Description**
+
+    Decodes and resizes the images at `paths` with a pool of processes, and writes them in order
+    to a uint8 `.npy` array (N x image_size x image_size x 3) at `store_path`.
+
+    The array is written to a temporary file and then renamed, so that `store_path` exists only once complete.
+    Open it with `np.load(store_path, mmap_mode='r')`.
+
+    **Arguments**
+
+    * **paths** (list) - Paths to the image files.
+    * **store_path** (str) - Path to the `.npy` file.
+    * **image_size** (int) - Height and width of the resized images.
+    * **num_workers** (int, *optional*, default=None) - Number of decoding processes.
+        Defaults to the number of CPUs; 0 decodes in the current process.
+
+    **Example**
+    ~~~python
+    pack_images(image_paths, './data/images-84.npy', image_size=84)
+    images = np.load('./data/images-84.npy', mmap_mode='r')
+    ~~~
+    """
+    shape = (len(paths), image_size, image_size, 3)
+    tmp_path = store_path + '.' + str(os.getpid()) + '.tmp'
+    store = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=shape)
+    args = [(path, image_size) for path in paths]
+    if num_workers == 0:
+        for i, arg in enumerate(args):
+            store[i] = _load_resized(arg)
+    else:
+        with multiprocessing.Pool(num_workers) as pool:
+            for i, image in enumerate(pool.imap(_load_resized, args, chunksize=16)):
+                store[i] = image
+    store.flush()
+    del store
+    os.replace(tmp_path, store_path)
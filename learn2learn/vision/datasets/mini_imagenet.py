@@ -56,6 +56,10 @@ class MiniImagenet(data.Dataset):
         Must be 'train', 'validation', or 'test'.
     * **transform** (Transform, *optional*, default=None) - Input pre-processing.
     * **target_transform** (Transform, *optional*, default=None) - Target pre-processing.
+    * **memmap** (bool, *optional*, default=False) - Whether to keep the images as uint8 (N x 84 x 84 x 3)
+        in a memory-mapped `.npy` file, created from the pickle the first time, instead of loading
+        them in memory as a float tensor. Images are then converted to float (3 x 84 x 84) when
+        loaded, one at a time by indexing or for a whole batch by `get_batch`.
 
     **Example**
 
@@ -67,7 +71,7 @@ class MiniImagenet(data.Dataset):
 
     """
 
-    def __init__(self, root, mode='train', transform=None, target_transform=None):
+    def __init__(self, root, mode='train', transform=None, target_transform=None, memmap=False):
         super(MiniImagenet, self).__init__()
         self.root = os.path.expanduser(root)
         if not os.path.exists(self.root):
@@ -75,6 +79,7 @@ class MiniImagenet(data.Dataset):
         self.transform = transform
         self.target_transform = target_transform
         self.mode = mode
+        self.memmap = memmap
         self._bookkeeping_path = os.path.join(self.root, 'mini-imagenet-bookkeeping-' + mode + '.pkl')
         if self.mode == 'test':
             google_drive_file_id = '1wpmY-hmiJUUlRBkO9ZDCXAcIpHEFdOhD'
@@ -85,28 +90,112 @@ class MiniImagenet(data.Dataset):
         else:
             raise ('ValueError', 'Needs to be train, test or validation')
 
-        if not self._check_exists():
+        store_exists = all(os.path.exists(p) for p in self._store_paths())
+        if not self._check_exists() and not (memmap and store_exists):
             download_pkl(google_drive_file_id, self.root, mode)
 
-        pickle_file = os.path.join(self.root, 'mini-imagenet-cache-' + mode + '.pkl')
+        if memmap:
+            images_path, labels_path, classes_path = self._store_paths()
+            if not store_exists:
+                self._load_pickle()
+                self._convert_to_store()
+                del self.data
+            self.x = np.load(images_path, mmap_mode='r')
+            self.y = np.load(labels_path).astype(np.int64, copy=False)
+            self.class_idx = index_classes(np.load(classes_path).tolist())
+            self._label_indices = np.argsort(self.y, kind='stable')
+            self._label_offsets = np.zeros(len(self.class_idx) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.y, minlength=len(self.class_idx)), out=self._label_offsets[1:])
+            return
+
+        self._load_pickle()
+        self.x = torch.from_numpy(self.data["image_data"]).permute(0, 3, 1, 2).float()
+        self.y, self.class_idx, self._label_offsets, self._label_indices = self._labels(len(self.x))
+
+    def _load_pickle(self):
+        pickle_file = os.path.join(self.root, 'mini-imagenet-cache-' + self.mode + '.pkl')
         with open(pickle_file, 'rb') as f:
             self.data = pickle.load(f)
 
-        self.x = torch.from_numpy(self.data["image_data"]).permute(0, 3, 1, 2).float()
-        self.y = np.ones(len(self.x))
-
-        # TODO Remove index_classes from here
-        self.class_idx = index_classes(self.data['class_dict'].keys())
-        for class_name, idxs in self.data['class_dict'].items():
-            for idx in idxs:
-                self.y[idx] = self.class_idx[class_name]
+    def _labels(self, num_images):
+        # Returns the int64 label of each image, the class indices, and the CSR-style
+        # label index of class_dict: the indices of class c are indices[offsets[c]:offsets[c + 1]].
+        class_dict = self.data['class_dict']
+        class_idx = index_classes(class_dict.keys())
+        class_indices = [np.asarray(class_dict[name], dtype=np.int64) for name in class_idx]
+        sizes = np.array([len(indices) for indices in class_indices], dtype=np.int64)
+        label_offsets = np.zeros(len(class_indices) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=label_offsets[1:])
+        label_indices = np.concatenate(class_indices) if class_indices else np.zeros(0, dtype=np.int64)
+        y = np.ones(num_images, dtype=np.int64)
+        y[label_indices] = np.repeat(np.arange(len(class_indices), dtype=np.int64), sizes)
+        return y, class_idx, label_offsets, label_indices
+
+    def get_bookkeeping(self):
+        """
+        **Description**
+
+        Returns the label index of the dataset, used by `MetaDataset` instead of scanning the dataset.
+        (See `MetaDataset`.)
+        With a `target_transform`, `MetaDataset` ignores it and saves its bookkeeping in `root` instead.
+        """
+        return {
+            'label_values': list(range(len(self.class_idx))),
+            'label_codes': self.y,
+            'label_offsets': self._label_offsets,
+            'label_indices': self._label_indices,
+        }
+
+    def _store_paths(self):
+        prefix = os.path.join(self.root, 'mini-imagenet-' + self.mode)
+        return prefix + '-images.npy', prefix + '-labels.npy', prefix + '-classes.npy'
+
+    def _convert_to_store(self):
+        # Saves the uint8 images, labels, and class names as .npy files, written then renamed.
+        images = np.ascontiguousarray(self.data['image_data'], dtype=np.uint8)
+        y, class_idx, _, _ = self._labels(len(images))
+        class_names = np.array(list(class_idx.keys()))
+        for path, array in zip(self._store_paths(), [images, y, class_names]):
+            tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+
+    def _image(self, idx):
+        if self.memmap:
+            return torch.from_numpy(np.array(self.x[idx])).permute(2, 0, 1).float()
+        return self.x[idx]
 
     def __getitem__(self, idx):
-        data = self.x[idx]
+        data = self._image(idx)
         if self.transform:
             data = self.transform(data)
         return data, self.y[idx]
 
+    def get_batch(self, indices):
+        """
+        **Description**
+
+        Returns the images and labels of the samples at `indices`, collated into two tensors.
+
+        Equivalent to collating `[self[i] for i in indices]`, but gathers the images
+        with a single `index_select` (or, with `memmap`, a single uint8 gather and float
+        conversion) when no transform is given.
+
+        **Arguments**
+
+        * **indices** (Tensor or list) - Indices of the samples to load.
+        """
+        indices = torch.as_tensor(indices, dtype=torch.long)
+        if self.transform:
+            data = torch.stack([self.transform(self._image(i)) for i in indices.tolist()])
+        elif self.memmap:
+            images = torch.from_numpy(self.x[indices.numpy()])
+            data = images.permute(0, 3, 1, 2).float()
+        else:
+            data = self.x.index_select(0, indices)
+        return data, torch.from_numpy(self.y[indices.numpy()])
+
     def __len__(self):
         return len(self.x)
 
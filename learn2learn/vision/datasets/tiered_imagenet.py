@@ -3,15 +3,16 @@
 import os
 import io
 import pickle
-import tarfile
 
 import numpy as np
 import torch
+import requests
 import torch.utils.data as data
 
 from PIL import Image
 
-from learn2learn.data.utils import download_file_from_google_drive
+from learn2learn.data.utils import download_and_extract, google_drive_source
+from learn2learn.vision.datasets.image_cache import LRUImageCache, SharedImageCache
 
 
 class TieredImagenet(data.Dataset):
@@ -41,6 +42,16 @@ class TieredImagenet(data.Dataset):
     * **transform** (Transform, *optional*, default=None) - Input pre-processing.
     * **target_transform** (Transform, *optional*, default=None) - Target pre-processing.
     * **download** (bool, *optional*, default=False) - Whether to download the dataset.
+    * **cache_size** (int, *optional*, default=0) - Size in bytes of a cache of decoded images,
+        which avoids decoding the PNG of frequently sampled images again. Disabled when 0,
+        and unused with `memmap`.
+    * **shared_cache** (bool, *optional*, default=False) - Whether the cache lives in shared memory,
+        and is shared by the DataLoader workers, instead of being local to each process.
+    * **memmap** (bool, *optional*, default=False) - Whether to read images from a uint8 array store
+        (`<mode>_images.npy`, N x 84 x 84 x 3, and `<mode>_labels.npy`) opened with `mmap_mode='r'`,
+        instead of loading and decoding the pickled PNGs.
+        The store is created from the pickled PNGs, by decoding every image once, the first time.
+        Processes then share the images through the page cache, and loading an image is a slice.
 
     **Example**
 
@@ -52,7 +63,15 @@ class TieredImagenet(data.Dataset):
 
     """
 
-    def __init__(self, root, mode='train', transform=None, target_transform=None, download=False):
+    def __init__(self,
+                 root,
+                 mode='train',
+                 transform=None,
+                 target_transform=None,
+                 download=False,
+                 cache_size=0,
+                 shared_cache=False,
+                 memmap=False):
         super(TieredImagenet, self).__init__()
         self.root = os.path.expanduser(root)
         if not os.path.exists(self.root):
@@ -68,7 +87,36 @@ class TieredImagenet(data.Dataset):
         if not self._check_exists() and download:
             self.download(google_drive_file_id, self.root)
 
-        short_mode = 'val' if mode == 'validation' else mode
+        self.memmap = memmap
+        if memmap:
+            images_path, labels_path = self._store_paths()
+            if not os.path.exists(images_path) or not os.path.exists(labels_path):
+                self._load_pickles()
+                self._convert_to_store()
+            self.images = np.load(images_path, mmap_mode='r')
+            self.labels = np.load(labels_path)
+        else:
+            self._load_pickles()
+
+        self.cache = None
+        if cache_size > 0 and not memmap:
+            if shared_cache:
+                shape = self._decode(0).shape
+                self.cache = SharedImageCache(cache_size, len(self.labels), shape)
+            else:
+                self.cache = LRUImageCache(cache_size)
+
+    def download(self, file_id, destination):
+        archive_path = os.path.join(destination, 'tiered_imagenet.tar')
+        print('Downloading tiered ImageNet. (12Gb) Please be patient.')
+        session = requests.Session()
+        download_and_extract(google_drive_source(file_id, session),
+                             destination,
+                             archive_path=archive_path,
+                             session=session)
+
+    def _load_pickles(self):
+        short_mode = 'val' if self.mode == 'validation' else self.mode
         tiered_imaganet_path = os.path.join(self.root, 'tiered-imagenet')
         images_path = os.path.join(tiered_imaganet_path, short_mode + '_images_png.pkl')
         with open(images_path, 'rb') as images_file:
@@ -78,16 +126,47 @@ class TieredImagenet(data.Dataset):
             self.labels = pickle.load(labels_file)
             self.labels = self.labels['label_specific']
 
-    def download(self, file_id, destination):
-        archive_path = os.path.join(destination, 'tiered_imagenet.tar')
-        print('Downloading tiered ImageNet. (12Gb) Please be patient.')
-        download_file_from_google_drive(file_id, archive_path)
-        archive_file = tarfile.open(archive_path)
-        archive_file.extractall(destination)
-        os.remove(archive_path)
+    def _store_paths(self):
+        short_mode = 'val' if self.mode == 'validation' else self.mode
+        tiered_imaganet_path = os.path.join(self.root, 'tiered-imagenet')
+        return (os.path.join(tiered_imaganet_path, short_mode + '_images.npy'),
+                os.path.join(tiered_imaganet_path, short_mode + '_labels.npy'))
+
+    def _convert_to_store(self):
+        # Decodes all PNGs (loaded by _load_pickles) into a uint8 .npy array, written then renamed.
+        images_path, labels_path = self._store_paths()
+        shape = (len(self.images), ) + self._decode_png(0).shape
+        tmp_path = images_path + '.' + str(os.getpid()) + '.tmp'
+        store = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=shape)
+        for i in range(len(self.images)):
+            store[i] = self._decode_png(i)
+        store.flush()
+        del store
+        os.replace(tmp_path, images_path)
+        tmp_path = labels_path + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(self.labels, dtype=np.int64))
+        os.replace(tmp_path, labels_path)
+
+    def _decode_png(self, idx):
+        return np.asarray(Image.open(io.BytesIO(self.images[idx])), dtype=np.uint8)
+
+    def _decode(self, idx):
+        if self.memmap:
+            return np.asarray(self.images[idx])
+        return self._decode_png(idx)
 
     def __getitem__(self, idx):
-        image = Image.open(io.BytesIO(self.images[idx]))
+        if self.memmap:
+            image = Image.fromarray(self.images[idx])
+        elif self.cache is None:
+            image = Image.open(io.BytesIO(self.images[idx]))
+        else:
+            array = self.cache.get(idx)
+            if array is None:
+                array = self._decode(idx)
+                self.cache.put(idx, array)
+            image = Image.fromarray(array)
         label = self.labels[idx]
         if self.transform is not None:
             image = self.transform(image)
@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 
 import os
-import tarfile
-import requests
+import numpy as np
 import scipy.io
 from PIL import Image
 
 from torch.utils.data import Dataset
 
+from learn2learn.data.utils import download_and_extract, download_file
+from learn2learn.vision.datasets.image_store import pack_images
+
 DATA_DIR = 'vgg_flower102'
 IMAGES_URL = 'http://www.robots.ox.ac.uk/~vgg/data/flowers/102/102flowers.tgz'
 LABELS_URL = 'http://www.robots.ox.ac.uk/~vgg/data/flowers/102/imagelabels.mat'
@@ -53,6 +55,11 @@ class VGGFlower102(Dataset):
     * **transform** (Transform, *optional*, default=None) - Input pre-processing.
     * **target_transform** (Transform, *optional*, default=None) - Target pre-processing.
     * **download** (bool, *optional*, default=False) - Whether to download the dataset.
+    * **image_size** (int, *optional*, default=None) - If given, the images are decoded and resized
+        to `image_size` x `image_size` once, with a pool of processes, into a packed uint8 array
+        (`vgg-flower102-<mode>-images-<image_size>.npy`, N x image_size x image_size x 3).
+        The array is then memory-mapped, so that loading an image decodes no JPEG.
+        `transform` is still applied to the (resized) PIL images.
 
     **Example**
 
@@ -64,7 +71,7 @@ class VGGFlower102(Dataset):
 
     """
 
-    def __init__(self, root, mode='all', transform=None, target_transform=None, download=False):
+    def __init__(self, root, mode='all', transform=None, target_transform=None, download=False, image_size=None):
         root = os.path.expanduser(root)
         self.root = os.path.expanduser(root)
         self.transform = transform
@@ -76,6 +83,15 @@ class VGGFlower102(Dataset):
 
         self.load_data(mode)
 
+        self.images = None
+        if image_size is not None:
+            store_path = os.path.join(self.root,
+                                      DATA_DIR,
+                                      'vgg-flower102-' + mode + '-images-' + str(image_size) + '.npy')
+            if not os.path.exists(store_path):
+                pack_images([image for image, _ in self.data], store_path, image_size)
+            self.images = np.load(store_path, mmap_mode='r')
+
     def _check_exists(self):
         data_path = os.path.join(self.root, DATA_DIR)
         return os.path.exists(data_path)
@@ -88,17 +104,10 @@ class VGGFlower102(Dataset):
             os.mkdir(data_path)
         tar_path = os.path.join(data_path, os.path.basename(IMAGES_URL))
         print('Downloading VGG Flower102 dataset')
-        req = requests.get(IMAGES_URL)
-        with open(tar_path, 'wb') as archive:
-            archive.write(req.content)
-        tar_file = tarfile.TarFile(tar_path)
-        tar_file.extractall(data_path)
-        os.remove(tar_path)
+        download_and_extract(IMAGES_URL, data_path, archive_path=tar_path)
 
         label_path = os.path.join(data_path, os.path.basename(LABELS_URL))
-        req = requests.get(LABELS_URL)
-        with open(label_path, 'wb') as label_file:
-            label_file.write(req.content)
+        download_file(LABELS_URL, label_path)
 
     def load_data(self, mode='train'):
         data_path = os.path.join(self.root, DATA_DIR)
@@ -118,7 +127,10 @@ class VGGFlower102(Dataset):
 
     def __getitem__(self, i):
         image, label = self.data[i]
-        image = Image.open(image)
+        if self.images is not None:
+            image = Image.fromarray(self.images[i])
+        else:
+            image = Image.open(image)
         if self.transform:
             image = self.transform(image)
         if self.target_transform:
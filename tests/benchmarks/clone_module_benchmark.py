@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark of learn2learn.clone_module against the original recursive
+implementation.
+
+Run with: python -m tests.benchmarks.clone_module_benchmark
+"""
+
+import timeit
+
+import torch
+import learn2learn as l2l
+
+NUM_CLONES = 1000
+
+
+def recursive_clone_module(module):
+    # Reference: the original, recursive clone_module.
+    clone = module.__new__(type(module))
+    clone.__dict__ = module.__dict__.copy()
+    clone._parameters = clone._parameters.copy()
+    clone._buffers = clone._buffers.copy()
+    clone._modules = clone._modules.copy()
+
+    for param_key in module._parameters:
+        if module._parameters[param_key] is not None:
+            clone._parameters[param_key] = module._parameters[param_key].clone()
+
+    for buffer_key in module._buffers:
+        if clone._buffers[buffer_key] is not None and \
+                clone._buffers[buffer_key].requires_grad:
+            clone._buffers[buffer_key] = module._buffers[buffer_key].clone()
+
+    for module_key in clone._modules:
+        clone._modules[module_key] = recursive_clone_module(module._modules[module_key])
+    return clone
+
+
+def benchmark(name, model, X):
+    clone_fns = [
+        ('recursive', recursive_clone_module),
+        ('plan', l2l.clone_module),
+    ]
+    for fn_name, clone_fn in clone_fns:
+        clone_fn(model)  # warm-up (and plan creation)
+        clone_time = timeit.timeit(lambda: clone_fn(model), number=NUM_CLONES)
+
+        def clone_and_backward():
+            clone_fn(model)(X).sum().backward()
+        clone_and_backward()
+        step_time = timeit.timeit(clone_and_backward, number=NUM_CLONES // 10)
+        print('{:<20} {:<12} clone: {:8.2f}us   clone+fwd+bwd: {:8.2f}ms'.format(
+            name,
+            fn_name,
+            1e6 * clone_time / NUM_CLONES,
+            1e3 * step_time / (NUM_CLONES // 10),
+        ))
+
+
+def main():
+    torch.set_num_threads(1)
+    benchmark('OmniglotCNN',
+              l2l.vision.models.OmniglotCNN(5),
+              torch.randn(5, 1, 28, 28))
+    benchmark('MiniImagenetCNN',
+              l2l.vision.models.MiniImagenetCNN(5),
+              torch.randn(5, 3, 84, 84))
+
+
+if __name__ == '__main__':
+    main()
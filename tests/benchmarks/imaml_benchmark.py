@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark of iMAML against second-order MAML: peak memory and wall-clock time
+of one meta-gradient computation, as the number of adaptation steps grows.
+
+Each configuration runs in a fresh process so that peak RSS is comparable.
+
+Run with: python -m tests.benchmarks.imaml_benchmark
+"""
+
+import multiprocessing
+import resource
+import time
+
+import torch
+import learn2learn as l2l
+
+WAYS = 5
+SHOTS = 5
+ADAPTATION_STEPS = [1, 5, 10, 25, 50]
+
+
+def meta_gradient(algorithm, steps):
+    torch.set_num_threads(1)
+    torch.manual_seed(42)
+    model = l2l.vision.models.OmniglotCNN(WAYS)
+    if algorithm == 'MAML':
+        meta = l2l.algorithms.MAML(model, lr=0.1, first_order=False)
+    else:
+        meta = l2l.algorithms.IMAML(model, lr=0.1, lam=2.0, cg_steps=5)
+    loss = torch.nn.CrossEntropyLoss()
+    X = torch.randn(WAYS * SHOTS, 1, 28, 28)
+    y = torch.arange(WAYS).repeat(SHOTS)
+
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    learner = meta.clone()
+    learner.adapt(lambda adapted: loss(adapted(X), y), steps=steps)
+    loss(learner(X), y).backward()
+    elapsed = time.time() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss
+    return elapsed, peak_rss / 1024.0
+
+
+def main():
+    context = multiprocessing.get_context('spawn')
+    for steps in ADAPTATION_STEPS:
+        for algorithm in ['MAML', 'IMAML']:
+            with context.Pool(1) as pool:
+                elapsed, peak_rss = pool.apply(meta_gradient, (algorithm, steps))
+            print('{:<6} steps={:<3} time: {:8.2f}s   peak RSS increase: {:8.1f}MB'.format(
+                algorithm,
+                steps,
+                elapsed,
+                peak_rss,
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark of task sampling on a FullOmniglot-sized label index
+(1623 classes with 20 samples each), for 20-way 5-shot tasks.
+
+Run with: python -m tests.benchmarks.task_sampling_benchmark
+"""
+
+import random
+import time
+
+import torch
+import learn2learn as l2l
+
+NUM_CLASSES = 1623
+NUM_SAMPLES = 20
+NUM_TASKS = 100000
+WAYS = 20
+SHOTS = 5
+
+
+def benchmark(name, dataset, task_transforms, num_tasks=NUM_TASKS):
+    taskset = l2l.data.TaskDataset(dataset, task_transforms, num_tasks=-1)
+    random.seed(42)
+    start = time.perf_counter()
+    for _ in range(num_tasks):
+        taskset.sample_task_description()
+    elapsed = time.perf_counter() - start
+    print('{:<36} {:8.2f}s for {} tasks   ({:6.2f}us / task)'.format(
+        name,
+        elapsed,
+        num_tasks,
+        1e6 * elapsed / num_tasks,
+    ))
+
+
+def main():
+    labels = torch.arange(NUM_CLASSES).repeat_interleave(NUM_SAMPLES)
+    dataset = torch.utils.data.TensorDataset(torch.zeros(len(labels), 1), labels)
+    dataset = l2l.data.MetaDataset(dataset)
+    benchmark('FusedNWaysKShots',
+              dataset,
+              [l2l.data.transforms.FusedNWaysKShots(dataset, n=WAYS, k=SHOTS)])
+    benchmark('FilterLabels, FusedNWaysKShots',
+              dataset,
+              [l2l.data.transforms.FilterLabels(dataset, dataset.labels[:1200]),
+               l2l.data.transforms.FusedNWaysKShots(dataset, n=WAYS, k=SHOTS)],
+              num_tasks=NUM_TASKS // 10)
+    benchmark('NWays, KShots, LoadData, RemapLabels',
+              dataset,
+              [l2l.data.transforms.NWays(dataset, n=WAYS),
+               l2l.data.transforms.KShots(dataset, k=SHOTS),
+               l2l.data.transforms.LoadData(dataset),
+               l2l.data.transforms.RemapLabels(dataset)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import gc
+import unittest
+import weakref
+
+import torch
+
+import learn2learn as l2l
+
+NUM_INPUTS = 7
+INPUT_SIZE = 10
+HIDDEN_SIZE = 20
+INNER_LR = 0.05
+LAM = 2.0
+ADAPTATION_STEPS = 200
+EPSILON = 1e-4
+
+
+class TestIMAMLAlgorithm(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(42)
+        self.model = torch.nn.Sequential(torch.nn.Linear(INPUT_SIZE, HIDDEN_SIZE),
+                                         torch.nn.Tanh(),
+                                         torch.nn.Linear(HIDDEN_SIZE, 1))
+        self.X = torch.randn(NUM_INPUTS, INPUT_SIZE)
+        self.y = torch.randn(NUM_INPUTS, 1)
+
+    def adaptation_loss(self, learner):
+        return (learner(self.X) - self.y).pow(2).mean()
+
+    def test_clone_module(self):
+        imaml = l2l.algorithms.IMAML(self.model, lr=INNER_LR, lam=LAM)
+        ref = self.model(self.X)
+        for clone in [imaml.clone(), imaml.clone()]:
+            self.assertTrue(torch.allclose(ref, clone(self.X)))
+
+    def test_adaptation(self):
+        imaml = l2l.algorithms.IMAML(self.model, lr=INNER_LR, lam=LAM)
+        clone = imaml.clone()
+        loss = self.adaptation_loss(clone)
+        clone.adapt(self.adaptation_loss, steps=10)
+        new_loss = self.adaptation_loss(clone)
+        self.assertTrue(loss >= new_loss)
+        new_loss.backward()
+        for p in self.model.parameters():
+            self.assertTrue(p.grad is not None)
+            self.assertTrue(p.grad.norm(p=2).item() > 0.0)
+
+    def test_implicit_gradient(self):
+        # Reference: unrolled differentiation through the converged proximal inner loop.
+        params = list(self.model.parameters())
+        fast = [p.clone() for p in params]
+        fast_model = l2l.clone_module(self.model)
+        slots = [(fast_model[0], 'weight'), (fast_model[0], 'bias'),
+                 (fast_model[2], 'weight'), (fast_model[2], 'bias')]
+        for step in range(ADAPTATION_STEPS):
+            for (module, key), f in zip(slots, fast):
+                module._parameters[key] = f
+            gradients = torch.autograd.grad(self.adaptation_loss(fast_model), fast, create_graph=True)
+            fast = [f - INNER_LR * (g + LAM * (f - p))
+                    for f, g, p in zip(fast, gradients, params)]
+        for (module, key), f in zip(slots, fast):
+            module._parameters[key] = f
+        X_eval = torch.randn(NUM_INPUTS, INPUT_SIZE)
+        fast_model(X_eval).sum().backward()
+        ref_grads = [p.grad.clone() for p in params]
+        self.model.zero_grad()
+
+        imaml = l2l.algorithms.IMAML(self.model, lr=INNER_LR, lam=LAM, cg_steps=50)
+        clone = imaml.clone()
+        clone.adapt(self.adaptation_loss, steps=ADAPTATION_STEPS)
+        for ref, f in zip(fast, clone.parameters()):
+            self.assertTrue(torch.allclose(ref, f, atol=EPSILON))
+        clone(X_eval).sum().backward()
+        for ref, p in zip(ref_grads, params):
+            # The implicit gradient is exact at the inner-loop optimum, hence the relative tolerance.
+            self.assertTrue(torch.allclose(ref, p.grad, atol=EPSILON, rtol=1e-3))
+
+    def test_no_reference_cycle(self):
+        # Adapted clones are freed without the garbage collector.
+        imaml = l2l.algorithms.IMAML(self.model, lr=INNER_LR, lam=LAM)
+        gc.disable()
+        try:
+            clone = imaml.clone()
+            clone.adapt(self.adaptation_loss, steps=2)
+            clone_ref = weakref.ref(clone)
+            del clone
+            self.assertIsNone(clone_ref())
+        finally:
+            gc.enable()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -123,6 +123,131 @@ class TestMAMLAlgorithm(unittest.TestCase):
         clone.adapt(loss)
         self.assertTrue(close(orig_weight, self.model[2].weight))
 
+    def test_checkpointed_adaptation(self):
+        X = torch.randn(NUM_INPUTS, INPUT_SIZE)
+
+        def loss_fn(learner):
+            return learner(X).norm(p=2)
+
+        results = []
+        for checkpoint_interval in [None, 1, 2]:
+            maml = l2l.algorithms.MAML(self.model,
+                                       lr=INNER_LR,
+                                       first_order=False,
+                                       checkpoint_interval=checkpoint_interval)
+            maml.zero_grad()
+            clone = maml.clone()
+            clone.adapt(loss_fn, steps=5)
+            out = clone(X)
+            out.norm(p=2).backward()
+            results.append((out.detach(), [p.grad.clone() for p in maml.parameters()]))
+        ref_out, ref_grads = results[0]
+        for out, grads in results[1:]:
+            self.assertTrue(torch.allclose(ref_out, out, atol=1e-6))
+            for ref, g in zip(ref_grads, grads):
+                self.assertTrue(torch.allclose(ref, g, atol=1e-6))
+
+    def test_checkpointed_adaptation_dropout(self):
+        # Recomputed steps see the same dropout masks as the forward pass.
+        model = torch.nn.Sequential(torch.nn.Linear(INPUT_SIZE, HIDDEN_SIZE),
+                                    torch.nn.Dropout(0.5),
+                                    torch.nn.Linear(HIDDEN_SIZE, HIDDEN_SIZE))
+        X = torch.randn(NUM_INPUTS, INPUT_SIZE)
+
+        def loss_fn(learner):
+            return learner(X).norm(p=2)
+
+        results = []
+        for checkpoint_interval in [None, 2]:
+            maml = l2l.algorithms.MAML(model,
+                                       lr=INNER_LR,
+                                       checkpoint_interval=checkpoint_interval)
+            maml.zero_grad()
+            torch.manual_seed(42)
+            clone = maml.clone()
+            clone.adapt(loss_fn, steps=4)
+            torch.manual_seed(43)
+            clone(X).norm(p=2).backward()
+            results.append([p.grad.clone() for p in maml.parameters()])
+        for ref, g in zip(*results):
+            self.assertTrue(torch.allclose(ref, g, atol=1e-6))
+
+    def test_checkpointed_adaptation_captured_tensors(self):
+        # Tensors requiring gradients outside of the learner would not get any.
+        features = torch.nn.Linear(INPUT_SIZE, INPUT_SIZE)
+        X = torch.randn(NUM_INPUTS, INPUT_SIZE)
+        maml = l2l.algorithms.MAML(self.model, lr=INNER_LR, checkpoint_interval=1)
+        clone = maml.clone()
+        with self.assertRaises(RuntimeError):
+            clone.adapt(lambda learner: learner(features(X)).norm(p=2), steps=2)
+
+        # Detached inputs are fine.
+        clone = maml.clone()
+        clone.adapt(lambda learner: learner(features(X).detach()).norm(p=2), steps=2)
+
+    def test_adapt_batch(self):
+        num_tasks = 4
+        X = torch.randn(num_tasks, NUM_INPUTS, INPUT_SIZE)
+
+        def loss_fn(learner, X):
+            return learner(X).norm(p=2)
+
+        for first_order in [False, True]:
+            maml = l2l.algorithms.MAML(self.model,
+                                       lr=INNER_LR,
+                                       first_order=first_order)
+
+            # Reference: serial clone/adapt
+            maml.zero_grad()
+            ref_outputs = []
+            for task in range(num_tasks):
+                clone = maml.clone()
+                for step in range(2):
+                    clone.adapt(loss_fn(clone, X[task]))
+                out = clone(X[task])
+                out.norm(p=2).backward()
+                ref_outputs.append(out.detach())
+            ref_grads = [p.grad.clone() for p in maml.parameters()]
+
+            # Batched adaptation
+            maml.zero_grad()
+            fast_weights = maml.adapt_batch(loss_fn, (X, ), steps=2)
+            outputs = maml.forward_batch(fast_weights, X)
+            self.assertEqual(outputs.shape, (num_tasks, NUM_INPUTS, HIDDEN_SIZE))
+            outputs.norm(p=2, dim=(1, 2)).sum().backward()
+            for ref, out in zip(ref_outputs, outputs):
+                self.assertTrue(torch.allclose(ref, out, atol=1e-6))
+            for ref, p in zip(ref_grads, maml.parameters()):
+                self.assertTrue(torch.allclose(ref, p.grad, atol=1e-6))
+
+    def test_adapt_batch_batch_norm(self):
+        # Second-order meta-gradients through BatchNorm match the clone/adapt loop.
+        num_tasks = 2
+        ways = 5
+        for model, shape in [(l2l.vision.models.OmniglotCNN(ways), (1, 28, 28)),
+                             (l2l.vision.models.MiniImagenetCNN(ways), (3, 84, 84))]:
+            model.double()
+            X = torch.randn(num_tasks, ways, *shape, dtype=torch.float64)
+            y = torch.arange(ways).repeat(num_tasks, 1)
+
+            def loss_fn(learner, X, y):
+                return torch.nn.functional.cross_entropy(learner(X), y)
+
+            maml = l2l.algorithms.MAML(model, lr=0.1)
+            maml.zero_grad()
+            for task in range(num_tasks):
+                clone = maml.clone()
+                for step in range(2):
+                    clone.adapt(loss_fn(clone, X[task], y[task]))
+                loss_fn(clone, X[task], y[task]).backward()
+            ref_grads = [p.grad.clone() for p in maml.parameters()]
+
+            maml.zero_grad()
+            fast_weights = maml.adapt_batch(loss_fn, (X, y), steps=2)
+            outputs = maml.forward_batch(fast_weights, X)
+            sum(torch.nn.functional.cross_entropy(out, y[task]) for task, out in enumerate(outputs)).backward()
+            for ref, p in zip(ref_grads, maml.parameters()):
+                self.assertTrue(torch.allclose(ref, p.grad, atol=1e-10))
 
 
 if __name__ == '__main__':
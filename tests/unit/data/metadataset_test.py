@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 
+import os
+import pickle
+import tempfile
 import unittest
 from unittest import TestCase
 
 import numpy as np
+import torch
 from numpy.testing import assert_array_equal
+from torch.utils.data import Dataset
 
 from learn2learn.data import MetaDataset
 from .util_datasets import TestDatasets
@@ -64,5 +69,169 @@ class TestMetaDataset(TestCase):
             self.assertEqual(dict_label_to_indices[key][0], ord(key) - 97)
 
 
+class LabelHookDataset(Dataset):
+
+    def __init__(self, labels):
+        self.labels_list = labels
+
+    def __len__(self):
+        return len(self.labels_list)
+
+    def __getitem__(self, item):
+        raise AssertionError('get_label() should be used instead of __getitem__')
+
+    def get_label(self, item):
+        return self.labels_list[item]
+
+
+class ScanDataset(Dataset):
+
+    def __init__(self, labels):
+        self.labels_list = labels
+
+    def __len__(self):
+        return len(self.labels_list)
+
+    def __getitem__(self, item):
+        return torch.zeros(1), torch.tensor(self.labels_list[item])
+
+
+class InProcessScanDataset(ScanDataset):
+
+    # Fails when loaded from another process.
+
+    def __init__(self, labels):
+        super(InProcessScanDataset, self).__init__(labels)
+        self.pid = os.getpid()
+
+    def __getitem__(self, item):
+        assert os.getpid() == self.pid, 'Loaded from a worker process.'
+        return super(InProcessScanDataset, self).__getitem__(item)
+
+
+class ReadOnlyMetaDataset(MetaDataset):
+
+    # Fails to write its bookkeeping, as in a read-only data directory.
+
+    def serialize_bookkeeping(self, path):
+        raise PermissionError(path)
+
+
+class BookkeepingDataset(Dataset):
+
+    def __init__(self, bookkeeping):
+        self.bookkeeping = bookkeeping
+
+    def __len__(self):
+        return len(self.bookkeeping['label_codes'])
+
+    def __getitem__(self, item):
+        raise AssertionError('The dataset must not be scanned.')
+
+    def get_bookkeeping(self):
+        return self.bookkeeping
+
+
+class TestMetaDatasetBookkeeping(TestCase):
+
+    def assert_bookkeeping(self, meta_dataset, labels):
+        ref_labels_to_indices = {}
+        for i, label in enumerate(labels):
+            ref_labels_to_indices.setdefault(label, []).append(i)
+        self.assertEqual(meta_dataset.labels, list(ref_labels_to_indices.keys()))
+        self.assertEqual(dict(meta_dataset.labels_to_indices), ref_labels_to_indices)
+        for i, label in enumerate(labels):
+            self.assertEqual(meta_dataset.indices_to_labels[i], label)
+
+    def test_label_sources(self):
+        labels = np.random.randint(0, 20, size=500).tolist()
+        datasets = [
+            torch.utils.data.TensorDataset(torch.randn(500, 2), torch.tensor(labels)),
+            LabelHookDataset(labels),
+            ScanDataset(labels),
+        ]
+        for dataset in datasets:
+            self.assert_bookkeeping(MetaDataset(dataset), labels)
+
+    def test_parallel_scan(self):
+        labels = np.random.randint(0, 20, size=500).tolist()
+        self.assert_bookkeeping(MetaDataset(ScanDataset(labels), num_workers=2), labels)
+
+        # Without num_workers, even large datasets are scanned in this process.
+        labels = np.random.randint(0, 20, size=20000).tolist()
+        self.assert_bookkeeping(MetaDataset(InProcessScanDataset(labels)), labels)
+
+    def test_target_transform(self):
+        labels = np.random.randint(0, 20, size=500).tolist()
+        dataset = ScanDataset(labels)
+        dataset.targets = [0] * len(labels)  # Not the labels returned by __getitem__
+        dataset.target_transform = lambda x: x
+        self.assert_bookkeeping(MetaDataset(dataset), labels)
+
+    def test_serialized_bookkeeping(self):
+        labels = np.random.randint(0, 20, size=500).tolist()
+        with tempfile.TemporaryDirectory() as root:
+            dataset = LabelHookDataset(labels)
+            dataset._bookkeeping_path = os.path.join(root, 'bookkeeping.pkl')
+            MetaDataset(dataset)
+            meta_dataset = MetaDataset(dataset)
+            self.assertIsInstance(meta_dataset.label_indices, np.memmap)
+            self.assert_bookkeeping(meta_dataset, labels)
+            self.assert_bookkeeping(pickle.loads(pickle.dumps(meta_dataset)), labels)
+
+            # Memory-mapped arrays are pickled by path, and reopened as memory maps.
+            for view in [meta_dataset.labels_to_indices, meta_dataset.indices_to_labels]:
+                self.assertLess(len(pickle.dumps(view)), 2000)
+            unpickled = pickle.loads(pickle.dumps(meta_dataset))
+            self.assertIsInstance(unpickled.label_indices, np.memmap)
+            self.assertIsInstance(unpickled.labels_to_indices.label_indices, np.memmap)
+            self.assertIsInstance(unpickled.indices_to_labels.label_codes, np.memmap)
+
+    def test_legacy_bookkeeping(self):
+        labels = np.random.randint(0, 20, size=500).tolist()
+        with tempfile.TemporaryDirectory() as root:
+            dataset = LabelHookDataset(labels)
+            dataset._bookkeeping_path = os.path.join(root, 'bookkeeping.pkl')
+            with open(dataset._bookkeeping_path, 'wb') as f:
+                pickle.dump({'indices_to_labels': dict(enumerate(labels))}, f)
+            dataset.get_label = None  # The pickled bookkeeping must be used.
+            self.assert_bookkeeping(MetaDataset(dataset), labels)
+            self.assertTrue(os.path.exists(os.path.join(root, 'bookkeeping-label-indices.npy')))
+
+    def test_read_only_bookkeeping(self):
+        # Legacy bookkeeping is still loaded when the arrays can't be written.
+        labels = np.random.randint(0, 20, size=500).tolist()
+        with tempfile.TemporaryDirectory() as root:
+            dataset = LabelHookDataset(labels)
+            dataset._bookkeeping_path = os.path.join(root, 'bookkeeping.pkl')
+            with open(dataset._bookkeeping_path, 'wb') as f:
+                pickle.dump({'indices_to_labels': dict(enumerate(labels))}, f)
+            dataset.get_label = None
+            self.assert_bookkeeping(ReadOnlyMetaDataset(dataset), labels)
+            self.assertEqual(os.listdir(root), ['bookkeeping.pkl'])
+
+    def test_dataset_bookkeeping(self):
+        labels = np.random.randint(0, 20, size=500)
+        label_values, label_codes = np.unique(labels, return_inverse=True)
+        label_indices = np.argsort(label_codes, kind='stable')
+        label_offsets = np.concatenate([[0], np.cumsum(np.bincount(label_codes))])
+        dataset = BookkeepingDataset({
+            'label_values': label_values.tolist(),
+            'label_codes': label_codes,
+            'label_offsets': label_offsets,
+            'label_indices': label_indices,
+        })
+        meta_dataset = MetaDataset(dataset)
+        self.assertEqual(meta_dataset.labels, label_values.tolist())
+        for label in label_values.tolist():
+            self.assertEqual(meta_dataset.labels_to_indices[label], np.flatnonzero(labels == label).tolist())
+        for i, label in enumerate(labels.tolist()):
+            self.assertEqual(meta_dataset.indices_to_labels[i], label)
+        # Unknown indices map to 0, as with the former defaultdict(int).
+        self.assertEqual(meta_dataset.indices_to_labels[len(labels)], 0)
+        self.assertEqual(meta_dataset.indices_to_labels[-1], 0)
+        self.assertIsNone(meta_dataset.indices_to_labels.get(len(labels)))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,15 +1,19 @@
 #!/usr/bin/env python3
 
+import os
+import pickle
 import random
+import tempfile
 import unittest
 from unittest import TestCase
 
 import numpy as np
 import torch
-from torch.utils.data import TensorDataset, DataLoader
+from torch.utils.data import Dataset, TensorDataset, DataLoader
+from torch.utils.data._utils import collate
 
-from learn2learn.data import MetaDataset, TaskDataset
-from learn2learn.data.transforms import LoadData
+from learn2learn.data import MetaDataset, TaskDataset, TaskBank
+from learn2learn.data.transforms import LoadData, NWays, KShots, RemapLabels
 
 
 NUM_TASKS = 10
@@ -32,6 +36,26 @@ def random_subset(task_description):
     return random.choices(task_description, k=SUBSET_SIZE)
 
 
+class BatchDataset(Dataset):
+
+    # Tensor-backed dataset with float labels and get_batch().
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y.numpy().astype(np.float64)
+        self.batch_calls = 0
+
+    def __getitem__(self, idx):
+        return self.x[idx], self.y[idx]
+
+    def __len__(self):
+        return len(self.x)
+
+    def get_batch(self, indices):
+        self.batch_calls += 1
+        return self.x.index_select(0, indices), torch.from_numpy(self.y[indices.numpy()])
+
+
 class TestTaskDataset(TestCase):
 
     def test_instanciation(self):
@@ -104,6 +128,137 @@ class TestTaskDataset(TestCase):
             self.assertEqual(task_batch[0].shape, (META_BSZ, X_SHAPE))
             self.assertEqual(task_batch[1].shape, (META_BSZ, 1))
 
+    def test_get_batch(self):
+        data = torch.randn(NUM_DATA, X_SHAPE)
+        labels = torch.randint(0, Y_SHAPE, (NUM_DATA, ))
+        for dataset in [TensorDataset(data, labels), BatchDataset(data, labels)]:
+            dataset = MetaDataset(dataset)
+            transforms = [NWays(dataset, n=3), KShots(dataset, k=4), LoadData(dataset), RemapLabels(dataset)]
+            batched = TaskDataset(dataset, task_transforms=transforms, num_tasks=NUM_TASKS)
+            unbatched = TaskDataset(dataset,
+                                    task_transforms=transforms,
+                                    num_tasks=NUM_TASKS,
+                                    task_collate=lambda batch: collate.default_collate(batch))
+            for i in range(NUM_TASKS):
+                description = batched.sample_task_description()
+                X, y = batched.get_task(description)
+                X_ref, y_ref = unbatched.get_task(description)
+                self.assertTrue(torch.equal(X, X_ref))
+                self.assertTrue(torch.equal(y, y_ref))
+                self.assertEqual(y.dtype, y_ref.dtype)
+        self.assertEqual(dataset.dataset.batch_calls, NUM_TASKS)
+
+    def test_materialize(self):
+        data = torch.randn(NUM_DATA, X_SHAPE)
+        labels = torch.randint(0, Y_SHAPE, (NUM_DATA, ))
+        dataset = MetaDataset(TensorDataset(data, labels))
+        transforms = [NWays(dataset, n=3), KShots(dataset, k=4), LoadData(dataset), RemapLabels(dataset)]
+        task_dataset = TaskDataset(dataset, task_transforms=transforms, num_tasks=NUM_TASKS)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'tasks')
+            bank = task_dataset.materialize(path)
+            self.assertTrue(isinstance(bank, TaskBank))
+            self.assertEqual(len(bank), NUM_TASKS)
+            for i in range(NUM_TASKS):
+                X, y = bank[i]
+                X_ref, y_ref = task_dataset[i]
+                self.assertTrue(torch.equal(X, X_ref))
+                self.assertTrue(torch.equal(y, y_ref))
+                self.assertEqual(y.dtype, y_ref.dtype)
+
+            # Existing banks are re-opened, and pickled by path.
+            reopened = TaskDataset(dataset, task_transforms=transforms, num_tasks=NUM_TASKS).materialize(path)
+            unpickled = pickle.loads(pickle.dumps(bank))
+            for task in [reopened[-1], unpickled[-1]]:
+                self.assertTrue(task_equal(task, task_dataset[NUM_TASKS - 1]))
+
+        infinite = TaskDataset(dataset, task_transforms=transforms)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with self.assertRaises(ValueError):
+                infinite.materialize(os.path.join(tmp_dir, 'tasks'))
+
+        # Existing banks are checked against the tasks to materialize.
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'tasks')
+            task_dataset.materialize(path)
+            with self.assertRaises(ValueError):
+                TaskDataset(dataset, task_transforms=transforms, num_tasks=NUM_TASKS + 1).materialize(path)
+            more_shots = [NWays(dataset, n=3), KShots(dataset, k=5), LoadData(dataset), RemapLabels(dataset)]
+            with self.assertRaises(ValueError):
+                TaskDataset(dataset, task_transforms=more_shots, num_tasks=NUM_TASKS).materialize(path)
+            with self.assertRaises(ValueError):
+                task_dataset.materialize(path, dtypes=[torch.float16, None])
+
+        # Fields stored in another dtype
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bank = task_dataset.materialize(os.path.join(tmp_dir, 'tasks'), dtypes=[torch.float16, None])
+            X, y = bank[0]
+            X_ref, y_ref = task_dataset[0]
+            self.assertEqual(X.dtype, torch.float16)
+            self.assertTrue(torch.equal(X, X_ref.half()))
+            self.assertTrue(torch.equal(y, y_ref))
+
+    def test_counter_based(self):
+        data = torch.randn(NUM_DATA, X_SHAPE)
+        labels = torch.randint(0, Y_SHAPE, (NUM_DATA, ))
+        dataset = MetaDataset(TensorDataset(data, labels))
+
+        def make_taskset(num_tasks, seed):
+            transforms = [NWays(dataset, n=3), KShots(dataset, k=4), LoadData(dataset), RemapLabels(dataset)]
+            return TaskDataset(dataset, task_transforms=transforms, num_tasks=num_tasks, seed=seed)
+
+        # Task i only depends on (seed, i), whatever the order of generation.
+        taskset = make_taskset(NUM_TASKS, seed=42)
+        other = make_taskset(NUM_TASKS, seed=42)
+        reversed_tasks = [other[i] for i in reversed(range(NUM_TASKS))][::-1]
+        for i in range(NUM_TASKS):
+            random.random()  # The global random state is not used.
+            self.assertTrue(task_equal(taskset[i], reversed_tasks[i]))
+        infinite = make_taskset(-1, seed=42)
+        stream = [infinite.sample() for _ in range(NUM_TASKS)]
+        for i, task in enumerate(stream):
+            self.assertTrue(task_equal(task, taskset[i]))
+            self.assertTrue(task_equal(task, infinite[i]))
+        # Iterating continues the stream.
+        self.assertTrue(task_equal(next(iter(infinite)), infinite[NUM_TASKS]))
+        different = make_taskset(-1, seed=43)
+        self.assertFalse(all(task_equal(different[i], taskset[i]) for i in range(NUM_TASKS)))
+
+        # Explicit generators.
+        infinite = make_taskset(-1, seed=None)
+        task = infinite.sample(random.Random(0))
+        self.assertTrue(task_equal(task, infinite.sample(random.Random(0))))
+
+        # Without seed, sampling draws an index before the task, as it always did.
+        random.seed(0)
+        task = infinite.sample()
+        random.seed(0)
+        random.randint(0, 0)
+        self.assertTrue(task_equal(task, infinite.get_task(infinite.sample_task_description())))
+
+    def test_sharding(self):
+        data = torch.randn(NUM_DATA, X_SHAPE)
+        labels = torch.randint(0, Y_SHAPE, (NUM_DATA, ))
+        dataset = MetaDataset(TensorDataset(data, labels))
+        transforms = [NWays(dataset, n=3), KShots(dataset, k=4), LoadData(dataset), RemapLabels(dataset)]
+        world_size = 3
+        for num_tasks in [NUM_TASKS, -1]:
+            reference = TaskDataset(dataset, task_transforms=transforms, num_tasks=num_tasks, seed=42)
+            shards = [TaskDataset(dataset,
+                                  task_transforms=transforms,
+                                  num_tasks=num_tasks,
+                                  seed=42,
+                                  rank=rank,
+                                  world_size=world_size)
+                      for rank in range(world_size)]
+            if num_tasks != -1:
+                self.assertEqual(sum(len(shard) for shard in shards), NUM_TASKS)
+            for i in range(NUM_TASKS):
+                shard = shards[i % world_size]
+                self.assertTrue(task_equal(shard[i // world_size], reference[i]))
+        with self.assertRaises(ValueError):
+            TaskDataset(dataset, task_transforms=transforms, rank=1, world_size=2)
+
 
 if __name__ == '__main__':
     unittest.main()
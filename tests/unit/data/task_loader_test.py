@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import unittest
+from unittest import TestCase
+
+import torch
+from torch.utils.data import TensorDataset
+
+from learn2learn.data import MetaDataset, TaskDataset, TaskLoader
+from learn2learn.data.transforms import LoadData, NWays, KShots, RemapLabels
+
+
+NUM_TASKS = 10
+NUM_DATA = 128
+X_SHAPE = 16
+Y_SHAPE = 10
+WORKERS = 2
+
+
+def make_taskset(num_tasks):
+    torch.manual_seed(0)
+    data = torch.randn(NUM_DATA, X_SHAPE)
+    labels = torch.randint(0, Y_SHAPE, (NUM_DATA, ))
+    dataset = MetaDataset(TensorDataset(data, labels))
+    transforms = [NWays(dataset, n=3), KShots(dataset, k=2), LoadData(dataset), RemapLabels(dataset)]
+    return TaskDataset(dataset, task_transforms=transforms, num_tasks=num_tasks)
+
+
+class TestTaskLoader(TestCase):
+
+    def test_finite(self):
+        taskset = make_taskset(NUM_TASKS)
+        loader = TaskLoader(taskset, num_workers=WORKERS, shuffle=True, seed=42)
+        self.assertEqual(len(loader), NUM_TASKS)
+        for epoch in range(2):
+            tasks = list(loader)
+            self.assertEqual(len(tasks), NUM_TASKS)
+            references = [taskset[i] for i in range(NUM_TASKS)]
+            for X, y in tasks:
+                self.assertTrue(any(torch.equal(X, X_ref) and torch.equal(y, y_ref)
+                                    for X_ref, y_ref in references))
+        self.assertEqual(loader.stats['tasks'], 2 * NUM_TASKS)
+        loader.close()
+
+    def test_infinite_determinism(self):
+        streams = []
+        for _ in range(2):
+            loader = TaskLoader(make_taskset(-1), num_workers=WORKERS, seed=42)
+            streams.append([loader.sample() for _ in range(NUM_TASKS)])
+            loader.close()
+        for task, ref in zip(*streams):
+            self.assertEqual(task[0].shape, (6, X_SHAPE))
+            self.assertTrue(torch.equal(task[0], ref[0]))
+            self.assertTrue(torch.equal(task[1], ref[1]))
+        first_workers = [streams[0][i][0] for i in range(WORKERS)]
+        self.assertFalse(all(torch.equal(t, first_workers[0]) for t in first_workers[1:]))
+
+    def test_shared_memory(self):
+        streams = []
+        for shared_memory in [False, True]:
+            loader = TaskLoader(make_taskset(-1),
+                                num_workers=WORKERS,
+                                seed=42,
+                                shared_memory=shared_memory)
+            streams.append([[t.clone() for t in loader.sample()] for _ in range(3 * NUM_TASKS)])
+            loader.close()
+        for task, ref in zip(*streams):
+            self.assertTrue(torch.equal(task[0], ref[0]))
+            self.assertTrue(torch.equal(task[1], ref[1]))
+
+        taskset = make_taskset(NUM_TASKS)
+        loader = TaskLoader(taskset, num_workers=WORKERS, shared_memory=True)
+        for epoch in range(2):
+            for i, (X, y) in enumerate(loader):
+                X_ref, y_ref = taskset[i]
+                self.assertTrue(torch.equal(X, X_ref))
+                self.assertTrue(torch.equal(y, y_ref))
+        loader.close()
+
+    def test_early_break(self):
+        # Tasks left in flight by a broken loop are drained before iterating again.
+        taskset = make_taskset(2 * NUM_TASKS)
+        for shared_memory in [False, True]:
+            loader = TaskLoader(taskset,
+                                num_workers=1,
+                                prefetch_factor=2,
+                                shared_memory=shared_memory)
+            for X, y in loader:
+                break
+            for i, (X, y) in enumerate(loader):
+                X_ref, y_ref = taskset[i]
+                self.assertTrue(torch.equal(X, X_ref))
+                self.assertTrue(torch.equal(y, y_ref))
+            self.assertEqual(i, 2 * NUM_TASKS - 1)
+            loader.close()
+
+    def test_main_process(self):
+        loader = TaskLoader(make_taskset(NUM_TASKS), num_workers=0)
+        self.assertEqual(len(list(loader)), NUM_TASKS)
+        X, y = TaskLoader(make_taskset(-1)).sample()
+        self.assertEqual(X.shape, (6, X_SHAPE))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,17 @@
 #!/usr/bin/env python3
 
 import random
+import time
 import unittest
 from unittest import TestCase
 
 import numpy as np
 import torch
+from numpy.testing import assert_array_equal
 from torch.utils.data import TensorDataset
 
-from learn2learn.data import MetaDataset, TaskDataset
-from learn2learn.data.transforms import NWays, KShots, LoadData, FilterLabels, RemapLabels
+from learn2learn.data import MetaDataset, TaskDataset, DataDescription, TaskDescription
+from learn2learn.data.transforms import NWays, KShots, LoadData, FilterLabels, RemapLabels, ConsecutiveLabels, FusedNWaysKShots
 
 NUM_TASKS = 128
 NUM_DATA = 512
@@ -19,6 +21,7 @@ EPSILON = 1e-6
 SUBSET_SIZE = 5
 WORKERS = 4
 META_BSZ = 16
+MIN_TASKS_PER_SECOND = 1000
 
 
 class TestTransforms(TestCase):
@@ -88,6 +91,119 @@ class TestTransforms(TestCase):
                 for label in range(ways):
                     self.assertTrue(label in task[1])
 
+    def test_task_description(self):
+        description = TaskDescription(np.array([4, 2, 7]))
+        description.add_transform(lambda x: x * 10)
+        description.add_transform(lambda x: x + 1, positions=[1])
+        description = description.take([1, 2])
+        task_description = description.to_list()
+        self.assertEqual([dd.index for dd in task_description], [2, 7])
+        self.assertEqual([len(dd.transforms) for dd in task_description], [2, 1])
+        description = TaskDescription.from_list(task_description)
+        assert_array_equal(description.indices, [2, 7])
+        dataset = MetaDataset(TensorDataset(torch.arange(10), torch.arange(10)))
+        task_dataset = TaskDataset(dataset)
+        self.assertEqual(task_dataset.get_task(description).tolist(), [21, 70])
+
+    def test_list_equivalence(self):
+        # Transforms give the same tasks whether they receive lists of DataDescription or TaskDescription.
+        data = torch.randn(NUM_DATA, X_SHAPE)
+        labels = torch.randint(0, Y_SHAPE, (NUM_DATA, ))
+        dataset = MetaDataset(TensorDataset(data, labels))
+        transforms = [
+            [NWays(dataset, n=5), KShots(dataset, k=3), ConsecutiveLabels(dataset)],
+            [FilterLabels(dataset, [1, 3, 5, 7]), NWays(dataset, n=2), KShots(dataset, k=4, replacement=True)],
+            [FusedNWaysKShots(dataset, n=5, k=2)],
+        ]
+        for task_transforms in transforms:
+            random.seed(1234)
+            description = TaskDataset(dataset, task_transforms).sample_task_description()
+            self.assertTrue(isinstance(description, TaskDescription))
+            random.seed(1234)
+            task_description = None
+            for transform in task_transforms:
+                task_description = transform(task_description)
+            self.assertTrue(isinstance(task_description[0], DataDescription))
+            self.assertEqual(description.indices.tolist(), [dd.index for dd in task_description])
+
+    def test_fused_n_ways_k_shots(self):
+        # On an existing task description, the fused transform equals FilterLabels, NWays, and KShots.
+        data = torch.randn(NUM_DATA, X_SHAPE)
+        labels = torch.randint(0, Y_SHAPE, (NUM_DATA, ))
+        dataset = MetaDataset(TensorDataset(data, labels))
+        filter_labels = [0, 2, 3, 5, 6, 8]
+        for replacement in [False, True]:
+            fused = FusedNWaysKShots(dataset, n=4, k=3, replacement=replacement, filter_labels=filter_labels)
+            unfused = [FilterLabels(dataset, filter_labels),
+                       NWays(dataset, n=4),
+                       KShots(dataset, k=3, replacement=replacement)]
+            description = TaskDescription(np.random.permutation(NUM_DATA))
+            random.seed(1234)
+            fused_description = fused.describe(description)
+            random.seed(1234)
+            unfused_description = description
+            for transform in unfused:
+                unfused_description = transform.describe(unfused_description)
+            assert_array_equal(fused_description.indices, unfused_description.indices)
+            self.assertEqual(len(fused_description), 12)
+
+    def test_generator(self):
+        # Transforms with their own generator do not depend on the global random state.
+        data = torch.randn(NUM_DATA, X_SHAPE)
+        labels = torch.randint(0, Y_SHAPE, (NUM_DATA, ))
+        dataset = MetaDataset(TensorDataset(data, labels))
+        descriptions = []
+        for global_seed in [1, 2]:
+            random.seed(global_seed)
+            generator = random.Random(1234)
+            transforms = [FusedNWaysKShots(dataset, n=4, k=3, generator=generator),
+                          NWays(dataset, n=2, generator=generator),
+                          KShots(dataset, k=2, generator=generator),
+                          RemapLabels(dataset, generator=generator)]
+            description = None
+            for transform in transforms:
+                description = transform.describe(description)
+            descriptions.append(description)
+        assert_array_equal(descriptions[0].indices, descriptions[1].indices)
+        mappings = [d.pipelines[0][-1].mapping.labels for d in descriptions]
+        self.assertEqual(mappings[0], mappings[1])
+
+    def test_custom_transform(self):
+        data = torch.randn(NUM_DATA, X_SHAPE)
+        labels = torch.randint(0, Y_SHAPE, (NUM_DATA, ))
+        dataset = MetaDataset(TensorDataset(data, labels))
+
+        def first_samples(task_description):
+            self.assertTrue(isinstance(task_description[0], DataDescription))
+            return task_description[:SUBSET_SIZE]
+
+        task_dataset = TaskDataset(dataset,
+                                   task_transforms=[NWays(dataset, n=2),
+                                                    LoadData(dataset),
+                                                    first_samples,
+                                                    RemapLabels(dataset)],
+                                   num_tasks=NUM_TASKS)
+        for task in task_dataset:
+            self.assertEqual(len(task[0]), SUBSET_SIZE)
+            self.assertLessEqual(task[1].max().item(), 1)
+
+    def test_sampling_throughput(self):
+        # FullOmniglot-sized label index, 20-way 5-shot tasks.
+        labels = torch.arange(1623).repeat_interleave(20)
+        dataset = MetaDataset(TensorDataset(torch.zeros(len(labels), 1), labels))
+        task_dataset = TaskDataset(dataset,
+                                   task_transforms=[NWays(dataset, n=20),
+                                                    KShots(dataset, k=5),
+                                                    LoadData(dataset),
+                                                    RemapLabels(dataset),
+                                                    ConsecutiveLabels(dataset)])
+        num_tasks = 2000
+        start = time.perf_counter()
+        for _ in range(num_tasks):
+            task_dataset.sample_task_description()
+        tasks_per_second = num_tasks / (time.perf_counter() - start)
+        self.assertGreater(tasks_per_second, MIN_TASKS_PER_SECOND)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import hashlib
+import http.server
+import io
+import os
+import random
+import shutil
+import socketserver
+import tarfile
+import tempfile
+import threading
+import unittest
+
+from learn2learn.data.utils import download_file, download_and_extract
+
+
+class FileServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+
+    # Serves `files` (name -> bytes), with optional range requests and failing ranges.
+
+    daemon_threads = True
+
+    def __init__(self, files):
+        super(FileServer, self).__init__(('127.0.0.1', 0), FileHandler)
+        self.files = files
+        self.ranges = True
+        self.fail_from = None
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+    def url(self, name):
+        return 'http://127.0.0.1:' + str(self.server_address[1]) + '/' + name
+
+
+class FileHandler(http.server.BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        content = self.server.files.get(self.path.lstrip('/'))
+        if content is None:
+            self.send_error(404)
+            return
+        start, end = 0, len(content)
+        requested = self.headers.get('Range')
+        if requested is not None and self.server.ranges:
+            first, last = requested.split('=')[1].split('-')
+            start, end = int(first), int(last) + 1
+            if self.server.fail_from is not None and start >= self.server.fail_from:
+                self.send_error(500)
+                return
+            self.send_response(206)
+            self.send_header('Content-Range',
+                             'bytes ' + first + '-' + last + '/' + str(len(content)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(end - start))
+        self.end_headers()
+        self.wfile.write(content[start:end])
+        with self.server.lock:
+            self.server.bytes_sent += end - start
+
+
+class DownloadTests(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(42)
+        self.content = bytes(rng.getrandbits(8) for _ in range(100000))
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode='w:gz') as tar:
+            for i in range(3):
+                data = self.content[i * 1000:(i + 1) * 20000]
+                info = tarfile.TarInfo('images/' + str(i) + '.bin')
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        self.archive = archive.getvalue()
+        self.server = FileServer({'file.bin': self.content, 'images.tar.gz': self.archive})
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def test_download_file(self):
+        destination = os.path.join(self.directory, 'file.bin')
+        checksum = hashlib.sha256(self.content).hexdigest()
+        download_file(self.server.url('file.bin'),
+                      destination,
+                      checksum=checksum,
+                      num_connections=4,
+                      part_size=7000)
+        with open(destination, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(os.listdir(self.directory), ['file.bin'])
+
+        # Without range requests
+        self.server.ranges = False
+        os.remove(destination)
+        download_file(self.server.url('file.bin'), destination, checksum=checksum, part_size=7000)
+        with open(destination, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+        # Wrong checksum
+        os.remove(destination)
+        with self.assertRaises(IOError):
+            download_file(self.server.url('file.bin'), destination, checksum='0' * 64)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_resume(self):
+        destination = os.path.join(self.directory, 'file.bin')
+        self.server.fail_from = 50000
+        with self.assertRaises(IOError):
+            download_file(self.server.url('file.bin'),
+                          destination,
+                          num_connections=2,
+                          part_size=10000,
+                          retries=1)
+        self.assertFalse(os.path.exists(destination))
+
+        self.server.fail_from = None
+        self.server.bytes_sent = 0
+        download_file(self.server.url('file.bin'),
+                      destination,
+                      num_connections=2,
+                      part_size=10000)
+        with open(destination, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        # Only the missing parts (and the probe) were downloaded again: the parts after 50000,
+        # and the part aborted on the other connection.
+        self.assertLessEqual(self.server.bytes_sent, 60001)
+
+    def test_download_and_extract(self):
+        destination = os.path.join(self.directory, 'extracted')
+        download_and_extract(self.server.url('images.tar.gz'),
+                             destination,
+                             checksum=hashlib.sha256(self.archive).hexdigest(),
+                             part_size=1000)
+        self.assertEqual(sorted(os.listdir(destination)), ['images'])
+        for i in range(3):
+            with open(os.path.join(destination, 'images', str(i) + '.bin'), 'rb') as f:
+                self.assertEqual(f.read(), self.content[i * 1000:(i + 1) * 20000])
+
+        # Kept archives are extracted again without downloading.
+        archive_path = os.path.join(self.directory, 'images.tar.gz')
+        download_and_extract(self.server.url('images.tar.gz'),
+                             destination,
+                             archive_path=archive_path,
+                             remove_archive=False)
+        self.server.bytes_sent = 0
+        download_and_extract(self.server.url('images.tar.gz'), destination, archive_path=archive_path)
+        self.assertEqual(self.server.bytes_sent, 0)
+        self.assertFalse(os.path.exists(archive_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
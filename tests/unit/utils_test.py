@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 
+import os
 import unittest
 import copy
+import tempfile
 import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
 import learn2learn as l2l
 
 
@@ -31,6 +35,21 @@ def ref_clone_module(module):
     return clone
 
 
+def all_reduce_worker(rank, world_size, init_file, results):
+    dist.init_process_group('gloo',
+                            init_method='file://' + init_file,
+                            rank=rank,
+                            world_size=world_size)
+    model = Model()
+    for i, p in enumerate(model.parameters()):
+        # The first parameter has no gradient, the second only on rank 0.
+        if i > 1 or (i == 1 and rank == 0):
+            p.grad = torch.full_like(p, float(rank + 1))
+    l2l.all_reduce_gradients(model)
+    results[rank] = [None if p.grad is None else p.grad.mean().item() for p in model.parameters()]
+    dist.destroy_process_group()
+
+
 class Model(torch.nn.Module):
 
     def __init__(self):
@@ -120,6 +139,30 @@ class UtilTests(unittest.TestCase):
             for ref_p, l2l_p in zip(ref_model.parameters(), l2l_model.parameters()):
                 self.assertTrue(torch.equal(ref_p, l2l_p))
 
+    def test_clone_module_structure_change(self):
+        clone = l2l.clone_module(self.model)
+        self.assertEqual(len(list(clone.parameters())), 4)
+        self.model.model.add_module('extra', torch.nn.Linear(2, 2))
+        clone = l2l.clone_module(self.model)
+        self.assertEqual(len(list(clone.parameters())), 6)
+        self.model.model[0] = torch.nn.Linear(4, 64, bias=False)
+        clone = l2l.clone_module(self.model)
+        self.assertEqual(len(list(clone.parameters())), 5)
+        for a, b in zip(self.model.parameters(), clone.parameters()):
+            self.assertTrue(torch.equal(a, b))
+
+        # Slots going from None to a tensor or module, with unchanged counts.
+        linear = torch.nn.Linear(4, 4, bias=False)
+        linear.register_module('extra', None)
+        l2l.clone_module(linear)
+        linear.bias = torch.nn.Parameter(torch.zeros(4))
+        clone = l2l.clone_module(linear)
+        self.assertIsNot(clone.bias, linear.bias)
+        linear.extra = torch.nn.Linear(4, 4)
+        clone = l2l.clone_module(linear)
+        self.assertIsNot(clone.extra, linear.extra)
+        self.assertIsNot(clone.extra.weight, linear.extra.weight)
+
     def test_module_detach(self):
         original_output = self.model(self.input)
         original_loss = self.loss_func(original_output, torch.tensor([[0., 0.]]))
@@ -155,6 +198,20 @@ class UtilTests(unittest.TestCase):
     def test_distribution_detach(self):
         pass
 
+    def test_all_reduce_gradients(self):
+        world_size = 2
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            results = mp.Manager().dict()
+            mp.start_processes(all_reduce_worker,
+                               args=(world_size, os.path.join(tmp_dir, 'init'), results),
+                               nprocs=world_size,
+                               start_method='fork')
+        expected = [None, 0.5] + [1.5] * (len(list(self.model.parameters())) - 2)
+        for rank in range(world_size):
+            self.assertIsNone(results[rank][0])
+            for grad, ref in zip(results[rank][1:], expected[1:]):
+                self.assertAlmostEqual(grad, ref)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,6 +2,10 @@
 
 import os
 import unittest
+
+import torch
+from torchvision import transforms
+
 import learn2learn as l2l
 
 
@@ -17,6 +21,24 @@ class CIFARFSTests(unittest.TestCase):
         cifarfs = l2l.vision.datasets.CIFARFS(root='./data')
         path = os.path.join('./data', 'cifarfs', 'processed')
         self.assertTrue(os.path.exists(path))
+        self.assertTrue(os.path.exists(os.path.join(path, 'train_images.npy')))
+        self.assertEqual(cifarfs.images.shape[1:], (32, 32, 3))
+        self.assertEqual(len(cifarfs.classes), 64)
+
+    def test_get_batch(self):
+        cifarfs = l2l.vision.datasets.CIFARFS(root='./data',
+                                              mode='validation',
+                                              transform=transforms.ToTensor())
+        indices = [3, 600, 3, len(cifarfs) - 1]
+        X, y = cifarfs.get_batch(indices)
+        for i, index in enumerate(indices):
+            image, label = cifarfs[index]
+            self.assertTrue(torch.allclose(X[i], image))
+            self.assertEqual(y[i].item(), label)
+        cifarfs.transform = None
+        packed_X, packed_y = cifarfs.get_batch(indices)
+        self.assertTrue(torch.allclose(X, packed_X))
+        self.assertTrue(torch.equal(y, packed_y))
 
 
 if __name__ == '__main__':
@@ -1,7 +1,16 @@
 #!/usr/bin/env python3
 
 import os
+import pickle
+import shutil
+import tempfile
 import unittest
+
+import numpy as np
+
+import torch
+from torchvision import transforms
+
 import learn2learn as l2l
 
 
@@ -30,6 +39,51 @@ class FC100Tests(unittest.TestCase):
         path = os.path.join(root, 'FC100_test.pickle')
         self.assertTrue(os.path.exists(path))
 
+    def test_tensor(self):
+        root = os.path.expanduser('./data')
+        fc100 = l2l.vision.datasets.FC100(root=root,
+                                          mode='validation',
+                                          transform=transforms.ToTensor())
+        tensor_fc100 = l2l.vision.datasets.FC100(root=root, mode='validation', tensor=True)
+        self.assertEqual(tensor_fc100.images.dtype, torch.uint8)
+        indices = [12, 0, 12, len(fc100) - 1]
+        X, y = fc100.get_batch(indices)
+        tensor_X, tensor_y = tensor_fc100.get_batch(indices)
+        self.assertTrue(torch.allclose(X, tensor_X))
+        self.assertTrue(torch.equal(y, tensor_y))
+        for i, index in enumerate(indices):
+            image, label = tensor_fc100[index]
+            self.assertTrue(torch.allclose(image, tensor_X[i]))
+            self.assertEqual(label, tensor_y[i].item())
+
+        tensor_fc100.transform = lambda x: 2.0 * x
+        doubled_X, _ = tensor_fc100.get_batch(indices)
+        self.assertTrue(torch.allclose(doubled_X, 2.0 * tensor_X))
+
+    def test_random_transform(self):
+        # Small fake split, in the format of the downloaded pickles.
+        root = tempfile.mkdtemp()
+        rng = np.random.RandomState(42)
+        archive = {'data': rng.randint(0, 256, size=(4, 32, 32, 3)).astype(np.uint8),
+                   'labels': [0, 1, 0, 1]}
+        with open(os.path.join(root, 'FC100_train.pickle'), 'wb') as f:
+            pickle.dump(archive, f)
+        try:
+            fc100 = l2l.vision.datasets.FC100(root=root,
+                                              mode='train',
+                                              tensor=True,
+                                              transform=transforms.RandomHorizontalFlip())
+            torch.manual_seed(0)
+            X, y = fc100.get_batch([2] * 32)
+            image = X.new_tensor(archive['data'][2]).permute(2, 0, 1) / 255.0
+            flipped = [torch.equal(x, image.flip(-1)) for x in X]
+            kept = [torch.equal(x, image) for x in X]
+            # Each image is flipped, or not, independently.
+            self.assertTrue(all(f or k for f, k in zip(flipped, kept)))
+            self.assertTrue(any(flipped) and any(kept))
+        finally:
+            shutil.rmtree(root)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+
+import torch
+from PIL.Image import LANCZOS
+from torchvision import transforms
+
+import learn2learn as l2l
+
+
+class FullOmniglotTests(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_image_size(self):
+        root = os.path.expanduser('~/data')
+        transform = transforms.Compose([
+            transforms.Resize(28, interpolation=LANCZOS),
+            transforms.ToTensor(),
+        ])
+        omniglot = l2l.vision.datasets.FullOmniglot(root=root, transform=transform, download=True)
+        packed = l2l.vision.datasets.FullOmniglot(root=root, transform=transform, image_size=28)
+        self.assertTrue(os.path.exists(os.path.join(root, 'omniglot-images-28.npy')))
+        self.assertEqual(packed.images.shape, (len(omniglot), 28, 28))
+        for i in [0, 19, 19280, len(omniglot) - 1]:
+            image, label = omniglot[i]
+            packed_image, packed_label = packed[i]
+            self.assertTrue(torch.equal(image, packed_image))
+            self.assertEqual(label, packed_label)
+            self.assertEqual(omniglot.get_label(i), packed.get_label(i))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import numpy as np
+import torch.multiprocessing as mp
+
+from learn2learn.vision.datasets.image_cache import LRUImageCache, SharedImageCache
+
+SHAPE = (8, 8, 3)
+IMAGE_BYTES = 8 * 8 * 3
+NUM_ITEMS = 20
+
+
+def image(index):
+    return np.full(SHAPE, index, dtype=np.uint8)
+
+
+def fill_cache(cache, indices):
+    for index in indices:
+        cache.put(index, image(index))
+
+
+class ImageCacheTests(unittest.TestCase):
+
+    def test_lru(self):
+        cache = LRUImageCache(capacity=3 * IMAGE_BYTES)
+        fill_cache(cache, [0, 1, 2])
+        self.assertTrue(np.array_equal(cache.get(0), image(0)))  # 1 is now least recently used.
+        cache.put(3, image(3))
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get(1))
+        for index in [0, 2, 3]:
+            self.assertTrue(np.array_equal(cache.get(index), image(index)))
+        self.assertLessEqual(cache.size, cache.capacity)
+
+    def test_shared(self):
+        cache = SharedImageCache(capacity=4 * IMAGE_BYTES, num_items=NUM_ITEMS, shape=SHAPE)
+        fill_cache(cache, [0, 1, 2, 3])
+        cache.get(0)
+        cache.put(4, image(4))
+        self.assertEqual(len(cache), 4)
+        cache.put(5, np.zeros((2, 2, 3), dtype=np.uint8))  # Other shapes are not cached.
+        self.assertIsNone(cache.get(5))
+
+        # Images cached by another process are visible.
+        process = mp.get_context('fork').Process(target=fill_cache, args=(cache, [10, 11]))
+        process.start()
+        process.join()
+        for index in [10, 11]:
+            self.assertTrue(np.array_equal(cache.get(index), image(index)))
+        self.assertEqual(len(cache), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from learn2learn.vision.datasets.image_store import load_resized, pack_images
+
+
+class ImageStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(5):
+            gradient = np.linspace(0, 255, 400, dtype=np.uint8)
+            array = np.stack([np.tile(gradient, (300, 1)),
+                              np.tile(gradient[:300, None], (1, 400)),
+                              np.full((300, 400), 50 * i, dtype=np.uint8)], axis=-1)
+            path = os.path.join(self.directory, str(i) + '.jpg')
+            Image.fromarray(array).save(path, quality=95)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_resized(self):
+        image = load_resized(self.paths[2], 84)
+        self.assertEqual(image.shape, (84, 84, 3))
+        self.assertEqual(image.dtype, np.uint8)
+        # Draft decoding stays close to resizing the full-resolution image.
+        full = Image.open(self.paths[2]).convert('RGB').resize((84, 84), resample=Image.LANCZOS)
+        difference = np.abs(image.astype(np.float64) - np.asarray(full, dtype=np.float64))
+        self.assertLess(difference.mean(), 4.0)
+
+    def test_pack_images(self):
+        store_path = os.path.join(self.directory, 'images-32.npy')
+        pack_images(self.paths, store_path, 32, num_workers=0)
+        images = np.load(store_path, mmap_mode='r')
+        self.assertEqual(images.shape, (5, 32, 32, 3))
+        for path, image in zip(self.paths, images):
+            self.assertTrue(np.array_equal(image, load_resized(path, 32)))
+
+        parallel_path = os.path.join(self.directory, 'parallel-images-32.npy')
+        pack_images(self.paths, parallel_path, 32, num_workers=2)
+        self.assertTrue(np.array_equal(images, np.load(parallel_path)))
+        self.assertFalse(any(name.endswith('.tmp') for name in os.listdir(self.directory)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import learn2learn as l2l
+
+
+class MiniImagenetBookkeepingTests(unittest.TestCase):
+
+    def setUp(self):
+        # Small fake split, in the format of the downloaded pickles.
+        self.root = tempfile.mkdtemp()
+        rng = np.random.RandomState(42)
+        images = rng.randint(0, 256, size=(6, 84, 84, 3)).astype(np.uint8)
+        class_dict = {'n01': [0, 3], 'n02': [1, 4], 'n03': [2, 5]}
+        path = os.path.join(self.root, 'mini-imagenet-cache-validation.pkl')
+        with open(path, 'wb') as f:
+            pickle.dump({'image_data': images, 'class_dict': class_dict}, f)
+        self.labels = [0, 1, 2, 0, 1, 2]
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_bookkeeping(self):
+        for memmap in [False, True]:
+            mini = l2l.vision.datasets.MiniImagenet(root=self.root, mode='validation', memmap=memmap)
+            meta = l2l.data.MetaDataset(mini)
+            self.assertEqual(meta.labels_to_indices[1], [1, 4])
+
+            # With a target_transform, the bookkeeping is scanned once and saved.
+            mini = l2l.vision.datasets.MiniImagenet(root=self.root,
+                                                    mode='validation',
+                                                    memmap=memmap,
+                                                    target_transform=lambda y: y)
+            meta = l2l.data.MetaDataset(mini)
+            path = os.path.join(self.root, 'mini-imagenet-bookkeeping-validation-label-indices.npy')
+            self.assertTrue(os.path.exists(path))
+            self.assertEqual([meta.indices_to_labels[i] for i in range(len(mini))], self.labels)
+            self.assertEqual(meta.labels_to_indices[1], [1, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+
+import torch
+
+import learn2learn as l2l
+
+
+class MiniImagenetTests(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_memmap(self):
+        root = os.path.expanduser('~/data')
+        mini = l2l.vision.datasets.MiniImagenet(root=root, mode='validation')
+        memmapped = l2l.vision.datasets.MiniImagenet(root=root, mode='validation', memmap=True)
+        self.assertTrue(os.path.exists(os.path.join(root, 'mini-imagenet-validation-images.npy')))
+        self.assertEqual(len(mini), len(memmapped))
+        for i in [0, 12, len(mini) - 1]:
+            image, label = mini[i]
+            memmapped_image, memmapped_label = memmapped[i]
+            self.assertTrue(torch.equal(image, memmapped_image))
+            self.assertEqual(label, memmapped_label)
+        indices = torch.tensor([5, 600, 3, 5])
+        X, y = mini.get_batch(indices)
+        memmapped_X, memmapped_y = memmapped.get_batch(indices)
+        self.assertTrue(torch.equal(X, memmapped_X))
+        self.assertTrue(torch.equal(y, memmapped_y))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+import learn2learn as l2l
+
+
+class TieredImagenetStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        # Small fake split, in the format of the downloaded pickles.
+        self.root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.root, 'tiered-imagenet'))
+        rng = np.random.RandomState(42)
+        self.arrays = rng.randint(0, 256, size=(6, 84, 84, 3)).astype(np.uint8)
+        images = []
+        for array in self.arrays:
+            png = io.BytesIO()
+            Image.fromarray(array).save(png, format='PNG')
+            images.append(png.getvalue())
+        self.labels = np.array([0, 1, 2, 0, 1, 2])
+        path = os.path.join(self.root, 'tiered-imagenet', 'val_images_png.pkl')
+        with open(path, 'wb') as images_file:
+            pickle.dump(images, images_file)
+        path = os.path.join(self.root, 'tiered-imagenet', 'val_labels.pkl')
+        with open(path, 'wb') as labels_file:
+            pickle.dump({'label_specific': self.labels}, labels_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_memmap(self):
+        tiered = l2l.vision.datasets.TieredImagenet(root=self.root, mode='validation')
+        memmapped = l2l.vision.datasets.TieredImagenet(root=self.root, mode='validation', memmap=True)
+        path = os.path.join(self.root, 'tiered-imagenet', 'val_images.npy')
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(len(tiered), len(memmapped))
+        for i in range(len(self.arrays)):
+            image, label = tiered[i]
+            memmapped_image, memmapped_label = memmapped[i]
+            self.assertTrue(np.array_equal(np.asarray(image), self.arrays[i]))
+            self.assertTrue(np.array_equal(np.asarray(memmapped_image), self.arrays[i]))
+            self.assertEqual(label, memmapped_label)
+
+        # The existing store is reused.
+        reopened = l2l.vision.datasets.TieredImagenet(root=self.root, mode='validation', memmap=True)
+        image, label = reopened[3]
+        self.assertTrue(np.array_equal(np.asarray(image), self.arrays[3]))
+        self.assertEqual(label, self.labels[3])
+
+
+if __name__ == '__main__':
+    unittest.main()
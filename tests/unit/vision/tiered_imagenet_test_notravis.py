@@ -2,6 +2,9 @@
 
 import os
 import unittest
+
+import numpy as np
+
 import learn2learn as l2l
 
 
@@ -30,6 +33,19 @@ class TieredImagenetTests(unittest.TestCase):
         path = os.path.join(root, 'tiered-imagenet', 'test_images_png.pkl')
         self.assertTrue(os.path.exists(path))
 
+    def test_memmap(self):
+        root = os.path.expanduser('~/data')
+        tiered = l2l.vision.datasets.TieredImagenet(root=root, mode='validation', download=True)
+        memmapped = l2l.vision.datasets.TieredImagenet(root=root, mode='validation', memmap=True)
+        path = os.path.join(root, 'tiered-imagenet', 'val_images.npy')
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(len(tiered), len(memmapped))
+        for i in [0, 12, len(tiered) - 1]:
+            image, label = tiered[i]
+            memmapped_image, memmapped_label = memmapped[i]
+            self.assertTrue(np.array_equal(np.asarray(image), np.asarray(memmapped_image)))
+            self.assertEqual(label, memmapped_label)
+
 
 if __name__ == '__main__':
     unittest.main()